@@ -4,22 +4,32 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from .database import verify_connectivity
+from .jobs import job_runner
+from .metrics import MetricsMiddleware
+from .serialization import ORJSONResponse
 
-from .routers import projects, materials, nodes, relations, score, websocket
+from .routers import jobs, metrics_router, projects, materials, nodes, relations, score, websocket
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     if not os.getenv("TESTING"):
         await verify_connectivity()
+    await websocket.bus.start(websocket.hub.publish_many)
+    await job_runner.start(websocket.broadcast)
     yield
+    await job_runner.stop()
+    await websocket.bus.stop()
 
 
-app = FastAPI(title="Circular Design Toolkit", lifespan=lifespan)
+app = FastAPI(title="Circular Design Toolkit", lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(projects.router)
 app.include_router(materials.router)
 app.include_router(nodes.router)
 app.include_router(relations.router)
 app.include_router(score.router)
+app.include_router(jobs.router)
+app.include_router(metrics_router)
 app.include_router(websocket.router)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Callable
+
+import aiosqlite
+
+from .serialization import dumps_str, loads
+
+logger = logging.getLogger(__name__)
+
+# ``(project_id, messages, exclude)``: ``exclude`` lists projects whose
+# clients must not receive a channel-0 (catalogue) event
+Deliver = Callable[[int, list[dict], tuple[int, ...]], None]
+
+
+class InProcessBus:
+    """Default backend: events only reach clients of the current process."""
+
+    def __init__(self):
+        self.deliver: Deliver | None = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self.deliver = deliver
+
+    def publish(self, project_id: int, messages: list[dict], exclude: tuple[int, ...] = ()) -> None:
+        if self.deliver is not None:
+            self.deliver(project_id, messages, exclude)
+
+    async def stop(self) -> None:
+        self.deliver = None
+
+
+class SQLiteBus:
+    """Share project channels between worker processes on one host.
+
+    Every worker appends its events to the ``bus_events`` table of a shared
+    SQLite file and polls it for rows written by other workers. Events are
+    delivered locally right away; a background task writes them in batches so
+    ``publish`` never waits on disk. Row IDs give a single global order, and
+    rows older than ``retention`` seconds are pruned.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.02, retention: float = 60.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.origin = uuid.uuid4().hex
+        self.deliver: Deliver | None = None
+        self._outbox: asyncio.Queue[tuple[int, list[dict], tuple[int, ...]]] | None = None
+        # separate connections: a poll holding a read snapshot must never be
+        # upgraded to a write, which SQLite refuses without waiting
+        self._db: aiosqlite.Connection | None = None
+        self._reader: aiosqlite.Connection | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._last_id = 0
+
+    async def start(self, deliver: Deliver) -> None:
+        self.deliver = deliver
+        self._outbox = asyncio.Queue()
+        self._db = await aiosqlite.connect(self.path, isolation_level=None)
+        await self._db.execute("PRAGMA busy_timeout=5000")
+        await self._db.execute("PRAGMA journal_mode=WAL")
+        await self._db.execute("PRAGMA synchronous=NORMAL")
+        await self._db.execute(
+            "CREATE TABLE IF NOT EXISTS bus_events ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " origin TEXT NOT NULL,"
+            " project_id INTEGER NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " created REAL NOT NULL)"
+        )
+        self._reader = await aiosqlite.connect(self.path, isolation_level=None)
+        await self._reader.execute("PRAGMA busy_timeout=5000")
+        async with self._reader.execute("SELECT coalesce(max(id), 0) FROM bus_events") as cur:
+            self._last_id = (await cur.fetchone())[0]
+        self._tasks = [
+            asyncio.create_task(self._write_loop()),
+            asyncio.create_task(self._poll_loop()),
+        ]
+
+    def publish(self, project_id: int, messages: list[dict], exclude: tuple[int, ...] = ()) -> None:
+        if self.deliver is not None:
+            self.deliver(project_id, messages, exclude)
+        if self._outbox is not None:
+            self._outbox.put_nowait((project_id, messages, exclude))
+
+    async def _write_loop(self) -> None:
+        last_prune = time.time()
+        while True:
+            items = [await self._outbox.get()]
+            while not self._outbox.empty():
+                items.append(self._outbox.get_nowait())
+            now = time.time()
+            try:
+                await self._db.execute("BEGIN IMMEDIATE")
+                await self._db.executemany(
+                    "INSERT INTO bus_events (origin, project_id, payload, created) VALUES (?, ?, ?, ?)",
+                    [(self.origin, pid, _encode(msgs, exclude), now) for pid, msgs, exclude in items],
+                )
+                if now - last_prune > self.retention:
+                    await self._db.execute("DELETE FROM bus_events WHERE created < ?", (now - self.retention,))
+                    last_prune = now
+                await self._db.execute("COMMIT")
+            except aiosqlite.Error:
+                # keep publishing; peers miss this batch like a dropped frame
+                logger.warning("Writing %d bus events failed", len(items), exc_info=True)
+                if self._db.in_transaction:
+                    await self._db.rollback()
+            finally:
+                for _ in items:
+                    self._outbox.task_done()
+
+    async def _poll_loop(self) -> None:
+        while True:
+            try:
+                async with self._reader.execute(
+                    "SELECT id, origin, project_id, payload FROM bus_events WHERE id > ? ORDER BY id",
+                    (self._last_id,),
+                ) as cur:
+                    rows = await cur.fetchall()
+            except aiosqlite.Error:
+                # busy or locked under write contention: the next poll picks up from _last_id
+                logger.warning("Polling bus events failed", exc_info=True)
+                rows = []
+            for row_id, origin, project_id, payload in rows:
+                self._last_id = row_id
+                if origin != self.origin and self.deliver is not None:
+                    self.deliver(project_id, *_decode(payload))
+            await asyncio.sleep(self.poll_interval)
+
+    async def flush(self) -> None:
+        """Wait until every published event has been written."""
+        if self._outbox is not None and self._tasks:
+            await self._outbox.join()
+
+    async def stop(self) -> None:
+        await self.flush()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for conn in (self._db, self._reader):
+            if conn is not None:
+                await conn.close()
+        self._db = self._reader = None
+        self.deliver = None
+
+
+def _encode(messages: list[dict], exclude: tuple[int, ...]) -> str:
+    """Payload of one ``bus_events`` row; plain message lists stay as they were."""
+    return dumps_str({"messages": messages, "exclude": exclude} if exclude else messages)
+
+
+def _decode(payload: str) -> tuple[list[dict], tuple[int, ...]]:
+    data = loads(payload)
+    if isinstance(data, dict):
+        return data["messages"], tuple(data["exclude"])
+    return data, ()
+
+
+def create_bus(spec: str | None = None) -> InProcessBus | SQLiteBus:
+    """Build the backend named by ``BROADCAST_BUS``.
+
+    ``memory`` (default) keeps events in process; ``sqlite:///path/bus.db``
+    shares them through an SQLite file between workers on one host.
+    """
+    spec = spec or os.getenv("BROADCAST_BUS", "memory")
+    if spec == "memory":
+        return InProcessBus()
+    if spec.startswith("sqlite:///"):
+        return SQLiteBus(spec[len("sqlite:///"):])
+    raise RuntimeError(f"Unknown BROADCAST_BUS {spec!r}")
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from typing import Hashable, Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import chunked
+from .models.db import Material as MaterialModel
+from .versioning import catalogue_version
+
+
+class LRUCache:
+    """Least-recently-used cache of ``bytes`` values bounded by total size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data: OrderedDict[Hashable, bytes] = OrderedDict()
+
+    def get(self, key: Hashable) -> bytes | None:
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        self.discard(key)
+        if len(value) > self.max_bytes:
+            return
+        self._data[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.size -= len(evicted)
+
+    def discard(self, key: Hashable) -> None:
+        value = self._data.pop(key, None)
+        if value is not None:
+            self.size -= len(value)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SnapshotCache(LRUCache):
+    """Serialised graph snapshots keyed by ``(project_id, version, *variant)``.
+
+    Versions only grow, so storing a snapshot drops older ones of the same
+    project (in every variant) right away instead of waiting for eviction.
+    """
+
+    def __init__(self, max_bytes: int):
+        super().__init__(max_bytes)
+        self._latest: dict[int, int] = {}
+        self._variants: dict[int, set[tuple]] = {}
+
+    def put(self, key: tuple, value: bytes) -> None:
+        project_id, version = key[:2]
+        previous = self._latest.get(project_id)
+        if previous is not None and previous > version:
+            return
+        if previous is not None and previous != version:
+            for old in self._variants.pop(project_id, ()):
+                self.discard(old)
+        self._latest[project_id] = version
+        self._variants.setdefault(project_id, set()).add(key)
+        super().put(key, value)
+
+    def clear(self) -> None:
+        super().clear()
+        self._latest.clear()
+        self._variants.clear()
+
+
+class MaterialCache:
+    """Catalogue rows keyed by material ID, shared by every request of the process.
+
+    Rows are loaded lazily, all IDs a caller is missing in one query, and
+    kept in LRU order up to ``max_entries``. Each lookup first reads the
+    catalogue version (one primary-key lookup) in the caller's transaction;
+    if it differs from the version the entries were loaded under, another
+    writer (possibly in another worker process) changed the catalogue and
+    everything is dropped. Writers in this process also call
+    :meth:`invalidate` after committing.
+
+    Rows are plain dicts shared between callers and must not be modified.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.version: int | None = None
+        self._rows: OrderedDict[int, dict] = OrderedDict()
+        # every row of the catalogue is cached, see :meth:`get_all`
+        self._complete = False
+
+    def invalidate(self) -> None:
+        self.version = None
+        self._rows.clear()
+        self._complete = False
+
+    async def _sync(self, session: AsyncSession) -> None:
+        version = await catalogue_version(session)
+        if version != self.version:
+            self.invalidate()
+            self.version = version
+
+    def _store(self, row: dict) -> None:
+        self._rows[row["id"]] = row
+        self._rows.move_to_end(row["id"])
+        while len(self._rows) > self.max_entries:
+            self._rows.popitem(last=False)
+            self._complete = False
+
+    async def get_many(self, session: AsyncSession, ids: Iterable[int | None]) -> dict[int, dict]:
+        """Rows of the existing materials among ``ids``; unknown IDs are left out."""
+        await self._sync(session)
+        found: dict[int, dict] = {}
+        missing = []
+        for mid in set(ids):
+            row = self._rows.get(mid)
+            if row is not None:
+                self._rows.move_to_end(mid)
+                found[mid] = row
+            elif mid is not None and not self._complete:
+                missing.append(mid)
+        for chunk in chunked(sorted(missing)):
+            res = await session.execute(_MATERIAL_ROWS.where(MaterialModel.id.in_(chunk)))
+            for row in res.mappings():
+                row = dict(row)
+                self._store(row)
+                found[row["id"]] = row
+        return found
+
+    async def get_all(self, session: AsyncSession) -> list[dict]:
+        """Every row of the catalogue, ordered by ID."""
+        await self._sync(session)
+        if not self._complete:
+            rows = [dict(row) for row in (await session.execute(_MATERIAL_ROWS.order_by(MaterialModel.id))).mappings()]
+            if len(rows) > self.max_entries:
+                return rows
+            for row in rows:
+                self._store(row)
+            self._complete = True
+        return sorted(self._rows.values(), key=lambda row: row["id"])
+
+
+_MATERIAL_ROWS = select(
+    MaterialModel.id, MaterialModel.name, MaterialModel.weight, MaterialModel.co2_value, MaterialModel.hardness
+)
+
+
+graph_cache = SnapshotCache(int(os.getenv("GRAPH_CACHE_BYTES", str(64 * 1024 * 1024))))
+material_cache = MaterialCache(int(os.getenv("MATERIAL_CACHE_SIZE", "10000")))
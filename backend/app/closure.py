@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+from sqlalchemy import delete, func, insert, literal, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import chunked
+from .models.db import Node as NodeModel, NodeClosure, Relation as RelationModel
+
+
+def closure_select(project_id: int):
+    """All closure rows of ``project_id`` derived from ``parent_id``.
+
+    A recursive CTE walks down from every node. The depth is capped at the
+    number of nodes so corrupt, cyclic data cannot recurse forever. The
+    migration that backfills existing databases uses the same query in SQL.
+    """
+    anchor = select(
+        NodeModel.id.label("ancestor_id"),
+        NodeModel.id.label("descendant_id"),
+        literal(0).label("depth"),
+    ).where(NodeModel.project_id == project_id)
+    count = select(func.count()).select_from(NodeModel).where(NodeModel.project_id == project_id)
+    tree = anchor.cte("tree", recursive=True)
+    tree = tree.union_all(
+        select(tree.c.ancestor_id, NodeModel.id, tree.c.depth + 1)
+        .join(NodeModel, NodeModel.parent_id == tree.c.descendant_id)
+        .where(tree.c.depth < count.scalar_subquery())
+    )
+    return select(tree.c.ancestor_id, tree.c.descendant_id, tree.c.depth)
+
+
+async def rebuild_closure(session: AsyncSession, project_id: int) -> None:
+    """Recompute the closure rows of ``project_id`` from scratch."""
+    in_project = select(NodeModel.id).where(NodeModel.project_id == project_id)
+    await session.execute(delete(NodeClosure).where(NodeClosure.descendant_id.in_(in_project)))
+    await session.execute(
+        insert(NodeClosure)
+        .prefix_with("OR IGNORE")
+        .from_select(["ancestor_id", "descendant_id", "depth"], closure_select(project_id))
+    )
+
+
+async def add_nodes(session: AsyncSession, node_ids: Sequence[int]) -> None:
+    """Insert closure rows for freshly inserted ``node_ids``.
+
+    Their parents must already be indexed, so callers that insert a parent
+    and its child together call this once per hierarchy level.
+    """
+    if not node_ids:
+        return
+    await session.execute(
+        insert(NodeClosure),
+        [{"ancestor_id": nid, "descendant_id": nid, "depth": 0} for nid in node_ids],
+    )
+    for chunk in chunked(node_ids):
+        await session.execute(
+            insert(NodeClosure).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(NodeClosure.ancestor_id, NodeModel.id, NodeClosure.depth + 1)
+                .join(NodeClosure, NodeClosure.descendant_id == NodeModel.parent_id)
+                .where(NodeModel.id.in_(chunk)),
+            )
+        )
+
+
+def _detach(node_id: int):
+    """Delete the links between the subtree of ``node_id`` and everything above it."""
+    above = select(NodeClosure.ancestor_id).where(
+        NodeClosure.descendant_id == node_id, NodeClosure.depth > 0
+    )
+    below = select(NodeClosure.descendant_id).where(NodeClosure.ancestor_id == node_id)
+    return delete(NodeClosure).where(
+        NodeClosure.ancestor_id.in_(above), NodeClosure.descendant_id.in_(below)
+    )
+
+
+async def remove_node(session: AsyncSession, node_id: int) -> None:
+    """Drop ``node_id`` from the index; its children become roots of their subtrees."""
+    await session.execute(_detach(node_id))
+    await session.execute(delete(NodeClosure).where(NodeClosure.ancestor_id == node_id))
+
+
+async def move_subtree(session: AsyncSession, node_id: int, parent_id: int | None) -> None:
+    """Re-link the subtree of ``node_id`` below ``parent_id`` (``None``: make it a root).
+
+    The caller must make sure ``parent_id`` is not inside the subtree, see
+    :func:`is_ancestor`.
+    """
+    await session.execute(_detach(node_id))
+    if parent_id is None:
+        return
+    above = NodeClosure.__table__.alias("above")
+    below = NodeClosure.__table__.alias("below")
+    await session.execute(
+        insert(NodeClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + 1)
+            .select_from(above.join(below, literal(True)))
+            .where(above.c.descendant_id == parent_id, below.c.ancestor_id == node_id),
+        )
+    )
+
+
+async def relevel_subtree(session: AsyncSession, node_id: int, level: int) -> list[tuple[int, int]]:
+    """Set ``level`` on ``node_id`` and ``level + depth`` on each of its descendants.
+
+    One ``UPDATE`` driven by the closure rows of ``node_id``, however large
+    the subtree is. Returns the ``(id, level)`` pairs it wrote.
+    """
+    depth = (
+        select(NodeClosure.depth)
+        .where(NodeClosure.ancestor_id == node_id, NodeClosure.descendant_id == NodeModel.id)
+        .scalar_subquery()
+    )
+    res = await session.execute(
+        update(NodeModel)
+        .where(NodeModel.id.in_(select(NodeClosure.descendant_id).where(NodeClosure.ancestor_id == node_id)))
+        .values(level=depth + level)
+        .returning(NodeModel.id, NodeModel.level)
+        .execution_options(synchronize_session=False)
+    )
+    return list(res.tuples())
+
+
+async def is_ancestor(session: AsyncSession, ancestor_id: int, node_id: int) -> bool:
+    """Whether ``ancestor_id`` is ``node_id`` or lies above it."""
+    res = await session.execute(
+        select(NodeClosure.depth).where(
+            NodeClosure.ancestor_id == ancestor_id, NodeClosure.descendant_id == node_id
+        )
+    )
+    return res.first() is not None
+
+
+async def delete_subtree(session: AsyncSession, node_id: int) -> tuple[list[int], int]:
+    """Delete ``node_id``, all its descendants and every relation touching them.
+
+    Runs as three set-based statements driven by the closure table, however
+    large the subtree. Returns the deleted node IDs and the number of deleted
+    relations; the caller owns the transaction.
+    """
+    subtree = select(NodeClosure.descendant_id).where(NodeClosure.ancestor_id == node_id)
+    await session.execute(_detach(node_id))
+    rel = await session.execute(
+        delete(RelationModel)
+        .where(or_(RelationModel.source_id.in_(subtree), RelationModel.target_id.in_(subtree)))
+        .execution_options(synchronize_session=False)
+    )
+    res = await session.execute(
+        delete(NodeModel)
+        .where(NodeModel.id.in_(subtree))
+        .returning(NodeModel.id)
+        .execution_options(synchronize_session=False)
+    )
+    node_ids = list(res.scalars())
+    # last, since the statements above look the subtree up here
+    await session.execute(delete(NodeClosure).where(NodeClosure.ancestor_id.in_(subtree)))
+    return node_ids, rel.rowcount
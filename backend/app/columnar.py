@@ -0,0 +1,159 @@
+"""Columnar binary encoding of the project graph.
+
+The JSON graph repeats every key for every node. This format stores each
+field as one little-endian typed array instead, so a browser can wrap the
+columns in ``Int32Array``/``Float64Array`` views without parsing them::
+
+    b"DGC1"                      magic
+    uint32                       length of the JSON header in bytes
+    header                       UTF-8 JSON, space-padded to a multiple of 8
+    column, column, ...          in header["columns"] order, each padded to 8 bytes
+
+The header carries the counts, the string dictionary, the materials and
+``columns`` as ``[name, dtype]`` pairs (numpy dtype codes ``i4``, ``u4``,
+``u1``, ``f8``). Node names are indices into ``strings``;
+``connection_type`` indexes ``connection_types``, whose first entries are
+the :class:`ConnectionType` members so that codes match the stored values.
+Missing IDs and codes are ``-1``, missing numbers ``NaN``.
+"""
+from __future__ import annotations
+
+import struct
+
+import numpy as np
+
+from .models.schemas import ConnectionType
+from .serialization import dumps, loads
+
+MEDIA_TYPE = "application/vnd.dimop.graph+columnar"
+MAGIC = b"DGC1"
+
+# bits of the ``flags`` column
+ATOMIC, REUSABLE, RECYCLABLE = 1, 2, 4
+
+NODE_COLUMNS = (
+    ("id", "i4"),
+    ("parent_id", "i4"),
+    ("material_id", "i4"),
+    ("level", "i4"),
+    ("name", "u4"),
+    ("connection_type", "i4"),
+    ("flags", "u1"),
+    ("weight", "f8"),
+    ("sustainability_score", "f8"),
+)
+EDGE_COLUMNS = (
+    ("edge_id", "i4"),
+    ("edge_source", "i4"),
+    ("edge_target", "i4"),
+)
+
+
+def _pad(length: int) -> int:
+    return -length % 8
+
+
+def encode_graph(graph: dict) -> bytes:
+    """Encode a graph as built by ``GET /projects/{id}/graph`` into the columnar format."""
+    nodes, edges = graph["nodes"], graph["edges"]
+    strings: dict[str, int] = {}
+    ctypes: dict[str, int] = {ctype.name: int(ctype) for ctype in ConnectionType}
+
+    def ids(key: str, rows: list[dict]) -> np.ndarray:
+        return np.fromiter((-1 if r[key] is None else r[key] for r in rows), "<i4", len(rows))
+
+    def numbers(key: str) -> np.ndarray:
+        return np.fromiter((np.nan if n[key] is None else n[key] for n in nodes), "<f8", len(nodes))
+
+    columns = {
+        "id": ids("id", nodes),
+        "parent_id": ids("parent_id", nodes),
+        "material_id": ids("material_id", nodes),
+        "level": ids("level", nodes),
+        "name": np.fromiter((strings.setdefault(n["name"], len(strings)) for n in nodes), "<u4", len(nodes)),
+        "connection_type": np.fromiter(
+            (-1 if n["connection_type"] is None else ctypes.setdefault(str(n["connection_type"]), len(ctypes))
+             for n in nodes),
+            "<i4",
+            len(nodes),
+        ),
+        "flags": np.fromiter(
+            (ATOMIC * bool(n["atomic"]) | REUSABLE * bool(n["reusable"]) | RECYCLABLE * bool(n["recyclable"])
+             for n in nodes),
+            "<u1",
+            len(nodes),
+        ),
+        "weight": numbers("weight"),
+        "sustainability_score": numbers("sustainability_score"),
+        "edge_id": ids("id", edges),
+        "edge_source": ids("source", edges),
+        "edge_target": ids("target", edges),
+    }
+    header = dumps({
+        "version": graph.get("version"),
+        "nodes": len(nodes),
+        "edges": len(edges),
+        "strings": list(strings),
+        "connection_types": list(ctypes),
+        "materials": graph["materials"],
+        "columns": [list(c) for c in NODE_COLUMNS + EDGE_COLUMNS],
+    })
+    header += b" " * _pad(len(MAGIC) + 4 + len(header))
+    parts = [MAGIC, struct.pack("<I", len(header)), header]
+    for name, _ in NODE_COLUMNS + EDGE_COLUMNS:
+        data = columns[name].tobytes()
+        parts.append(data)
+        parts.append(b"\0" * _pad(len(data)))
+    return b"".join(parts)
+
+
+def decode_columns(payload: bytes) -> tuple[dict, dict[str, np.ndarray]]:
+    """Split ``payload`` into its header and zero-copy numpy views of the columns."""
+    if payload[:4] != MAGIC:
+        raise ValueError("not a columnar graph")
+    (length,) = struct.unpack_from("<I", payload, 4)
+    offset = 8 + length
+    header = loads(payload[8:offset])
+    columns = {}
+    for name, dtype in header["columns"]:
+        count = header["edges"] if name.startswith("edge_") else header["nodes"]
+        array = np.frombuffer(payload, "<" + dtype, count, offset)
+        columns[name] = array
+        offset += array.nbytes + _pad(array.nbytes)
+    return header, columns
+
+
+def decode_graph(payload: bytes) -> dict:
+    """Rebuild the JSON graph from a columnar payload; the inverse of :func:`encode_graph`."""
+    header, c = decode_columns(payload)
+    strings, ctypes = header["strings"], header["connection_types"]
+
+    def opt_id(value: int) -> int | None:
+        return None if value < 0 else value
+
+    def opt_num(value: float) -> float | None:
+        return None if value != value else value
+
+    nodes = [
+        {
+            "id": nid,
+            "material_id": opt_id(material_id),
+            "name": strings[name],
+            "parent_id": opt_id(parent_id),
+            "atomic": bool(flags & ATOMIC),
+            "reusable": bool(flags & REUSABLE),
+            "connection_type": None if ctype < 0 else ctypes[ctype],
+            "level": level,
+            "weight": opt_num(weight),
+            "recyclable": bool(flags & RECYCLABLE),
+            "sustainability_score": opt_num(score),
+        }
+        for nid, parent_id, material_id, level, name, ctype, flags, weight, score in zip(
+            *(c[name].tolist() for name, _ in NODE_COLUMNS)
+        )
+    ]
+    edges = [
+        {"id": eid, "source": source, "target": target}
+        for eid, source, target in zip(*(c[name].tolist() for name, _ in EDGE_COLUMNS))
+    ]
+    return {"nodes": nodes, "edges": edges, "materials": header["materials"], "version": header["version"]}
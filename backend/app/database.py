@@ -1,35 +1,129 @@
 from __future__ import annotations
 
-from __future__ import annotations
-
 import os
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Iterator, Sequence, TypeVar
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy import text
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
-from .models.db import Base
+from .metrics import instrument_engine
+from .migrations import run_migrations
 
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./app.db")
 
-engine = create_async_engine(DATABASE_URL, future=True, echo=False)
+# Pragmas applied to every new SQLite connection, selected by ``SQLITE_PROFILE``.
+STORAGE_PROFILES: dict[str, dict[str, str | int]] = {
+    "default": {},
+    "tuned": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,  # KiB, i.e. 64 MB per connection
+        "mmap_size": 256 * 1024 * 1024,
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    },
+}
+STORAGE_PROFILE = os.getenv("SQLITE_PROFILE", "tuned")
+READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+
+# Upper bound for values in one ``IN (...)``; SQLite limits bound parameters.
+IN_CHUNK_SIZE = 500
+
+T = TypeVar("T")
+
+
+def chunked(items: Sequence[T], size: int = IN_CHUNK_SIZE) -> Iterator[Sequence[T]]:
+    """Yield consecutive slices of ``items`` with at most ``size`` elements."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _install_pragmas(engine: AsyncEngine, pragmas: dict[str, str | int], *, read_only: bool) -> None:
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, _record) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+def create_engines(
+    url: str = DATABASE_URL,
+    profile: str = STORAGE_PROFILE,
+    read_pool_size: int = READ_POOL_SIZE,
+) -> tuple[AsyncEngine, AsyncEngine]:
+    """Create the ``(writer, reader)`` engine pair for ``url``.
+
+    For file-based SQLite the writer pool holds a single connection, so
+    writers queue in the application instead of spinning on the database
+    lock, and readers get their own ``query_only`` pool; with WAL journaling
+    they are not blocked by a running write transaction. In-memory and
+    non-SQLite databases share one engine for both roles.
+    """
+    try:
+        pragmas = STORAGE_PROFILES[profile]
+    except KeyError:
+        raise RuntimeError(f"Unknown SQLITE_PROFILE {profile!r}") from None
+
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        engine = create_async_engine(url, future=True, echo=False)
+        instrument_engine(engine.sync_engine, "main")
+        return engine, engine
+    if parsed.database in (None, "", ":memory:"):
+        engine = create_async_engine(url, future=True, echo=False)
+        _install_pragmas(engine, {k: v for k, v in pragmas.items() if k != "journal_mode"}, read_only=False)
+        instrument_engine(engine.sync_engine, "main")
+        return engine, engine
+
+    writer = create_async_engine(
+        url, future=True, echo=False, poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0
+    )
+    reader = create_async_engine(
+        url, future=True, echo=False, poolclass=AsyncAdaptedQueuePool, pool_size=read_pool_size, max_overflow=0
+    )
+    _install_pragmas(writer, pragmas, read_only=False)
+    _install_pragmas(reader, pragmas, read_only=True)
+    instrument_engine(writer.sync_engine, "writer")
+    instrument_engine(reader.sync_engine, "reader")
+    return writer, reader
+
+
+engine, read_engine = create_engines()
 async_session = async_sessionmaker(engine, expire_on_commit=False)
+read_session = async_sessionmaker(read_engine, expire_on_commit=False)
 
 
 async def verify_connectivity() -> None:
-    """Ensure the database is reachable and tables exist."""
+    """Ensure the database is reachable and the schema is up to date."""
     try:
         async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(run_migrations)
             await conn.execute(text("SELECT 1"))
     except Exception as exc:
         raise RuntimeError("Unable to connect to database") from exc
 
 
+async def begin_snapshot(session: AsyncSession) -> None:
+    """Pin one read snapshot for the following statements of ``session``.
+
+    pysqlite only opens a transaction before writes, so without an explicit
+    ``BEGIN`` every ``SELECT`` could see a different committed state.
+    """
+    conn = await session.connection()
+    if conn.dialect.name == "sqlite":
+        await conn.exec_driver_sql("BEGIN")
+
+
 async def get_session(*, write: bool = False) -> AsyncGenerator[AsyncSession, None]:
-    """Yield a database session."""
-    async with async_session() as session:
+    """Yield a database session from the reader pool, or the writer with ``write``."""
+    factory = async_session if write else read_session
+    async with factory() as session:
         yield session
 
 
@@ -37,3 +131,15 @@ async def get_write_session() -> AsyncGenerator[AsyncSession, None]:
     async for session in get_session(write=True):
         yield session
 
+
+def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    """Reader session factory for work that outlives the request's dependencies.
+
+    Streaming responses run after yield-dependencies have been closed, so
+    they open their own sessions from this factory.
+    """
+    return read_session
+
+
+def get_write_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    return async_session
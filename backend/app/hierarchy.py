@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from typing import Iterable, Mapping, Sequence
+
+
+class CycleError(ValueError):
+    """Raised when the ``parent_id`` links of a project form a cycle."""
+
+    def __init__(self, node_ids: list[int]):
+        self.node_ids = node_ids
+        super().__init__(f"Cycle detected: {node_ids}")
+
+
+def build_children_index(parents: Mapping[int, int | None]) -> dict[int | None, list[int]]:
+    """Map every parent ID to the IDs of its children.
+
+    Nodes whose parent is ``None`` or not part of ``parents`` are treated as
+    roots and collected under the key ``None``.
+    """
+    children: dict[int | None, list[int]] = {}
+    for nid, pid in parents.items():
+        key = pid if pid is not None and pid in parents else None
+        children.setdefault(key, []).append(nid)
+    return children
+
+
+def _find_cycle(parents: Mapping[int, int | None], unvisited: set[int]) -> list[int]:
+    """Return the IDs of one cycle among ``unvisited`` nodes."""
+    start = min(unvisited)
+    seen: dict[int, int] = {}
+    path: list[int] = []
+    nid: int | None = start
+    while nid is not None and nid not in seen:
+        seen[nid] = len(path)
+        path.append(nid)
+        nid = parents.get(nid)
+    if nid is None:
+        return path
+    return sorted(path[seen[nid]:])
+
+
+def post_order(
+    parents: Mapping[int, int | None],
+    children: Mapping[int | None, list[int]] | None = None,
+) -> list[int]:
+    """Return all node IDs so that every child precedes its parent.
+
+    The walk is iterative, so arbitrarily deep chains do not hit the Python
+    recursion limit. Nodes that cannot be reached from a root are part of (or
+    hang below) a cycle, in which case :class:`CycleError` is raised with the
+    IDs of the offending nodes.
+    """
+    if children is None:
+        children = build_children_index(parents)
+
+    order: list[int] = []
+    stack: list[tuple[int, bool]] = [(nid, False) for nid in children.get(None, [])]
+    while stack:
+        nid, expanded = stack.pop()
+        if expanded:
+            order.append(nid)
+            continue
+        stack.append((nid, True))
+        for child in children.get(nid, ()):
+            stack.append((child, False))
+
+    if len(order) != len(parents):
+        unvisited = set(parents).difference(order)
+        raise CycleError(_find_cycle(parents, unvisited))
+    return order
+
+
+def aggregate(nodes: Iterable[Mapping], keys: Sequence[str]) -> dict[int, tuple[float | None, ...]]:
+    """Roll up several numeric fields over the hierarchy in one pass.
+
+    ``nodes`` are mappings with ``id``, ``parent_id`` and ``atomic`` plus the
+    fields named in ``keys``. Atomic nodes keep their own values; non-atomic
+    nodes get the sum of their children's values, ignoring ``None``. A
+    non-atomic node whose children carry no value gets ``None``.
+    """
+    node_map = {n["id"]: n for n in nodes}
+    parents = {nid: n.get("parent_id") for nid, n in node_map.items()}
+    children = build_children_index(parents)
+
+    totals: dict[int, tuple[float | None, ...]] = {}
+    for nid in post_order(parents, children):
+        node = node_map[nid]
+        if node.get("atomic"):
+            totals[nid] = tuple(node.get(key) for key in keys)
+            continue
+        sums: list[float | None] = [None] * len(keys)
+        for child in children.get(nid, ()):
+            for i, value in enumerate(totals[child]):
+                if value is not None:
+                    sums[i] = value if sums[i] is None else sums[i] + value
+        totals[nid] = tuple(sums)
+    return totals
+
+
+def aggregate_weights(nodes: Iterable[Mapping]) -> dict[int, float]:
+    """Compute the subtree weight of every node in O(n).
+
+    Atomic nodes keep their own weight, non-atomic nodes sum the weights of
+    their children.
+    """
+    return {nid: values[0] or 0.0 for nid, values in aggregate(nodes, ("weight",)).items()}
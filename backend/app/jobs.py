@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+Notify = Callable[[int, dict], Awaitable[None]]
+JobFunc = Callable[["Job"], Awaitable[dict | None]]
+
+# Job states; the last three are final.
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class Job:
+    """One unit of background work and its observable state.
+
+    The job function receives its ``Job`` and calls :meth:`report` with the
+    fraction done; whatever it returns becomes ``result``.
+    """
+
+    def __init__(self, runner: "JobRunner", job_id: int, kind: str, project_id: int | None, key: Hashable):
+        self.runner = runner
+        self.id = job_id
+        self.kind = kind
+        self.project_id = project_id
+        self.key = key
+        self.status = QUEUED
+        self.progress = 0.0
+        self.result: dict | None = None
+        self.error: str | None = None
+        self.created = time.time()
+        self.finished: float | None = None
+        self.task: asyncio.Task | None = None
+        self._reported = 0.0
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    def report(self, progress: float) -> None:
+        """Record progress in ``[0, 1]``; pushed to the project at most every ``progress_interval``."""
+        self.progress = min(max(progress, 0.0), 1.0)
+        now = time.monotonic()
+        if now - self._reported >= self.runner.progress_interval:
+            self._reported = now
+            self.runner.publish(self)
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "project_id": self.project_id,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobRunner:
+    """Runs long operations as asyncio tasks outside the request that started them.
+
+    At most ``max_concurrent`` jobs run at once; the rest wait queued.
+    Submitting work under the key of a job that is still queued or running
+    returns that job instead of starting another one. State changes and
+    progress are pushed as ``{"op": "job", "job": {...}}`` through the
+    ``notify`` callback given to :meth:`start`, and the last
+    ``keep_finished`` finished jobs stay queryable.
+    """
+
+    def __init__(self, max_concurrent: int = 2, keep_finished: int = 100, progress_interval: float = 0.25):
+        self.max_concurrent = max_concurrent
+        self.keep_finished = keep_finished
+        self.progress_interval = progress_interval
+        self.jobs: OrderedDict[int, Job] = OrderedDict()
+        self._active: dict[Hashable, Job] = {}
+        self._ids = itertools.count(1)
+        self._slots: asyncio.Semaphore | None = None
+        self._sending: set[asyncio.Future] = set()
+        self.notify: Notify | None = None
+
+    async def start(self, notify: Notify | None = None) -> None:
+        self.notify = notify
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+
+    def submit(self, kind: str, project_id: int | None, func: JobFunc, key: Hashable | None = None) -> Job:
+        """Start ``func`` as a job, or return the active job already holding ``key``.
+
+        Without a ``key`` every submission is a job of its own.
+        """
+        if key is not None and key in self._active:
+            return self._active[key]
+        job_id = next(self._ids)
+        job = Job(self, job_id, kind, project_id, key if key is not None else ("job", job_id))
+        self.jobs[job_id] = job
+        self._active[job.key] = job
+        job.task = asyncio.create_task(self._run(job, func))
+        self.publish(job)
+        return job
+
+    def get(self, job_id: int) -> Job | None:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: int) -> Job | None:
+        """Cancel a queued or running job; finished jobs are returned unchanged."""
+        job = self.jobs.get(job_id)
+        if job is not None and job.active and job.task is not None:
+            job.task.cancel()
+        return job
+
+    def publish(self, job: Job) -> None:
+        if self.notify is not None and job.project_id is not None:
+            sending = asyncio.ensure_future(self.notify(job.project_id, {"op": "job", "job": job.as_dict()}))
+            self._sending.add(sending)
+            sending.add_done_callback(self._sending.discard)
+
+    async def _run(self, job: Job, func: JobFunc) -> None:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        try:
+            async with self._slots:
+                job.status = RUNNING
+                self.publish(job)
+                job.result = await func(job)
+                job.status = DONE
+                job.progress = 1.0
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            job.status = FAILED
+            job.error = str(exc) or type(exc).__name__
+        finally:
+            job.finished = time.time()
+            self._active.pop(job.key, None)
+            self.publish(job)
+            self._prune()
+
+    def _prune(self) -> None:
+        finished = [jid for jid, job in self.jobs.items() if not job.active]
+        for jid in finished[: max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[jid]
+
+    async def drain(self) -> None:
+        """Wait until every submitted job has finished."""
+        while self._active:
+            await asyncio.gather(*(job.task for job in list(self._active.values())), return_exceptions=True)
+
+    async def stop(self) -> None:
+        tasks = [job.task for job in self._active.values() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.notify = None
+
+
+job_runner = JobRunner(max_concurrent=int(os.getenv("JOB_CONCURRENCY", "2")))
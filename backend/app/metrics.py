@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import logging
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged with their SQL; ``0`` disables the log.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+
+# Upper bounds in seconds, from a primary-key lookup to a full-project rescore.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                     for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """Monotonic counter per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.values.items():
+            yield f"{self.name}{_labels(self.labels, labels)} {value}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination, Prometheus style.
+
+    ``observe`` costs one binary search and two additions, cheap enough for
+    every request and SQL statement.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # per label combination: bucket counts (last one is +Inf), sum
+        self.values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total) in self.values.items():
+            running = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                running += count
+                le = _labels((*self.labels, "le"), (*labels, str(bound)))
+                yield f"{self.name}_bucket{le} {running}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {running}"
+
+
+class Gauge:
+    """Value read from a callback at scrape time, e.g. current queue depths."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable[[], dict[tuple[str, ...], float]], labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.read = read
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.read().items():
+            yield f"{self.name}{_labels(self.labels, labels)} {value}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Counter | Histogram | Gauge] = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.add(Histogram(
+    "http_request_duration_seconds", "Latency of HTTP requests by route", ("method", "route", "status"),
+))
+sql_statements = registry.add(Histogram(
+    "sql_statement_duration_seconds", "Duration of SQL statements by kind", ("engine", "statement"),
+))
+slow_statements = registry.add(Counter(
+    "sql_slow_statements_total", "Statements slower than SLOW_QUERY_MS", ("engine",),
+))
+ws_send = registry.add(Histogram(
+    "ws_send_duration_seconds", "Time to write one frame to a WebSocket",
+))
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by its route template.
+
+    The route is read from the scope after routing, so ``/nodes/{node_id}``
+    is one series regardless of the ID; unmatched paths are ``unmatched``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            http_requests.observe(time.perf_counter() - start, scope["method"], path, status)
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Time every statement of ``engine`` and log the slow ones."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_start"].pop()
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        sql_statements.observe(elapsed, name, kind)
+        if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+            slow_statements.inc(name)
+            logger.warning("Slow query on %s (%.1f ms): %s", name, elapsed * 1000, statement)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("metrics_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from typing import Callable
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from .models.db import Base
+
+
+def _create_project_indexes(conn: Connection) -> None:
+    """Indexes for the project-scoped queries of the routers."""
+    for stmt in (
+        "CREATE INDEX IF NOT EXISTS ix_nodes_project_parent ON nodes (project_id, parent_id)",
+        "CREATE INDEX IF NOT EXISTS ix_nodes_parent_id ON nodes (parent_id)",
+        "CREATE INDEX IF NOT EXISTS ix_nodes_material_id ON nodes (material_id)",
+        "CREATE INDEX IF NOT EXISTS ix_relations_project_id ON relations (project_id)",
+        "CREATE INDEX IF NOT EXISTS ix_relations_source_id ON relations (source_id)",
+        "CREATE INDEX IF NOT EXISTS ix_relations_target_id ON relations (target_id)",
+    ):
+        conn.execute(text(stmt))
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    """``ALTER TABLE ... ADD COLUMN`` unless the column already exists."""
+    existing = {col["name"] for col in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _add_project_version(conn: Connection) -> None:
+    """Graph version used for snapshot caching and ETags."""
+    _add_column(conn, "projects", "version", "INTEGER NOT NULL DEFAULT 0")
+
+
+def _create_material_name_index(conn: Connection) -> None:
+    """Index for name search and keyset pagination of ``GET /materials/``."""
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_materials_name_id ON materials (name COLLATE NOCASE, id)"
+    ))
+
+
+def _backfill_node_closure(conn: Connection) -> None:
+    """Fill ``node_closure`` from ``nodes.parent_id``, see ``app.closure``."""
+    conn.execute(text("DELETE FROM node_closure"))
+    conn.execute(text(
+        "INSERT OR IGNORE INTO node_closure (ancestor_id, descendant_id, depth) "
+        "WITH RECURSIVE tree(ancestor_id, descendant_id, depth) AS ("
+        " SELECT id, id, 0 FROM nodes"
+        " UNION ALL"
+        " SELECT tree.ancestor_id, nodes.id, tree.depth + 1 FROM tree"
+        " JOIN nodes ON nodes.parent_id = tree.descendant_id"
+        " WHERE tree.depth < (SELECT count(*) FROM nodes)"
+        ") SELECT ancestor_id, descendant_id, depth FROM tree"
+    ))
+
+
+# Ordered migration steps; step ``i`` upgrades schema version ``i`` to ``i + 1``.
+# Steps must be idempotent and must never be edited once released.
+MIGRATIONS: list[Callable[[Connection], None]] = [
+    _create_project_indexes,
+    _add_project_version,
+    _create_material_name_index,
+    _backfill_node_closure,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(conn: Connection) -> int:
+    return conn.execute(text("PRAGMA user_version")).scalar_one()
+
+
+def _set_schema_version(conn: Connection, version: int) -> None:
+    conn.execute(text(f"PRAGMA user_version = {int(version)}"))
+
+
+def run_migrations(conn: Connection) -> int:
+    """Bring the database schema up to :data:`SCHEMA_VERSION`.
+
+    A fresh database gets the full schema from the models and is stamped
+    with the latest version. An existing one gets any missing tables and then
+    every pending step in order. Returns the resulting schema version.
+    """
+    fresh = not inspect(conn).has_table("nodes")
+    Base.metadata.create_all(conn)
+    if fresh:
+        _set_schema_version(conn, SCHEMA_VERSION)
+        return SCHEMA_VERSION
+
+    version = get_schema_version(conn)
+    for step in MIGRATIONS[version:]:
+        step(conn)
+        version += 1
+        _set_schema_version(conn, version)
+    return version
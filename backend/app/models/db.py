@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import Boolean, Float, ForeignKey, Integer, String
+from sqlalchemy import Boolean, Float, ForeignKey, Index, Integer, String, Text, collate
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -18,15 +18,36 @@ class Material(Base):
     hardness: Mapped[float] = mapped_column(Float, nullable=False)
 
 
+# case-insensitive name search and keyset pagination of the catalogue
+Index("ix_materials_name_id", collate(Material.name, "NOCASE"), Material.id)
+
+
+class CatalogueState(Base):
+    """Single row holding the version of the shared material catalogue."""
+
+    __tablename__ = "catalogue_state"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # bumped by every create or delete of a material
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+
 class Project(Base):
     __tablename__ = "projects"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
+    # bumped by every mutation that changes the project's graph
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
 
 class Node(Base):
     __tablename__ = "nodes"
+    __table_args__ = (
+        Index("ix_nodes_project_parent", "project_id", "parent_id"),
+        Index("ix_nodes_parent_id", "parent_id"),
+        Index("ix_nodes_material_id", "material_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     project_id: Mapped[int] = mapped_column(ForeignKey("projects.id"))
@@ -42,8 +63,27 @@ class Node(Base):
     sustainability_score: Mapped[float | None] = mapped_column(Float, nullable=True)
 
 
+class NodeClosure(Base):
+    """Transitive closure of ``Node.parent_id``: one row per (ancestor, descendant).
+
+    Every node is its own ancestor at depth 0. Maintained by ``app.closure``.
+    """
+
+    __tablename__ = "node_closure"
+    __table_args__ = (Index("ix_node_closure_descendant", "descendant_id", "depth"),)
+
+    ancestor_id: Mapped[int] = mapped_column(ForeignKey("nodes.id"), primary_key=True)
+    descendant_id: Mapped[int] = mapped_column(ForeignKey("nodes.id"), primary_key=True)
+    depth: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
 class Relation(Base):
     __tablename__ = "relations"
+    __table_args__ = (
+        Index("ix_relations_project_id", "project_id"),
+        Index("ix_relations_source_id", "source_id"),
+        Index("ix_relations_target_id", "target_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     project_id: Mapped[int] = mapped_column(ForeignKey("projects.id"))
@@ -51,3 +91,14 @@ class Relation(Base):
     target_id: Mapped[int] = mapped_column(ForeignKey("nodes.id"))
 
 
+class Change(Base):
+    """Append-only log of graph mutations, one row per operation."""
+
+    __tablename__ = "changes"
+    __table_args__ = (Index("ix_changes_project_version", "project_id", "version"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    project_id: Mapped[int] = mapped_column(ForeignKey("projects.id"))
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    op: Mapped[str] = mapped_column(String, nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)  # JSON of the WebSocket message
@@ -30,6 +30,13 @@ class MaterialCreate(MaterialBase):
     pass
 
 
+class MaterialUpdate(BaseModel):
+    name: str | None = None
+    weight: float | None = Field(None, gt=0)
+    co2_value: float | None = Field(None, gt=0)
+    hardness: float | None = Field(None, gt=0)
+
+
 class Material(MaterialBase):
     id: int
 
@@ -37,6 +44,12 @@ class Material(MaterialBase):
         from_attributes = True
 
 
+class MaterialPage(BaseModel):
+    items: list[Material]
+    # pass as ``cursor`` to fetch the next page; ``None`` on the last page
+    next_cursor: str | None = None
+
+
 # ---------------------------------------------------------------------------
 # Nodes
 # ---------------------------------------------------------------------------
@@ -94,13 +107,77 @@ class NodeCreate(NodeBase):
         return values
 
 
+class NodeBulkItem(NodeBase):
+    """Node of a bulk import; may reference a parent of the same payload."""
+
+    # client-side temporary ID other items can use as ``parent_ref``
+    ref: str | None = None
+    parent_ref: str | None = None
+
+    @model_validator(mode="after")
+    def _validate_parent_id(self) -> "NodeBulkItem":
+        """Validate ``level`` against ``parent_id``/``parent_ref``."""
+        if self.parent_id is not None and self.parent_ref is not None:
+            raise ValueError("parent_id and parent_ref are mutually exclusive")
+        has_parent = self.parent_id is not None or self.parent_ref is not None
+        if self.level == 0 and has_parent:
+            raise ValueError("parent must be None when level is 0")
+        if self.level > 0 and not has_parent:
+            raise ValueError("parent_id or parent_ref must be provided when level > 0")
+        return self
+
+
+class NodeUpdate(BaseModel):
+    """Fields of a node to change; fields left out stay as they are.
+
+    ``parent_id`` moves the node together with its subtree (``None`` makes
+    it a root) and the levels follow from the new parent. ``atomic`` and
+    ``level`` cannot be set directly.
+    """
+
+    material_id: int | None = None
+    name: str | None = None
+    parent_id: int | None = None
+    reusable: bool | None = None
+    connection_type: ConnectionType | str | None = None
+    weight: float | None = Field(None, gt=0)
+    recyclable: bool | None = None
+
+
+class NodeBatchUpdate(NodeUpdate):
+    """One entry of a batch update: the node ``id`` and its changed fields."""
+
+    id: int
+
+
 class Node(NodeBase):
     id: int
+    # for non-atomic nodes this is the rolled-up score of the whole subtree
+    sustainability_score: float | None = None
 
     class Config:
         from_attributes = True
 
 
+class NodeInTree(Node):
+    # distance to the node the subtree or ancestor query started from
+    depth: int
+
+
+class Subtree(BaseModel):
+    id: int
+    nodes: list[NodeInTree]
+    # totals over the atomic nodes of the whole subtree, regardless of ``max_depth``
+    weight: float
+    sustainability_score: float | None = None
+
+
+class NodeBulkResult(BaseModel):
+    nodes: list[Node]
+    # maps each ``ref`` of the request to the ID the node was stored under
+    refs: dict[str, int]
+
+
 # ---------------------------------------------------------------------------
 # Relations
 # ---------------------------------------------------------------------------
@@ -141,6 +218,26 @@ class Project(ProjectBase):
         from_attributes = True
 
 
+class ProjectClone(BaseModel):
+    # defaults to the source name with a " (copy)" suffix
+    name: str | None = None
+
+
+class ProjectCloneResult(BaseModel):
+    project_id: int
+    # the copy of node ``n`` has the ID ``n + id_offset``
+    id_offset: int
+    nodes: int
+    relations: int
+
+
+class ProjectImportResult(BaseModel):
+    project_id: int
+    materials: int
+    nodes: int
+    relations: int
+
+
 # ---------------------------------------------------------------------------
 # Sustainability score tracking
 # ---------------------------------------------------------------------------
@@ -148,3 +245,32 @@ class Project(ProjectBase):
 class NodeScore(BaseModel):
     id: int
     sustainability_score: float
+
+
+class Scenario(BaseModel):
+    """Material substitutions applied to a project for a what-if score."""
+
+    name: str
+    # maps material IDs to the material ID that replaces them
+    substitutions: dict[int, int] = Field(default_factory=dict)
+
+
+class ScenarioResult(BaseModel):
+    name: str
+    total: float
+    delta: float
+
+
+# ---------------------------------------------------------------------------
+# Background jobs
+# ---------------------------------------------------------------------------
+
+class JobStatus(BaseModel):
+    id: int
+    kind: str
+    project_id: int | None = None
+    # queued, running, done, failed or cancelled
+    status: str
+    progress: float
+    result: dict | None = None
+    error: str | None = None
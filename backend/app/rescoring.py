@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Iterable
+
+import numpy as np
+from sqlalchemy import bindparam, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import material_cache
+from .database import chunked
+from .models.db import Node as NodeModel, NodeClosure
+from .rollup import subtree_total
+from .scoring import connection_codes, score_expression, score_kernel
+
+
+async def rescore_nodes(session: AsyncSession, project_id: int, node_ids: Iterable[int]) -> dict | None:
+    """Recompute the scores of ``node_ids`` and roll the change up their ancestor paths.
+
+    Only the given atomic nodes are scored. Each ancestor that already has a
+    roll-up gets the summed delta of its changed descendants; one that has
+    none yet is summed over its atomic descendants through the closure
+    table. Returns the ``update_scores`` event for the caller to commit and
+    broadcast, or ``None`` if no score changed.
+    """
+    rows = []
+    for chunk in chunked(sorted(node_ids)):
+        res = await session.execute(
+            select(
+                NodeModel.id,
+                NodeModel.sustainability_score,
+                NodeModel.material_id,
+                NodeModel.weight,
+                NodeModel.connection_type,
+                NodeModel.reusable,
+            )
+            .where(NodeModel.id.in_(chunk), NodeModel.project_id == project_id, NodeModel.atomic.is_(True))
+        )
+        rows.extend(res.all())
+    if not rows:
+        return None
+
+    ids, old, material_ids, weights, ctypes, reusable = zip(*rows)
+    materials = await material_cache.get_many(session, material_ids)
+    found = [materials.get(mid) for mid in material_ids]
+    values = score_kernel(
+        np.asarray([w or 0.0 for w in weights], dtype=np.float64),
+        np.asarray([(m["co2_value"] or 0.0) if m is not None else 0.0 for m in found], dtype=np.float64),
+        connection_codes(ctypes),
+        np.asarray(reusable, dtype=bool),
+    ).tolist()
+    changed: dict[int, tuple[float | None, float | None]] = {}
+    for nid, before, material, value in zip(ids, old, found, values):
+        after = value if material is not None else None
+        if after != before:
+            changed[nid] = (before, after)
+    if not changed:
+        return None
+    await session.execute(
+        update(NodeModel),
+        [{"id": nid, "sustainability_score": after} for nid, (_, after) in changed.items()],
+    )
+
+    deltas: dict[int, float] = defaultdict(float)
+    for chunk in chunked(list(changed)):
+        res = await session.execute(
+            select(NodeClosure.ancestor_id, NodeClosure.descendant_id).where(
+                NodeClosure.descendant_id.in_(chunk), NodeClosure.depth > 0
+            )
+        )
+        for ancestor, descendant in res.tuples():
+            before, after = changed[descendant]
+            deltas[ancestor] += (after or 0.0) - (before or 0.0)
+
+    nodes = NodeModel.__table__
+    if deltas:
+        await session.execute(
+            update(nodes)
+            .where(
+                nodes.c.id == bindparam("node_id"),
+                nodes.c.atomic.is_(False),
+                nodes.c.sustainability_score.is_not(None),
+            )
+            .values(sustainability_score=nodes.c.sustainability_score + bindparam("delta")),
+            [{"node_id": nid, "delta": delta} for nid, delta in deltas.items()],
+        )
+        total = subtree_total()
+        for chunk in chunked(list(deltas)):
+            await session.execute(
+                update(nodes)
+                .where(
+                    nodes.c.id.in_(chunk),
+                    nodes.c.atomic.is_(False),
+                    nodes.c.sustainability_score.is_(None),
+                )
+                .values(sustainability_score=total)
+            )
+
+    scores = {nid: after for nid, (_, after) in changed.items()}
+    for chunk in chunked(list(deltas)):
+        res = await session.execute(
+            select(NodeModel.id, NodeModel.sustainability_score).where(NodeModel.id.in_(chunk))
+        )
+        scores.update(res.tuples().all())
+    return {"op": "update_scores", "scores": [[nid, score] for nid, score in scores.items()]}
+
+
+async def rescore_material(session: AsyncSession, material_id: int, co2_value: float | None) -> dict[int, dict]:
+    """Rescore every atomic node using ``material_id`` with a new ``co2_value``, in all projects.
+
+    Two ``UPDATE`` statements do the work inside SQLite: one scores the
+    nodes found through ``ix_nodes_material_id`` with
+    :func:`app.scoring.score_expression`, one re-sums the roll-ups of all
+    their ancestors over the closure table. Only the new scores come back.
+    A ``co2_value`` of ``None`` (the material is being deleted) clears the
+    scores. Returns the ``update_scores`` event per affected project, for
+    the caller to log, commit and broadcast.
+    """
+    nodes = NodeModel.__table__
+    res = await session.execute(
+        update(nodes)
+        .where(nodes.c.material_id == material_id, nodes.c.atomic.is_(True))
+        .values(
+            sustainability_score=score_expression(
+                nodes.c.weight, literal(co2_value), nodes.c.connection_type, nodes.c.reusable
+            )
+        )
+        .returning(nodes.c.id, nodes.c.project_id, nodes.c.sustainability_score)
+    )
+    rows = res.all()
+    if not rows:
+        return {}
+
+    users = nodes.alias("users")
+    ancestors = (
+        select(NodeClosure.ancestor_id)
+        .join(users, users.c.id == NodeClosure.descendant_id)
+        .where(users.c.material_id == material_id, users.c.atomic.is_(True), NodeClosure.depth > 0)
+    )
+    res = await session.execute(
+        update(nodes)
+        .where(nodes.c.id.in_(ancestors), nodes.c.atomic.is_(False))
+        .values(sustainability_score=subtree_total())
+        .returning(nodes.c.id, nodes.c.project_id, nodes.c.sustainability_score)
+    )
+
+    per_project: dict[int, list] = defaultdict(list)
+    for nid, project_id, value in [*rows, *res.tuples()]:
+        per_project[project_id].append([nid, value])
+    return {pid: {"op": "update_scores", "scores": scores} for pid, scores in per_project.items()}
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models.db import Node as NodeModel, NodeClosure
+
+
+def subtree_total():
+    """Correlated sum of the atomic scores below the ``nodes`` row being updated."""
+    nodes = NodeModel.__table__
+    leaves = nodes.alias("leaves")
+    return (
+        select(func.sum(leaves.c.sustainability_score))
+        .join(NodeClosure, NodeClosure.descendant_id == leaves.c.id)
+        .where(NodeClosure.ancestor_id == nodes.c.id, leaves.c.atomic.is_(True))
+        .scalar_subquery()
+    )
+
+
+async def propagate_score_delta(session: AsyncSession, node_id: int, delta: float) -> None:
+    """Add ``delta`` to the rolled-up score of ``node_id`` and its ancestors.
+
+    Only the non-atomic nodes on the path to the root are touched, in a single
+    ``UPDATE`` that finds the path through the closure table; the caller owns
+    the transaction.
+    """
+    if not delta:
+        return
+    path = select(NodeClosure.ancestor_id).where(NodeClosure.descendant_id == node_id)
+    await session.execute(
+        update(NodeModel)
+        .where(
+            NodeModel.id.in_(path),
+            NodeModel.atomic.is_(False),
+            NodeModel.sustainability_score.is_not(None),
+        )
+        .values(sustainability_score=NodeModel.sustainability_score + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def fill_rollups(session: AsyncSession, node_id: int) -> None:
+    """Sum up the roll-ups on the path from ``node_id`` to the root that have none yet.
+
+    :func:`propagate_score_delta` skips such nodes; this gives them the total
+    of their atomic descendants instead.
+    """
+    path = select(NodeClosure.ancestor_id).where(NodeClosure.descendant_id == node_id)
+    nodes = NodeModel.__table__
+    await session.execute(
+        update(nodes)
+        .where(nodes.c.id.in_(path), nodes.c.atomic.is_(False), nodes.c.sustainability_score.is_(None))
+        .values(sustainability_score=subtree_total())
+    )
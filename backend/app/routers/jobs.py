@@ -0,0 +1,33 @@
+from fastapi import APIRouter, HTTPException
+
+from ..jobs import job_runner
+from ..models.schemas import JobStatus
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/", response_model=list[JobStatus])
+async def list_jobs(project_id: int | None = None):
+    """Active and recently finished jobs, optionally of one project."""
+    return [
+        JobStatus(**job.as_dict())
+        for job in job_runner.jobs.values()
+        if project_id is None or job.project_id == project_id
+    ]
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job(job_id: int):
+    job = job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatus(**job.as_dict())
+
+
+@router.delete("/{job_id}", response_model=JobStatus)
+async def cancel_job(job_id: int):
+    """Cancel a queued or running job; its open transaction is rolled back."""
+    job = job_runner.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatus(**job.as_dict())
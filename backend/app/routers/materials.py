@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import collate, literal, select, tuple_
 from sqlalchemy.exc import SQLAlchemyError
 
-from .websocket import broadcast
+from .websocket import broadcast, broadcast_many
+from ..cache import material_cache
 from ..database import get_session, get_write_session
-from ..models.schemas import Material, MaterialCreate
+from ..models.schemas import Material, MaterialCreate, MaterialPage, MaterialUpdate
 from ..models.db import Material as MaterialModel
+from ..rescoring import rescore_material
+from ..versioning import record_material_change
 
 router = APIRouter(prefix="/materials", tags=["materials"])
 
@@ -24,20 +30,88 @@ async def create_material(
     db_obj = MaterialModel(**material.model_dump())
     session.add(db_obj)
     try:
+        await session.flush()
+        message = {"op": "create_material", "id": db_obj.id}
+        await record_material_change(session, [], [message])
         await session.commit()
-        await session.refresh(db_obj)
     except SQLAlchemyError as exc:
         await session.rollback()
         raise HTTPException(status_code=500, detail="DB error") from exc
 
-    await broadcast(0, {"op": "create_material", "id": db_obj.id})
+    material_cache.invalidate()
+    await broadcast(0, message)
     return Material.model_validate(db_obj)
 
 
+@router.post("/bulk", response_model=list[Material])
+async def create_materials_bulk(
+    materials: list[MaterialCreate],
+    session: AsyncSession = Depends(get_write_session),
+):
+    """Insert many materials in one transaction with a single broadcast."""
+    db_objs = [MaterialModel(**m.model_dump()) for m in materials]
+    session.add_all(db_objs)
+    try:
+        await session.flush()
+        messages = [{"op": "create_material", "id": obj.id} for obj in db_objs]
+        await record_material_change(session, [], messages)
+        await session.commit()
+    except SQLAlchemyError as exc:
+        await session.rollback()
+        raise HTTPException(status_code=500, detail="DB error") from exc
+
+    material_cache.invalidate()
+    await broadcast_many(0, messages)
+    return [Material.model_validate(obj) for obj in db_objs]
+
+
 # ---------------------------------------------------------------------------
 # READ
 # ---------------------------------------------------------------------------
 
+def _encode_cursor(name: str, material_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([name, material_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        name, material_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(name), int(material_id)
+    except (ValueError, TypeError) as exc:
+        raise HTTPException(status_code=422, detail="Invalid cursor") from exc
+
+
+@router.get("/", response_model=MaterialPage)
+async def list_materials(
+    q: str | None = None,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    session: AsyncSession = Depends(get_session),
+):
+    """Page through the catalogue ordered by name, optionally by name prefix ``q``.
+
+    Pagination is keyset-based on ``(name, id)``: each page is a range scan
+    of ``ix_materials_name_id`` starting after the cursor, so deep pages cost
+    the same as the first one. The prefix match is case-insensitive.
+    """
+    name_key = collate(MaterialModel.name, "NOCASE")
+    stmt = select(MaterialModel).order_by(name_key, MaterialModel.id).limit(limit + 1)
+    if q:
+        escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        stmt = stmt.where(MaterialModel.name.like(f"{escaped}%", escape="\\"))
+    if cursor is not None:
+        name, last_id = _decode_cursor(cursor)
+        # collation on the right-hand side keeps the row value comparison indexable
+        stmt = stmt.where(
+            tuple_(MaterialModel.name, MaterialModel.id) > tuple_(collate(literal(name), "NOCASE"), literal(last_id))
+        )
+
+    rows = (await session.execute(stmt)).scalars().all()
+    items = [Material.model_validate(m) for m in rows[:limit]]
+    next_cursor = _encode_cursor(items[-1].name, items[-1].id) if len(rows) > limit else None
+    return MaterialPage(items=items, next_cursor=next_cursor)
+
+
 @router.get("/{material_id}", response_model=Material)
 async def get_material(
     material_id: int,
@@ -53,6 +127,54 @@ async def get_material(
     return Material.model_validate(db_obj)
 
 
+# ---------------------------------------------------------------------------
+# UPDATE
+# ---------------------------------------------------------------------------
+
+@router.patch("/{material_id}", response_model=Material)
+async def update_material(
+    material_id: int,
+    changes: MaterialUpdate,
+    session: AsyncSession = Depends(get_write_session),
+):
+    """Change fields of a material.
+
+    A new ``co2_value`` rescores the atomic nodes using the material in
+    every project and rolls the differences up their ancestor paths, in the
+    same transaction (see :func:`app.rescoring.rescore_material`). Only
+    projects using the material get the versioned ``update_material`` and
+    ``update_scores`` events; catalogue views receive ``update_material``.
+    """
+    result = await session.execute(select(MaterialModel).where(MaterialModel.id == material_id))
+    db_obj = result.scalar_one_or_none()
+    if db_obj is None:
+        raise HTTPException(status_code=404, detail="Material not found")
+
+    values = changes.model_dump(exclude_unset=True, exclude_none=True)
+    co2_changed = "co2_value" in values and values["co2_value"] != db_obj.co2_value
+    for field, value in values.items():
+        setattr(db_obj, field, value)
+    try:
+        await session.flush()
+        material = Material.model_validate(db_obj)
+        message = {"op": "update_material", "material": material.model_dump()}
+        scores = await rescore_material(session, material_id, db_obj.co2_value) if co2_changed else {}
+        per_project = await record_material_change(
+            session, [material_id], [message], {pid: [msg] for pid, msg in scores.items()}
+        )
+        await session.commit()
+    except SQLAlchemyError as exc:
+        await session.rollback()
+        raise HTTPException(status_code=500, detail="DB error") from exc
+    finally:
+        material_cache.invalidate()
+
+    for project_id, ops in per_project.items():
+        await broadcast_many(project_id, ops)
+    await broadcast(0, message, exclude=per_project)
+    return material
+
+
 # ---------------------------------------------------------------------------
 # DELETE
 # ---------------------------------------------------------------------------
@@ -62,20 +184,35 @@ async def delete_material(
     material_id: int,
     session: AsyncSession = Depends(get_write_session),
 ):
-    """Remove a material by its ID."""
-    # Optional: use the imported `delete` construct instead of loading the object
-    # await session.execute(delete(MaterialModel).where(MaterialModel.id == material_id))
-    # await session.commit()
+    """Remove a material by its ID.
 
-    # Or, as before, load-and-delete:
+    The nodes using it lose their score and the roll-ups above them are
+    re-summed in the same transaction, like a ``co2_value`` change in
+    :func:`update_material`.
+    """
     result = await session.execute(
         select(MaterialModel).where(MaterialModel.id == material_id)
     )
     db_obj = result.scalar_one_or_none()
     if db_obj is None:
         raise HTTPException(status_code=404, detail="Material not found")
-    await session.delete(db_obj)
-    await session.commit()
+    # nodes using the material lose their score, their ancestors are re-summed
+    try:
+        scores = await rescore_material(session, material_id, None)
+        await session.delete(db_obj)
+        message = {"op": "delete_material", "id": material_id}
+        per_project = await record_material_change(
+            session, [material_id], [message], {pid: [msg] for pid, msg in scores.items()}
+        )
+        await session.commit()
+    except SQLAlchemyError as exc:
+        await session.rollback()
+        raise HTTPException(status_code=500, detail="DB error") from exc
+    finally:
+        material_cache.invalidate()
 
-    await broadcast(0, {"op": "delete_material", "id": material_id})
+    # versioned to the projects using it, unversioned for catalogue views
+    for project_id, ops in per_project.items():
+        await broadcast_many(project_id, ops)
+    await broadcast(0, message, exclude=per_project)
     return {"ok": True}
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..metrics import registry
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request, SQL and WebSocket metrics in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,16 +1,80 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import delete, func, or_, select, update
 from sqlalchemy.exc import SQLAlchemyError
 
-from .websocket import broadcast
-from ..database import get_session, get_write_session
-from ..models.schemas import Node, NodeCreate, ConnectionType
-from ..models.db import Node as NodeModel, Project as ProjectModel
+from .websocket import broadcast_many
+from ..closure import add_nodes, delete_subtree, is_ancestor, move_subtree, relevel_subtree, remove_node
+from ..database import chunked, get_session, get_write_session
+from ..hierarchy import CycleError, post_order
+from ..rescoring import rescore_nodes
+from ..rollup import fill_rollups, propagate_score_delta
+from ..serialization import ORJSONResponse
+from ..versioning import record_change
+from ..models.schemas import (
+    Node, NodeBatchUpdate, NodeBulkItem, NodeBulkResult, NodeCreate, NodeInTree, NodeUpdate, Subtree, ConnectionType,
+)
+from ..models.db import (
+    Material as MaterialModel, Node as NodeModel, NodeClosure, Project as ProjectModel, Relation as RelationModel,
+)
 
 router = APIRouter(prefix="/nodes", tags=["nodes"])
 
 
+def _connection_type_values(ctype: ConnectionType | str | None) -> tuple[int | str | None, str | None]:
+    """Return the DB value and the response string for ``connection_type``."""
+    if isinstance(ctype, ConnectionType):
+        return int(ctype), ctype.name
+    if isinstance(ctype, str) and ctype.upper() in ConnectionType.__members__:
+        return int(ConnectionType[ctype.upper()]), ctype.upper()
+    return ctype, ctype
+
+
+# Spalten für Antworten; als Tupel gelesen, ohne ORM-Objekte zu erzeugen
+_NODE_COLUMNS = (
+    NodeModel.id,
+    NodeModel.project_id,
+    NodeModel.material_id,
+    NodeModel.name,
+    NodeModel.parent_id,
+    NodeModel.atomic,
+    NodeModel.reusable,
+    NodeModel.connection_type,
+    NodeModel.level,
+    NodeModel.weight,
+    NodeModel.recyclable,
+    NodeModel.sustainability_score,
+)
+
+
+def _node_fields(db_obj) -> dict:
+    """Response fields of a stored node (ORM object or row of ``_NODE_COLUMNS``).
+
+    ``connection_type`` is mapped back to its name.
+    """
+    ctype_val = db_obj.connection_type
+    ctype_resp: str | None = None
+    if isinstance(ctype_val, int):
+        try:
+            ctype_resp = ConnectionType(ctype_val).name
+        except ValueError:
+            ctype_resp = str(ctype_val)
+    return {
+        "id": db_obj.id,
+        "project_id": db_obj.project_id,
+        "material_id": db_obj.material_id,
+        "name": db_obj.name,
+        "parent_id": db_obj.parent_id,
+        "atomic": db_obj.atomic,
+        "reusable": db_obj.reusable,
+        "connection_type": ctype_resp,
+        "level": db_obj.level,
+        "weight": db_obj.weight,
+        "recyclable": db_obj.recyclable,
+        "sustainability_score": db_obj.sustainability_score,
+    }
+
+
 @router.post("/", response_model=Node)
 async def create_node(
     node: NodeCreate,
@@ -28,16 +92,7 @@ async def create_node(
             raise HTTPException(status_code=404, detail="Parent node not found")
 
     # Verarbeite connection_type in DB-Wert und Response-String
-    ctype_db = node.connection_type
-    if isinstance(ctype_db, ConnectionType):
-        ctype_db_val = int(ctype_db)
-        ctype_resp = ctype_db.name
-    elif isinstance(ctype_db, str) and ctype_db.upper() in ConnectionType.__members__:
-        ctype_db_val = int(ConnectionType[ctype_db.upper()])
-        ctype_resp = ctype_db.upper()
-    else:
-        ctype_db_val = ctype_db
-        ctype_resp = ctype_db
+    ctype_db_val, ctype_resp = _connection_type_values(node.connection_type)
 
     # Erstelle das Node-Objekt
     db_obj = NodeModel(
@@ -54,32 +109,169 @@ async def create_node(
     )
     session.add(db_obj)
 
-    # Commit und Refresh mit Fehlerbehandlung
+    # Flush für die ID, Score samt Roll-ups nachziehen, protokollieren und committen
     try:
+        await session.flush()
+        await add_nodes(session, [db_obj.id])
+        scores = await rescore_nodes(session, node.project_id, [db_obj.id])
+        node_data = {
+            "id": db_obj.id,
+            "project_id": node.project_id,
+            "material_id": node.material_id,
+            "name": node.name,
+            "parent_id": node.parent_id,
+            "atomic": node.atomic,
+            "reusable": node.reusable,
+            "connection_type": ctype_resp,
+            "level": node.level,
+            "weight": node.weight if node.atomic else None,
+            "recyclable": node.recyclable,
+            "sustainability_score": dict(scores["scores"]).get(db_obj.id) if scores else None,
+        }
+        ops = [{"op": "create_node", "node": node_data}]
+        if scores is not None:
+            ops.append(scores)
+        await record_change(session, node.project_id, ops)
         await session.commit()
-        await session.refresh(db_obj)
     except SQLAlchemyError as exc:
         await session.rollback()
         raise HTTPException(status_code=500, detail="DB error") from exc
 
-    # Bereite das Response-Objekt vor
-    node_data = {
-        "id": db_obj.id,
-        "project_id": node.project_id,
-        "material_id": node.material_id,
-        "name": node.name,
-        "parent_id": node.parent_id,
-        "atomic": node.atomic,
-        "reusable": node.reusable,
-        "connection_type": ctype_resp,
-        "level": node.level,
-        "weight": node.weight if node.atomic else None,
-        "recyclable": node.recyclable,
-    }
+    # Broadcasten und zurückgeben; die Daten sind geprüft, keine erneute Validierung
+    await broadcast_many(node.project_id, ops)
+    return ORJSONResponse(node_data)
+
 
-    # Broadcasten und zurückgeben
-    await broadcast(node.project_id, {"op": "create_node", "node": node_data})
-    return Node(**node_data)
+@router.post("/bulk", response_model=NodeBulkResult)
+async def create_nodes_bulk(
+    items: list[NodeBulkItem],
+    session: AsyncSession = Depends(get_write_session),
+):
+    """Insert many nodes in one transaction.
+
+    Parents are either existing nodes (``parent_id``, validated with one
+    set-based query) or items of the same payload (``parent_ref``). Items are
+    inserted level by level so every child knows its parent's new ID, the new
+    parts are scored and rolled up their ancestor paths in the same
+    transaction, and a single aggregated broadcast is sent per project.
+    """
+    # Temporäre IDs auflösen
+    by_ref: dict[str, int] = {}
+    for idx, item in enumerate(items):
+        if item.ref is not None:
+            if item.ref in by_ref:
+                raise HTTPException(status_code=422, detail=f"Duplicate ref {item.ref!r}")
+            by_ref[item.ref] = idx
+    unknown = sorted({i.parent_ref for i in items if i.parent_ref is not None and i.parent_ref not in by_ref})
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown parent_ref: {unknown}")
+    # parent_ref darf nicht in ein anderes Projekt zeigen
+    foreign = sorted(
+        item.ref if item.ref is not None else str(idx)
+        for idx, item in enumerate(items)
+        if item.parent_ref is not None and items[by_ref[item.parent_ref]].project_id != item.project_id
+    )
+    if foreign:
+        raise HTTPException(status_code=422, detail=f"parent_ref in another project for items: {foreign}")
+
+    try:
+        order = post_order({
+            idx: by_ref[item.parent_ref] if item.parent_ref is not None else None
+            for idx, item in enumerate(items)
+        })
+    except CycleError as exc:
+        raise HTTPException(status_code=422, detail=f"parent_ref cycle between items {exc.node_ids}") from exc
+
+    # Bestehende Parents mit einer Abfrage pro Chunk prüfen
+    wanted = {(i.parent_id, i.project_id) for i in items if i.parent_id is not None}
+    found: set[tuple[int, int]] = set()
+    parent_ids = sorted({pid for pid, _ in wanted})
+    for chunk in chunked(parent_ids):
+        res = await session.execute(
+            select(NodeModel.id, NodeModel.project_id).where(NodeModel.id.in_(chunk))
+        )
+        found.update(res.tuples())
+    missing = sorted(pid for pid, project in wanted if (pid, project) not in found)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Parent node not found: {missing}")
+
+    # Ebenenweise einfügen: post_order liefert Kinder vor Eltern, also umdrehen
+    depth: dict[int, int] = {}
+    for idx in reversed(order):
+        ref = items[idx].parent_ref
+        depth[idx] = depth[by_ref[ref]] + 1 if ref is not None else 0
+    layers: dict[int, list[int]] = {}
+    for idx in range(len(items)):
+        layers.setdefault(depth[idx], []).append(idx)
+
+    db_objs: list[NodeModel | None] = [None] * len(items)
+    ctype_resps: list[str | None] = [None] * len(items)
+    try:
+        for d in sorted(layers):
+            for idx in layers[d]:
+                item = items[idx]
+                parent_id = item.parent_id
+                if item.parent_ref is not None:
+                    parent_id = db_objs[by_ref[item.parent_ref]].id
+                ctype_db_val, ctype_resps[idx] = _connection_type_values(item.connection_type)
+                db_objs[idx] = NodeModel(
+                    project_id=item.project_id,
+                    material_id=item.material_id,
+                    name=item.name,
+                    parent_id=parent_id,
+                    atomic=item.atomic,
+                    reusable=item.reusable,
+                    connection_type=ctype_db_val,
+                    level=item.level,
+                    weight=item.weight if item.atomic else None,
+                    recyclable=item.recyclable,
+                )
+            session.add_all([db_objs[idx] for idx in layers[d]])
+            await session.flush()
+            await add_nodes(session, [db_objs[idx].id for idx in layers[d]])
+
+        per_project: dict[int, list[int]] = {}
+        for obj in db_objs:
+            per_project.setdefault(obj.project_id, []).append(obj.id)
+        scores = {pid: await rescore_nodes(session, pid, ids) for pid, ids in per_project.items()}
+        score_of = {nid: score for msg in scores.values() if msg for nid, score in msg["scores"]}
+
+        node_data = [
+            {
+                "id": obj.id,
+                "project_id": obj.project_id,
+                "material_id": obj.material_id,
+                "name": obj.name,
+                "parent_id": obj.parent_id,
+                "atomic": obj.atomic,
+                "reusable": obj.reusable,
+                "connection_type": ctype,
+                "level": obj.level,
+                "weight": obj.weight,
+                "recyclable": obj.recyclable,
+                "sustainability_score": score_of.get(obj.id),
+            }
+            for obj, ctype in zip(db_objs, ctype_resps)
+        ]
+        project_ops: dict[int, list[dict]] = {}
+        for data in node_data:
+            project_ops.setdefault(data["project_id"], []).append({"op": "create_node", "node": data})
+        for pid, ops in project_ops.items():
+            if scores[pid] is not None:
+                ops.append(scores[pid])
+            await record_change(session, pid, ops)
+        await session.commit()
+    except SQLAlchemyError as exc:
+        await session.rollback()
+        raise HTTPException(status_code=500, detail="DB error") from exc
+
+    for pid, ops in project_ops.items():
+        await broadcast_many(pid, ops)
+
+    return ORJSONResponse({
+        "nodes": node_data,
+        "refs": {ref: db_objs[idx].id for ref, idx in by_ref.items()},
+    })
 
 
 @router.get("/{node_id}", response_model=Node)
@@ -87,47 +279,322 @@ async def get_node(
     node_id: int,
     session: AsyncSession = Depends(get_session),
 ):
-    result = await session.execute(select(NodeModel).where(NodeModel.id == node_id))
-    db_obj = result.scalar_one_or_none()
-    if db_obj is None:
+    result = await session.execute(select(*_NODE_COLUMNS).where(NodeModel.id == node_id))
+    row = result.one_or_none()
+    if row is None:
         raise HTTPException(status_code=404, detail="Node not found")
 
-    # Mappe connection_type zurück auf den Namen
-    ctype_val = db_obj.connection_type
-    ctype_resp: str | None = None
-    if isinstance(ctype_val, int):
-        try:
-            ctype_resp = ConnectionType(ctype_val).name
-        except ValueError:
-            ctype_resp = str(ctype_val)
+    return ORJSONResponse(_node_fields(row))
+
+
+@router.get("/{node_id}/subtree", response_model=Subtree)
+async def get_subtree(
+    node_id: int,
+    max_depth: int | None = Query(None, ge=0),
+    session: AsyncSession = Depends(get_session),
+):
+    """The node and its descendants, nearest levels first, plus subtree totals.
+
+    Both the rows and the totals come from the closure table, so the rest of
+    the project is never loaded.
+    """
+    below = select(*_NODE_COLUMNS, NodeClosure.depth).join(
+        NodeClosure, NodeClosure.descendant_id == NodeModel.id
+    ).where(NodeClosure.ancestor_id == node_id)
+    if max_depth is not None:
+        below = below.where(NodeClosure.depth <= max_depth)
+    rows = (await session.execute(below.order_by(NodeClosure.depth, NodeModel.id))).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Node not found")
 
-    return Node(
-        id=db_obj.id,
-        project_id=db_obj.project_id,
-        material_id=db_obj.material_id,
-        name=db_obj.name,
-        parent_id=db_obj.parent_id,
-        atomic=db_obj.atomic,
-        reusable=db_obj.reusable,
-        connection_type=ctype_resp,
-        level=db_obj.level,
-        weight=db_obj.weight,
-        recyclable=db_obj.recyclable,
+    # Summen über alle atomaren Knoten des Teilbaums
+    totals = await session.execute(
+        select(func.total(NodeModel.weight), func.sum(NodeModel.sustainability_score))
+        .join(NodeClosure, NodeClosure.descendant_id == NodeModel.id)
+        .where(NodeClosure.ancestor_id == node_id, NodeModel.atomic.is_(True))
     )
+    weight, score = totals.one()
+    return ORJSONResponse({
+        "id": node_id,
+        "nodes": [_node_fields(row) | {"depth": row.depth} for row in rows],
+        "weight": weight,
+        "sustainability_score": score,
+    })
+
+
+@router.get("/{node_id}/ancestors", response_model=list[NodeInTree])
+async def get_ancestors(
+    node_id: int,
+    session: AsyncSession = Depends(get_session),
+):
+    """The path from the parent of ``node_id`` up to its root, nearest first."""
+    res = await session.execute(select(NodeModel.id).where(NodeModel.id == node_id))
+    if res.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    rows = await session.execute(
+        select(*_NODE_COLUMNS, NodeClosure.depth)
+        .join(NodeClosure, NodeClosure.ancestor_id == NodeModel.id)
+        .where(NodeClosure.descendant_id == node_id, NodeClosure.depth > 0)
+        .order_by(NodeClosure.depth)
+    )
+    return ORJSONResponse([_node_fields(row) | {"depth": row.depth} for row in rows])
+
+
+# Felder, von denen der Score eines atomaren Knotens abhängt
+_SCORE_FIELDS = {"material_id", "weight", "connection_type", "reusable"}
+# Felder, die per PATCH auf None gesetzt werden dürfen; sonst heißt None "unverändert"
+_NULLABLE_FIELDS = {"parent_id", "connection_type"}
+
+
+async def _move_node(
+    session: AsyncSession, node_id: int, project_id: int, parent_id: int | None
+) -> tuple[set[int], list[tuple[int, int]]]:
+    """Hängt ``node_id`` samt Teilbaum unter ``parent_id`` (``None``: wird Wurzel).
+
+    Liefert die Vorfahren beider Pfade, deren Roll-up sich geändert hat, und
+    die neuen Ebenen des Teilbaums.
+    """
+    res = await session.execute(
+        select(NodeModel.parent_id, NodeModel.sustainability_score).where(NodeModel.id == node_id)
+    )
+    old_parent_id, score = res.one()
+    if old_parent_id == parent_id:
+        return set(), []
+
+    level = 0
+    if parent_id is not None:
+        res = await session.execute(
+            select(NodeModel.level).where(NodeModel.id == parent_id, NodeModel.project_id == project_id)
+        )
+        parent_level = res.scalar_one_or_none()
+        if parent_level is None:
+            raise HTTPException(status_code=404, detail=f"Parent node not found: {parent_id}")
+        # Zyklusprüfung mit einem Lookup im Closure-Index statt den Pfad abzulaufen
+        if await is_ancestor(session, node_id, parent_id):
+            raise HTTPException(
+                status_code=422, detail=f"Cannot move node {node_id} below itself or its descendant {parent_id}"
+            )
+        level = parent_level + 1
+
+    ancestors = select(NodeClosure.ancestor_id).where(NodeClosure.descendant_id == node_id, NodeClosure.depth > 0)
+    touched = set((await session.execute(ancestors)).scalars())
+    # Nur die Roll-ups auf dem alten und dem neuen Pfad zur Wurzel anpassen
+    if old_parent_id is not None:
+        await propagate_score_delta(session, old_parent_id, -(score or 0.0))
+    await move_subtree(session, node_id, parent_id)
+    await session.execute(
+        update(NodeModel)
+        .where(NodeModel.id == node_id)
+        .values(parent_id=parent_id)
+        .execution_options(synchronize_session=False)
+    )
+    levels = await relevel_subtree(session, node_id, level)
+    if parent_id is not None:
+        await propagate_score_delta(session, parent_id, score or 0.0)
+        await fill_rollups(session, parent_id)
+        touched.update((await session.execute(ancestors)).scalars())
+    return touched, levels
+
+
+async def _apply_updates(
+    session: AsyncSession, updates: list[tuple[int, NodeUpdate]]
+) -> tuple[list[dict], dict[int, list[dict]]]:
+    """Apply ``updates`` in order; return the updated nodes and the events per project.
+
+    Invalid entries raise an ``HTTPException``; the caller owns the transaction.
+    """
+    # Knoten und Materialien mit einer Abfrage pro Chunk prüfen
+    node_ids = list(dict.fromkeys(nid for nid, _ in updates))
+    found = {}
+    for chunk in chunked(node_ids):
+        res = await session.execute(
+            select(NodeModel.id, NodeModel.project_id, NodeModel.atomic).where(NodeModel.id.in_(chunk))
+        )
+        found.update((row.id, row) for row in res)
+    missing = sorted(nid for nid in node_ids if nid not in found)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Node not found: {missing}")
+    material_ids = sorted({c.material_id for _, c in updates if c.material_id is not None})
+    known: set[int] = set()
+    for chunk in chunked(material_ids):
+        res = await session.execute(select(MaterialModel.id).where(MaterialModel.id.in_(chunk)))
+        known.update(res.scalars())
+    unknown = [mid for mid in material_ids if mid not in known]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Material not found: {unknown}")
+    not_atomic = sorted({nid for nid, c in updates if c.weight is not None and not found[nid].atomic})
+    if not_atomic:
+        raise HTTPException(status_code=422, detail=f"weight can only be set on atomic nodes: {not_atomic}")
+
+    rescore: dict[int, set[int]] = {}
+    touched: dict[int, set[int]] = {}
+    levels: dict[int, dict[int, int]] = {}
+    for node_id, changes in updates:
+        pid = found[node_id].project_id
+        values = {
+            field: value
+            for field, value in changes.model_dump(exclude_unset=True, exclude={"id"}).items()
+            if value is not None or field in _NULLABLE_FIELDS
+        }
+        if "parent_id" in values:
+            ancestors, moved = await _move_node(session, node_id, pid, values.pop("parent_id"))
+            touched.setdefault(pid, set()).update(ancestors)
+            levels.setdefault(pid, {}).update(moved)
+        if "connection_type" in values:
+            values["connection_type"], _ = _connection_type_values(values["connection_type"])
+        if values:
+            await session.execute(
+                update(NodeModel)
+                .where(NodeModel.id == node_id)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            if found[node_id].atomic and values.keys() & _SCORE_FIELDS:
+                rescore.setdefault(pid, set()).add(node_id)
+
+    # Scores erst am Ende, dann über die endgültigen Pfade
+    scores: dict[int, dict[int, float | None]] = {}
+    for pid, ids in rescore.items():
+        message = await rescore_nodes(session, pid, ids)
+        if message is not None:
+            scores.setdefault(pid, {}).update(message["scores"])
+    for pid, ids in touched.items():
+        for chunk in chunked(sorted(ids - scores.get(pid, {}).keys())):
+            res = await session.execute(
+                select(NodeModel.id, NodeModel.sustainability_score).where(NodeModel.id.in_(chunk))
+            )
+            scores.setdefault(pid, {}).update(res.tuples().all())
+
+    rows = {}
+    for chunk in chunked(node_ids):
+        res = await session.execute(select(*_NODE_COLUMNS).where(NodeModel.id.in_(chunk)))
+        rows.update((row.id, _node_fields(row)) for row in res)
+    node_data = [rows[nid] for nid in node_ids]
+
+    project_ops: dict[int, list[dict]] = {}
+    for data in node_data:
+        project_ops.setdefault(data["project_id"], []).append({"op": "update_node", "node": data})
+    for pid, ops in project_ops.items():
+        if levels.get(pid):
+            ops.append({"op": "update_levels", "levels": [[nid, lvl] for nid, lvl in levels[pid].items()]})
+        if scores.get(pid):
+            ops.append({"op": "update_scores", "scores": [[nid, sc] for nid, sc in scores[pid].items()]})
+    return node_data, project_ops
+
+
+@router.patch("/", response_model=list[Node])
+async def update_nodes(
+    items: list[NodeBatchUpdate],
+    session: AsyncSession = Depends(get_write_session),
+):
+    """Change fields of many nodes in one transaction.
+
+    Items are applied in order, so a later item sees the moves of earlier
+    ones. Each project gets one ``update_node`` event per node plus at most
+    one ``update_levels`` and one ``update_scores`` event. Returns the
+    updated nodes, each once, in the order they first appear.
+    """
+    try:
+        node_data, project_ops = await _apply_updates(session, [(item.id, item) for item in items])
+        for pid, ops in project_ops.items():
+            await record_change(session, pid, ops)
+        await session.commit()
+    except SQLAlchemyError as exc:
+        await session.rollback()
+        raise HTTPException(status_code=500, detail="DB error") from exc
+
+    for pid, ops in project_ops.items():
+        await broadcast_many(pid, ops)
+    return ORJSONResponse(node_data)
+
+
+@router.patch("/{node_id}", response_model=Node)
+async def update_node(
+    node_id: int,
+    changes: NodeUpdate,
+    session: AsyncSession = Depends(get_write_session),
+):
+    """Change fields of a node, keeping its ID and relations.
+
+    A new ``parent_id`` moves the node with its whole subtree: the cycle
+    check is one closure lookup, the levels of the subtree are rewritten by
+    one ``UPDATE`` and only the roll-ups on the old and the new path to the
+    root change. Changing ``material_id``, ``weight``, ``connection_type``
+    or ``reusable`` of an atomic node rescores it.
+    """
+    try:
+        node_data, project_ops = await _apply_updates(session, [(node_id, changes)])
+        for pid, ops in project_ops.items():
+            await record_change(session, pid, ops)
+        await session.commit()
+    except SQLAlchemyError as exc:
+        await session.rollback()
+        raise HTTPException(status_code=500, detail="DB error") from exc
+
+    for pid, ops in project_ops.items():
+        await broadcast_many(pid, ops)
+    return ORJSONResponse(node_data[0])
 
 
 @router.delete("/{node_id}")
 async def delete_node(
     node_id: int,
+    cascade: bool = False,
     session: AsyncSession = Depends(get_write_session),
 ):
+    """Delete a node; with ``cascade`` also its subtree and all touching relations.
+
+    Without ``cascade`` the children stay and become roots: their
+    ``parent_id`` is cleared and the levels of their subtrees restart at 0,
+    announced with ``update_node`` and ``update_levels`` events next to the
+    ``delete_node``; relations touching the node are deleted either way.
+    The cascading variant runs set-based in one transaction and is announced
+    with a single ``delete_subtree`` event listing the removed node IDs.
+    """
     res = await session.execute(select(NodeModel).where(NodeModel.id == node_id))
     db_obj = res.scalar_one_or_none()
     if db_obj is None:
         raise HTTPException(status_code=404, detail="Node not found")
 
     pid = db_obj.project_id
-    await session.delete(db_obj)
-    await session.commit()
-    await broadcast(pid, {"op": "delete_node", "id": node_id})
-    return {"ok": True}
+    result = {"ok": True}
+    try:
+        # Nur die Roll-up-Scores auf dem Pfad zur Wurzel anpassen
+        if db_obj.parent_id is not None and db_obj.sustainability_score:
+            await propagate_score_delta(session, db_obj.parent_id, -db_obj.sustainability_score)
+        if cascade:
+            node_ids, relation_count = await delete_subtree(session, node_id)
+            ops = [{"op": "delete_subtree", "id": node_id, "nodes": node_ids}]
+            result |= {"nodes": len(node_ids), "relations": relation_count}
+        else:
+            res = await session.execute(
+                delete(RelationModel)
+                .where(or_(RelationModel.source_id == node_id, RelationModel.target_id == node_id))
+                .returning(RelationModel.id)
+                .execution_options(synchronize_session=False)
+            )
+            ops = [{"op": "delete_relation", "id": rid} for rid in res.scalars()]
+            # Kinder werden Wurzeln: Ebenen ihrer Teilbäume ab 0 neu zählen
+            # (der Knoten selbst bekommt -1, wird aber gleich gelöscht)
+            levels = [[nid, level] for nid, level in await relevel_subtree(session, node_id, -1) if nid != node_id]
+            res = await session.execute(
+                update(NodeModel)
+                .where(NodeModel.parent_id == node_id)
+                .values(parent_id=None)
+                .returning(*_NODE_COLUMNS)
+                .execution_options(synchronize_session=False)
+            )
+            children = [{"op": "update_node", "node": _node_fields(row)} for row in res]
+            await remove_node(session, node_id)
+            await session.delete(db_obj)
+            ops.append({"op": "delete_node", "id": node_id})
+            ops += children
+            if levels:
+                ops.append({"op": "update_levels", "levels": levels})
+        await record_change(session, pid, ops)
+        await session.commit()
+    except SQLAlchemyError as exc:
+        await session.rollback()
+        raise HTTPException(status_code=500, detail="DB error") from exc
+    await broadcast_many(pid, ops)
+    return result
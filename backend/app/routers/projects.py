@@ -1,15 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
+import tempfile
+from typing import IO, AsyncIterator
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 
 from .websocket import broadcast
-from ..database import get_session, get_write_session
-from ..models.schemas import Project, ProjectCreate, ConnectionType
-from ..models.db import Project as ProjectModel, Node as NodeModel, Relation as RelationModel, Material as MaterialModel
+from ..cache import graph_cache, material_cache
+from ..columnar import MEDIA_TYPE as COLUMNAR_MEDIA_TYPE, encode_graph
+from ..hierarchy import CycleError, aggregate
+from ..jobs import Job, job_runner
+from ..serialization import dumps
+from ..database import begin_snapshot, get_session, get_sessionmaker, get_write_session, get_write_sessionmaker
+from ..transfer import TransferError, copy_project, export_ndjson, import_ndjson
+from ..versioning import catalogue_version, changes_since
+from ..models.schemas import (
+    ConnectionType,
+    Project,
+    ProjectClone,
+    ProjectCloneResult,
+    ProjectCreate,
+    ProjectImportResult,
+)
+from ..models.db import Project as ProjectModel, Node as NodeModel, Relation as RelationModel
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
+# Uploads for background imports are buffered in memory up to this size, then on disk.
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
+
 
 # ---------------------------------------------------------------------------
 # CREATE
@@ -33,6 +54,84 @@ async def create_project(
     return Project(id=db_obj.id, name=db_obj.name)
 
 
+@router.post("/{project_id}/clone", response_model=ProjectCloneResult)
+async def clone_project(
+    project_id: int,
+    clone: ProjectClone | None = None,
+    session: AsyncSession = Depends(get_write_session),
+):
+    """Duplicate a project, e.g. to try alternative materials on a variant.
+
+    Nodes with their scores, relations and the hierarchy index are copied
+    with set-based ``INSERT ... SELECT`` statements in one transaction, see
+    :func:`app.transfer.copy_project`.
+    """
+    res = await session.execute(select(ProjectModel.name).where(ProjectModel.id == project_id))
+    name = res.scalar_one_or_none()
+    if name is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    try:
+        result = await copy_project(session, project_id, clone.name if clone and clone.name else f"{name} (copy)")
+        await session.commit()
+    except SQLAlchemyError as exc:
+        await session.rollback()
+        raise HTTPException(status_code=500, detail="DB error") from exc
+
+    await broadcast(result["project_id"], {"op": "create_project", "id": result["project_id"]})
+    return ProjectCloneResult(**result)
+
+
+async def _import_job(
+    job: Job,
+    factory: async_sessionmaker[AsyncSession],
+    spool: IO[bytes],
+    size: int,
+) -> dict:
+    """Body of an ``async`` import: feed the buffered upload to the importer."""
+    async def chunks() -> AsyncIterator[bytes]:
+        done = 0
+        while chunk := spool.read(64 * 1024):
+            done += len(chunk)
+            job.report(done / size)
+            yield chunk
+
+    try:
+        return await import_ndjson(factory, chunks())
+    finally:
+        spool.close()
+
+
+@router.post("/import", response_model=ProjectImportResult)
+async def import_project(
+    request: Request,
+    run_async: bool = Query(False, alias="async"),
+    factory: async_sessionmaker[AsyncSession] = Depends(get_write_sessionmaker),
+):
+    """Create a project from an NDJSON export streamed in the request body.
+
+    The body is parsed while it arrives and written in chunked transactions,
+    so memory does not grow with the size of the upload. With
+    ``async=true`` the upload is buffered to a temporary file and imported
+    by a background job; ``202`` with the job is returned once the body has
+    been received, and the job's ``result`` holds the import counts.
+    """
+    if run_async:
+        spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES)
+        size = 0
+        async for chunk in request.stream():
+            spool.write(chunk)
+            size += len(chunk)
+        spool.seek(0)
+        job = job_runner.submit("import", None, lambda job: _import_job(job, factory, spool, size))
+        return JSONResponse(status_code=202, content=job.as_dict())
+
+    try:
+        result = await import_ndjson(factory, request.stream())
+    except TransferError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return ProjectImportResult(**result)
+
+
 # ---------------------------------------------------------------------------
 # READ
 # ---------------------------------------------------------------------------
@@ -49,6 +148,23 @@ async def get_project(
     return Project(id=db_obj.id, name=db_obj.name)
 
 
+@router.get("/{project_id}/export")
+async def export_project(
+    project_id: int,
+    session: AsyncSession = Depends(get_session),
+    factory: async_sessionmaker[AsyncSession] = Depends(get_sessionmaker),
+):
+    """Stream the project as NDJSON records, see :func:`app.transfer.export_ndjson`."""
+    res = await session.execute(select(ProjectModel.id).where(ProjectModel.id == project_id))
+    if res.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return StreamingResponse(
+        export_ndjson(factory, project_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="project-{project_id}.ndjson"'},
+    )
+
+
 # ---------------------------------------------------------------------------
 # GRAPH
 # ---------------------------------------------------------------------------
@@ -56,83 +172,137 @@ async def get_project(
 @router.get("/{project_id}/graph")
 async def get_graph(
     project_id: int,
+    since: int | None = None,
+    include_catalogue: bool = False,
+    format: str | None = Query(None, pattern="^(json|columnar)$"),
+    accept: str | None = Header(None),
+    if_none_match: str | None = Header(None),
     session: AsyncSession = Depends(get_session),
 ):
-    result_nodes = await session.execute(select(NodeModel).where(NodeModel.project_id == project_id))
-    nodes = []
-    for db_node in result_nodes.scalars():
-        cval = db_node.connection_type
-        if isinstance(cval, int):
-            try:
-                cval = ConnectionType(cval).name
-            except ValueError:
-                cval = str(cval)
-        nodes.append(
-            {
-                "id": db_node.id,
-                "material_id": db_node.material_id,
-                "name": db_node.name,
-                "parent_id": db_node.parent_id,
-                "atomic": db_node.atomic,
-                "reusable": db_node.reusable,
-                "connection_type": cval,
-                "level": db_node.level,
-                "weight": db_node.weight,
-                "recyclable": db_node.recyclable,
-                "sustainability_score": db_node.sustainability_score,
-            }
-        )
+    """Return nodes, edges and materials of a project.
 
-    # 2) Edges
-    result_edges = await session.execute(select(RelationModel).where(RelationModel.project_id == project_id))
-    edges = [
-        {"id": rel.id, "source": rel.source_id, "target": rel.target_id}
-        for rel in result_edges.scalars()
-    ]
+    Only materials referenced by the project's nodes are included; with
+    ``include_catalogue`` the full material catalogue is sent instead.
 
-    # 3) Materials
-    res_mats = await session.execute(select(MaterialModel))
-    materials = [
-        {
-            "id": m.id,
-            "name": m.name,
-            "weight": m.weight,
-            "co2_value": m.co2_value,
-            "hardness": m.hardness,
-        }
-        for m in res_mats.scalars()
-    ]
+    Responses carry an ``ETag`` derived from the project's graph version
+    (and the catalogue version for ``include_catalogue``).
+    Serialised snapshots are kept in an LRU cache per ``(project, version)``,
+    so an unchanged project costs one primary-key lookup, and a matching
+    ``If-None-Match`` yields ``304 Not Modified``.
 
-    # ---------------------------------------------------------------------
-    # Aggregate weights for non-atomic nodes (recursive, detects cycles)
-    # ---------------------------------------------------------------------
-    node_map = {n["id"]: n for n in nodes}
+    With ``since`` only the logged changes after that version are returned
+    as ``{"version": ..., "changes": [...]}``. If the change log no longer
+    reaches back that far, the full snapshot is sent instead.
+
+    ``format=columnar`` or an ``Accept`` header naming
+    ``application/vnd.dimop.graph+columnar`` selects the binary
+    struct-of-arrays snapshot described in :mod:`app.columnar`; changes
+    are always JSON.
+
+    The version and the graph are read in one snapshot, so a cached body
+    never contains changes newer than the version it is stored under.
+    """
+    await begin_snapshot(session)
+    res = await session.execute(select(ProjectModel.version).where(ProjectModel.id == project_id))
+    version = res.scalar_one_or_none() or 0
+    variant = ("catalogue", await catalogue_version(session)) if include_catalogue else ()
+    if format is None:
+        format = "columnar" if accept is not None and COLUMNAR_MEDIA_TYPE in accept else "json"
+    if format == "columnar":
+        variant += ("columnar",)
+    etag = '"' + "-".join(map(str, (project_id, version, *variant))) + '"'
+    headers = {"ETag": etag, "Vary": "Accept"}
+    if if_none_match is not None and etag in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
 
-    def calc_weight(nid: int, visited: set[int]) -> float:
-        if nid in visited:
-            raise HTTPException(status_code=400, detail="Cycle detected")
+    if since is not None and since >= 0:
+        changes = [] if since >= version else await changes_since(session, project_id, since)
+        if changes is not None:
+            body = dumps({"version": version, "changes": changes})
+            return Response(content=body, media_type="application/json")
 
-        visited.add(nid)
-        node = node_map[nid]
+    key = (project_id, version, *variant)
+    body = graph_cache.get(key)
+    if body is None:
+        graph = await _build_graph(session, project_id, include_catalogue)
+        graph["version"] = version
+        body = encode_graph(graph) if format == "columnar" else dumps(graph)
+        graph_cache.put(key, body)
+    media_type = COLUMNAR_MEDIA_TYPE if format == "columnar" else "application/json"
+    return Response(content=body, media_type=media_type, headers=headers)
 
-        # Atomic nodes already carry their own weight
-        if node.get("atomic"):
-            visited.remove(nid)
-            return node.get("weight", 0.0)
 
-        # Sum children weights
-        total = 0.0
-        for child in nodes:
-            if child.get("parent_id") == nid:
-                total += calc_weight(child["id"], visited)
+# Names sent for the stored ``connection_type`` integers
+_CONNECTION_TYPE_NAMES = {int(ctype): ctype.name for ctype in ConnectionType}
 
-        node["weight"] = total
-        visited.remove(nid)
-        return total
+
+async def _build_graph(session: AsyncSession, project_id: int, include_catalogue: bool = False) -> dict:
+    # Plain column tuples: hydrating ORM objects costs more than the query itself
+    result_nodes = await session.execute(
+        select(
+            NodeModel.id,
+            NodeModel.material_id,
+            NodeModel.name,
+            NodeModel.parent_id,
+            NodeModel.atomic,
+            NodeModel.reusable,
+            NodeModel.connection_type,
+            NodeModel.level,
+            NodeModel.weight,
+            NodeModel.recyclable,
+            NodeModel.sustainability_score,
+        ).where(NodeModel.project_id == project_id)
+    )
+    names = _CONNECTION_TYPE_NAMES
+    nodes = [
+        {
+            "id": nid,
+            "material_id": material_id,
+            "name": name,
+            "parent_id": parent_id,
+            "atomic": atomic,
+            "reusable": reusable,
+            "connection_type": names.get(cval, str(cval)) if isinstance(cval, int) else cval,
+            "level": level,
+            "weight": weight,
+            "recyclable": recyclable,
+            "sustainability_score": score,
+        }
+        for nid, material_id, name, parent_id, atomic, reusable, cval, level, weight, recyclable, score
+        in result_nodes.tuples()
+    ]
+
+    # 2) Edges
+    result_edges = await session.execute(
+        select(RelationModel.id, RelationModel.source_id, RelationModel.target_id)
+        .where(RelationModel.project_id == project_id)
+    )
+    edges = [
+        {"id": rid, "source": source, "target": target}
+        for rid, source, target in result_edges.tuples()
+    ]
+
+    # 3) Materials from the process-wide cache: only those in use unless the
+    #    whole catalogue is requested
+    if include_catalogue:
+        materials = await material_cache.get_all(session)
+    else:
+        used = await material_cache.get_many(session, (n["material_id"] for n in nodes))
+        materials = [used[mid] for mid in sorted(used)]
+
+    # ---------------------------------------------------------------------
+    # Aggregate weights and scores for non-atomic nodes (single pass)
+    # ---------------------------------------------------------------------
+    try:
+        totals = aggregate(nodes, ("weight", "sustainability_score"))
+    except CycleError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
     for n in nodes:
-        if not n.get("atomic"):
-            calc_weight(n["id"], set())
+        if not n["atomic"]:
+            weight, score = totals[n["id"]]
+            n["weight"] = weight or 0.0
+            n["sustainability_score"] = score
 
     return {"nodes": nodes, "edges": edges, "materials": materials}
 
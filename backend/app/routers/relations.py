@@ -3,10 +3,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 
-from .websocket import broadcast
-from ..database import get_write_session
+from .websocket import broadcast, broadcast_many
+from ..database import chunked, get_write_session
 from ..models.schemas import Relation, RelationCreate
 from ..models.db import Relation as RelationModel, Node as NodeModel
+from ..versioning import record_change
 
 router = APIRouter(prefix="/relations", tags=["relations"])
 
@@ -30,24 +31,65 @@ async def create_relation(
     )
     session.add(db_obj)
     try:
+        await session.flush()
+        message = {
+            "op": "create_relation",
+            "id": db_obj.id,
+            "source": rel.source_id,
+            "target": rel.target_id,
+        }
+        await record_change(session, rel.project_id, [message])
         await session.commit()
-        await session.refresh(db_obj)
     except SQLAlchemyError as exc:
         await session.rollback()
         raise HTTPException(status_code=500, detail="DB error") from exc
 
-    await broadcast(
-        rel.project_id,
-        {
-            "op": "create_relation",
-            "id": db_obj.id,
-            "source": rel.source_id,
-            "target": rel.target_id,
-        },
-    )
+    await broadcast(rel.project_id, message)
     return Relation(id=db_obj.id, **rel.model_dump())
 
 
+@router.post("/bulk", response_model=list[Relation])
+async def create_relations_bulk(
+    rels: list[RelationCreate],
+    session: AsyncSession = Depends(get_write_session),
+):
+    """Insert many relations in one transaction with a single broadcast per project."""
+    node_ids = sorted({nid for rel in rels for nid in (rel.source_id, rel.target_id)})
+    found: set[int] = set()
+    for chunk in chunked(node_ids):
+        res = await session.execute(select(NodeModel.id).where(NodeModel.id.in_(chunk)))
+        found.update(res.scalars())
+    missing_src = sorted({rel.source_id for rel in rels} - found)
+    if missing_src:
+        raise HTTPException(status_code=404, detail=f"Source node not found: {missing_src}")
+    missing_tgt = sorted({rel.target_id for rel in rels} - found)
+    if missing_tgt:
+        raise HTTPException(status_code=404, detail=f"Target node not found: {missing_tgt}")
+
+    db_objs = [
+        RelationModel(project_id=rel.project_id, source_id=rel.source_id, target_id=rel.target_id)
+        for rel in rels
+    ]
+    session.add_all(db_objs)
+    try:
+        await session.flush()
+        per_project: dict[int, list[dict]] = {}
+        for obj in db_objs:
+            per_project.setdefault(obj.project_id, []).append(
+                {"op": "create_relation", "id": obj.id, "source": obj.source_id, "target": obj.target_id}
+            )
+        for pid, ops in per_project.items():
+            await record_change(session, pid, ops)
+        await session.commit()
+    except SQLAlchemyError as exc:
+        await session.rollback()
+        raise HTTPException(status_code=500, detail="DB error") from exc
+
+    for pid, ops in per_project.items():
+        await broadcast_many(pid, ops)
+    return [Relation(id=obj.id, **rel.model_dump()) for obj, rel in zip(db_objs, rels)]
+
+
 @router.delete("/{relation_id}")
 async def delete_relation(
     relation_id: int,
@@ -57,8 +99,11 @@ async def delete_relation(
     db_obj = res.scalar_one_or_none()
     if db_obj is None:
         raise HTTPException(status_code=404, detail="Relation not found")
+    pid = db_obj.project_id
     await session.delete(db_obj)
+    message = {"op": "delete_relation", "id": relation_id}
+    await record_change(session, pid, [message])
     await session.commit()
-    await broadcast(0, {"op": "delete_relation", "id": relation_id})
+    await broadcast(pid, message)
     return {"ok": True}
 
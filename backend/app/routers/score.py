@@ -1,73 +1,213 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy import select, update
 from sqlalchemy.exc import SQLAlchemyError
 
-from ..database import get_write_session
-from ..models.schemas import NodeScore, ConnectionType
-from ..models.db import Node as NodeModel, Material as MaterialModel
+from ..cache import material_cache
+from ..hierarchy import CycleError, aggregate
+from ..database import get_session, get_sessionmaker, get_write_session, get_write_sessionmaker
+from ..jobs import Job, job_runner
+from ..models.schemas import NodeScore, Scenario, ScenarioResult
+from ..models.db import Node as NodeModel
+from ..scoring import (
+    base_factors,
+    connection_codes,
+    scenario_totals,
+    score_kernel,
+    substitution_matrix,
+)
+from .websocket import broadcast
+from ..versioning import record_change
 
 router = APIRouter(tags=["score"])
 
 
+async def _load_columns(session: AsyncSession, project_id: int) -> dict[str, np.ndarray]:
+    """Load the scoring inputs of a project as columnar arrays.
+
+    Nodes without a matching material are included with ``has_material``
+    set to ``False`` so the hierarchy stays complete for roll-ups. Material
+    values come from :data:`app.cache.material_cache`.
+    """
+    stmt = select(
+        NodeModel.id,
+        NodeModel.parent_id,
+        NodeModel.atomic,
+        NodeModel.material_id,
+        NodeModel.weight,
+        NodeModel.connection_type,
+        NodeModel.reusable,
+    ).where(NodeModel.project_id == project_id)
+    rows = (await session.execute(stmt)).all()
+    ids, parent_ids, atomic, material_ids, weights, ctypes, reusable = (
+        zip(*rows) if rows else ([],) * 7
+    )
+    materials = await material_cache.get_many(session, material_ids)
+    found = [materials.get(mid) for mid in material_ids]
+    return {
+        "ids": np.asarray(ids, dtype=np.int64),
+        "parent_ids": list(parent_ids),
+        "atomic": np.asarray(atomic, dtype=bool),
+        "has_material": np.asarray([m is not None for m in found], dtype=bool),
+        "material_ids": np.asarray(material_ids, dtype=np.int64),
+        "co2": np.asarray([(m["co2_value"] or 0.0) if m is not None else 0.0 for m in found], dtype=np.float64),
+        "weights": np.asarray([w or 0.0 for w in weights], dtype=np.float64),
+        "codes": connection_codes(ctypes),
+        "reusable": np.asarray(reusable, dtype=bool),
+    }
+
+
+def _compute_scores(cols: dict[str, np.ndarray]) -> list[NodeScore]:
+    """Score the loaded columns; pure CPU work, safe to run off the event loop.
+
+    Raises :class:`CycleError` if the ``parent_id`` links contain a cycle.
+    """
+    values = score_kernel(cols["weights"], cols["co2"], cols["codes"], cols["reusable"])
+
+    # Atomic nodes are scored directly; assemblies get the sum of their subtree.
+    nodes = [
+        {
+            "id": nid,
+            "parent_id": pid,
+            "atomic": atomic,
+            "sustainability_score": score if has_material else None,
+        }
+        for nid, pid, atomic, has_material, score in zip(
+            cols["ids"].tolist(),
+            cols["parent_ids"],
+            cols["atomic"].tolist(),
+            cols["has_material"].tolist(),
+            values.tolist(),
+        )
+    ]
+    totals = aggregate(nodes, ("sustainability_score",))
+    return [
+        NodeScore(id=n["id"], sustainability_score=totals[n["id"]][0])
+        for n in nodes
+        if totals[n["id"]][0] is not None
+    ]
+
+
+async def _store_scores(session: AsyncSession, project_id: int, scores: list[NodeScore]) -> dict:
+    """Write ``scores`` with one bulk ``UPDATE``, log them and commit; returns the event to broadcast."""
+    await session.execute(
+        update(NodeModel),
+        [{"id": sc.id, "sustainability_score": sc.sustainability_score} for sc in scores],
+    )
+    message = {"op": "update_scores", "scores": [[sc.id, sc.sustainability_score] for sc in scores]}
+    await record_change(session, project_id, [message])
+    await session.commit()
+    return message
+
+
+async def _score_job(
+    job: Job,
+    read_factory: async_sessionmaker[AsyncSession],
+    write_factory: async_sessionmaker[AsyncSession],
+    project_id: int,
+    dry_run: bool,
+) -> dict:
+    """Body of an ``async`` scoring run, see :func:`score_project`."""
+    async with read_factory() as session:
+        cols = await _load_columns(session, project_id)
+    job.report(0.3)
+    scores = await asyncio.get_running_loop().run_in_executor(None, _compute_scores, cols)
+    job.report(0.7)
+    if dry_run:
+        return {"nodes": len(scores), "scores": [sc.model_dump() for sc in scores]}
+    if scores:
+        async with write_factory() as session:
+            message = await _store_scores(session, project_id, scores)
+        await broadcast(project_id, message)
+    return {"nodes": len(scores)}
+
+
 @router.post("/score/{project_id}", response_model=list[NodeScore])
 async def score_project(
     project_id: int,
+    dry_run: bool = False,
+    run_async: bool = Query(False, alias="async"),
     session: AsyncSession = Depends(get_write_session),
+    read_factory: async_sessionmaker[AsyncSession] = Depends(get_sessionmaker),
+    write_factory: async_sessionmaker[AsyncSession] = Depends(get_write_sessionmaker),
 ):
-    join_stmt = (
-        select(
-            NodeModel.id.label("nid"),
-            MaterialModel.co2_value.label("co2"),
-            NodeModel.weight.label("weight"),
-            NodeModel.connection_type.label("ctype"),
-            NodeModel.reusable.label("reusable"),
+    """Score every node of ``project_id`` and persist the results.
+
+    Non-atomic nodes receive the rolled-up score of their subtree. All
+    scores are computed in memory first and written with a single bulk
+    ``UPDATE`` inside one transaction. With ``dry_run`` the scores are only
+    returned and nothing is written.
+
+    With ``async=true`` the run becomes a background job and ``202`` with
+    the job is returned right away; it reads from the reader pool, scores in
+    a worker thread and only takes the writer for the final ``UPDATE``.
+    Progress is available from ``GET /jobs/{id}`` and the project
+    WebSocket, and a second submission while one is pending returns the
+    same job.
+    """
+    if run_async:
+        job = job_runner.submit(
+            "score",
+            project_id,
+            lambda job: _score_job(job, read_factory, write_factory, project_id, dry_run),
+            key=("score", project_id, dry_run),
         )
-        .join(MaterialModel, NodeModel.material_id == MaterialModel.id)
-        .where(NodeModel.project_id == project_id)
-    )
+        return JSONResponse(status_code=202, content=job.as_dict())
 
-    result = await session.execute(join_stmt)
-    records = list(result.mappings())
+    cols = await _load_columns(session, project_id)
+    try:
+        scores = _compute_scores(cols)
+    except CycleError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    factor_map = {
-        ConnectionType.SCREW: 0.8,
-        ConnectionType.BOLT: 1.0,
-        ConnectionType.GLUE: 1.2,
-    }
+    if dry_run or not scores:
+        return scores
 
-    def factor(ctype: str | int | ConnectionType | None) -> float:
-        if isinstance(ctype, str):
-            try:
-                ctype = ConnectionType[ctype.upper()]
-            except KeyError:
-                return 1.0
-        else:
-            try:
-                ctype = ConnectionType(ctype)
-            except Exception:
-                return 1.0
-        return factor_map.get(ctype, 1.0)
-
-    scores: list[NodeScore] = []
-    for rec in records:
-        weight = rec.get("weight") or 0.0
-        score = (
-            (rec.get("co2") or 0.0)
-            * weight
-            * factor(rec.get("ctype"))
-            * (0.5 if rec.get("reusable") else 1.0)
-        )
-        try:
-            await session.execute(
-                update(NodeModel)
-                .where(NodeModel.id == rec["nid"])
-                .values(sustainability_score=score)
-            )
-            await session.commit()
-        except SQLAlchemyError:
-            await session.rollback()
-            raise HTTPException(status_code=500, detail="DB error")
-        scores.append(NodeScore(id=rec["nid"], sustainability_score=score))
+    try:
+        message = await _store_scores(session, project_id, scores)
+    except SQLAlchemyError as exc:
+        await session.rollback()
+        raise HTTPException(status_code=500, detail="DB error") from exc
 
+    await broadcast(project_id, message)
     return scores
+
+
+@router.post("/score/{project_id}/scenarios", response_model=list[ScenarioResult])
+async def score_scenarios(
+    project_id: int,
+    scenarios: list[Scenario],
+    session: AsyncSession = Depends(get_session),
+):
+    """Total project score under a set of material substitutions.
+
+    Nothing is written; every scenario is evaluated against the current
+    project in a single vectorised pass.
+    """
+    cols = await _load_columns(session, project_id)
+    mask = cols["has_material"]
+    cols = {key: cols[key][mask] for key in ("material_ids", "weights", "codes", "reusable")}
+    targets = {dst for sc in scenarios for dst in sc.substitutions.values()}
+    material_ids = sorted(set(cols["material_ids"].tolist()) | targets)
+
+    rows = await material_cache.get_many(session, material_ids)
+    co2_by_id = {mid: row["co2_value"] for mid, row in rows.items()}
+    missing = sorted(targets.difference(co2_by_id))
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Material not found: {missing}")
+
+    co2_values = np.asarray([co2_by_id[mid] for mid in material_ids], dtype=np.float64)
+    material_index = np.searchsorted(np.asarray(material_ids, dtype=np.int64), cols["material_ids"])
+    base = base_factors(cols["weights"], cols["codes"], cols["reusable"])
+
+    matrix = substitution_matrix(material_ids, co2_values, [{}] + [sc.substitutions for sc in scenarios])
+    totals = scenario_totals(base, material_index, matrix).tolist()
+    baseline = totals[0]
+    return [
+        ScenarioResult(name=sc.name, total=total, delta=total - baseline)
+        for sc, total in zip(scenarios, totals[1:])
+    ]
@@ -1,33 +1,321 @@
-__all__ = ["broadcast"]
+__all__ = ["broadcast", "broadcast_many", "bus", "hub"]
+import asyncio
+import os
+import time
+from typing import Iterable
+
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
+from ..bus import create_bus
+from ..serialization import dumps_str
+from ..metrics import Gauge, registry, ws_send
+
 router = APIRouter()
 
-connections: dict[int, list[WebSocket]] = {}
+# Sent to a client whose queue overflowed under the ``resync`` policy; it has
+# missed messages and should reload the graph.
+RESYNC_MESSAGE = dumps_str({"op": "resync"})
+
+
+class Subscriber:
+    """One connected socket with a bounded outgoing queue and a writer task."""
+
+    def __init__(self, hub: "BroadcastHub", project_id: int, websocket: WebSocket):
+        self.hub = hub
+        self.project_id = project_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=hub.max_queue)
+        self.lagging = False
+        self.task = asyncio.create_task(self._write_loop())
+
+    def offer(self, text: str) -> None:
+        """Queue ``text`` without waiting; apply the slow-consumer policy if full."""
+        if self.lagging:
+            # a resync is pending and the reload will include this change
+            return
+        if not self.queue.full():
+            self.queue.put_nowait(text)
+            return
+        if self.hub.slow_policy == "disconnect":
+            self.hub.disconnect(self, close_code=1013)
+            return
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.lagging = True
+        self.queue.put_nowait(RESYNC_MESSAGE)
 
+    async def _write_loop(self) -> None:
+        try:
+            while True:
+                text = await self.queue.get()
+                if text is RESYNC_MESSAGE:
+                    self.lagging = False
+                start = time.perf_counter()
+                await self.websocket.send_text(text)
+                ws_send.observe(time.perf_counter() - start)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # dead or closed socket: prune it so it no longer receives fan-out
+            self.hub.disconnect(self)
 
-async def broadcast(project_id: int, message: dict):
-    """Send ``message`` to all sockets for ``project_id``.
+    def close(self) -> None:
+        self.task.cancel()
 
-    The special ID ``0`` broadcasts to every connected client.
+
+class BroadcastHub:
+    """Fan-out of project events to connected WebSocket clients.
+
+    Publishing serialises the message once and only enqueues it per
+    recipient, so callers never wait on network I/O. Each connection drains
+    its own queue in a writer task. When a queue is full the ``slow_policy``
+    decides: ``resync`` discards the backlog and tells the client to reload
+    the graph, ``disconnect`` closes the slow socket.
+
+    With a positive ``window`` (seconds) events are coalesced per project and
+    sent as one ``{"op": "batch", "ops": [...]}`` frame when the window
+    expires or ``max_batch`` events are pending. A create and a delete of the
+    same object inside one window cancel out, unless other events of the
+    window refer to the object.
+
+    Versioned events (see ``app.versioning``) give the batch frame a
+    ``version`` (the newest one covered) and ``since`` (the version it
+    builds on), which still lets clients detect gaps when ops were cancelled.
     """
-    targets = []
-    if project_id == 0:
-        for lst in connections.values():
-            targets.extend(lst)
-    else:
-        targets = connections.get(project_id, [])
 
-    for ws in targets:
-        await ws.send_json(message)
+    def __init__(
+        self,
+        max_queue: int = 256,
+        slow_policy: str = "resync",
+        window: float = 0.0,
+        max_batch: int = 500,
+    ):
+        if slow_policy not in ("resync", "disconnect"):
+            raise ValueError(f"Unknown slow consumer policy {slow_policy!r}")
+        self.max_queue = max_queue
+        self.slow_policy = slow_policy
+        self.window = window
+        self.max_batch = max_batch
+        self.channels: dict[int, set[Subscriber]] = {}
+        self._pending: dict[int, _Batch] = {}
+        self._timers: dict[int, asyncio.TimerHandle] = {}
+
+    def connect(self, project_id: int, websocket: WebSocket) -> Subscriber:
+        sub = Subscriber(self, project_id, websocket)
+        self.channels.setdefault(project_id, set()).add(sub)
+        return sub
+
+    def disconnect(self, sub: Subscriber, close_code: int | None = None) -> None:
+        subs = self.channels.get(sub.project_id)
+        if subs is None or sub not in subs:
+            return
+        subs.discard(sub)
+        if not subs:
+            del self.channels[sub.project_id]
+        sub.close()
+        if close_code is not None:
+            asyncio.ensure_future(_close_quietly(sub.websocket, close_code))
+
+    def subscribers(self, project_id: int) -> list[Subscriber]:
+        """Recipients for ``project_id``; ``0`` addresses every client."""
+        if project_id == 0:
+            return [sub for subs in self.channels.values() for sub in subs]
+        return list(self.channels.get(project_id, ()))
+
+    def publish(self, project_id: int, message: dict) -> None:
+        self.publish_many(project_id, [message])
+
+    def publish_many(self, project_id: int, messages: list[dict], exclude: tuple[int, ...] = ()) -> None:
+        """Send ``messages`` to ``project_id``, skipping the clients of the ``exclude`` projects.
+
+        Events with an ``exclude`` list are sent right away; a batch frame
+        has a single set of recipients.
+        """
+        if not messages or not self.subscribers(project_id):
+            return
+        if exclude:
+            self._send(project_id, messages, exclude=exclude)
+            return
+        if self.window <= 0:
+            self._send(project_id, messages)
+            return
+        batch = self._pending.setdefault(project_id, _Batch())
+        for message in messages:
+            batch.add(message)
+        if len(batch) >= self.max_batch:
+            self.flush(project_id)
+        elif project_id not in self._timers:
+            loop = asyncio.get_running_loop()
+            self._timers[project_id] = loop.call_later(self.window, self.flush, project_id)
+
+    def flush(self, project_id: int) -> None:
+        """Send the coalesced events of ``project_id`` now."""
+        timer = self._timers.pop(project_id, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(project_id, None)
+        # a batch whose ops all cancelled out is still sent if the version moved
+        if batch is not None and (len(batch) or batch.versions is not None):
+            self._send(project_id, batch.ops(), batch.versions)
+
+    def _send(
+        self,
+        project_id: int,
+        messages: list[dict],
+        versions: tuple[int, int] | None = None,
+        exclude: tuple[int, ...] = (),
+    ) -> None:
+        targets = [sub for sub in self.subscribers(project_id) if sub.project_id not in exclude]
+        if not targets:
+            return
+        own = _version_span(messages)
+        if len(messages) == 1 and versions in (None, own):
+            message = messages[0]
+        else:
+            message = {"op": "batch", "ops": messages}
+            versions = versions or own
+            if versions is not None:
+                message["since"], message["version"] = versions
+        text = dumps_str(message)
+        for sub in targets:
+            sub.offer(text)
+
+
+def _version_span(messages: list[dict]) -> tuple[int, int] | None:
+    """``(since, version)`` covered by versioned ``messages``, else ``None``."""
+    versions = [m["version"] for m in messages if "version" in m]
+    if not versions:
+        return None
+    return min(versions) - 1, max(versions)
+
+
+def _event_key(message: dict) -> tuple[str, str, object] | None:
+    """``(verb, kind, id)`` for create/delete events, else ``None``."""
+    verb, _, kind = message.get("op", "").partition("_")
+    if verb not in ("create", "delete") or not kind:
+        return None
+    oid = message.get("id")
+    if oid is None and isinstance(message.get(kind), dict):
+        oid = message[kind].get("id")
+    return None if oid is None else (verb, kind, oid)
+
+
+def _references(message: dict) -> set[tuple[str, object]]:
+    """``(kind, id)`` of every object ``message`` refers to besides one it creates."""
+    op = message.get("op")
+    refs: set[tuple[str, object]] = set()
+    node = message.get("node")
+    if isinstance(node, dict):
+        refs.update({("node", node.get("parent_id")), ("material", node.get("material_id"))})
+        if op != "create_node":
+            refs.add(("node", node.get("id")))
+    if op == "update_scores":
+        refs.update(("node", nid) for nid, _ in message.get("scores", ()))
+    elif op == "update_levels":
+        refs.update(("node", nid) for nid, _ in message.get("levels", ()))
+    elif op == "create_relation":
+        refs.update({("node", message.get("source")), ("node", message.get("target"))})
+    elif op == "update_material" and isinstance(message.get("material"), dict):
+        refs.add(("material", message["material"].get("id")))
+    return refs
+
+
+class _Batch:
+    """Pending events of one project in publish order.
+
+    A create and a delete of the same object cancel out unless an event in
+    between refers to the object, e.g. a score update or a child node;
+    those are sent together with the create and the delete.
+    """
+
+    def __init__(self):
+        self._ops: dict[int, dict] = {}
+        self._creates: dict[tuple[str, object], int] = {}
+        self._seq = 0
+        # (since, version) of every op added, including cancelled ones
+        self.versions: tuple[int, int] | None = None
+
+    def add(self, message: dict) -> None:
+        version = message.get("version")
+        if version is not None:
+            since, newest = self.versions or (version - 1, version)
+            self.versions = (min(since, version - 1), max(newest, version))
+        # objects other events depend on must reach the client after all
+        for ref in _references(message):
+            self._creates.pop(ref, None)
+        key = _event_key(message)
+        if key is not None:
+            verb, kind, oid = key
+            if verb == "delete" and (kind, oid) in self._creates:
+                # created and deleted within the window: nobody needs to know
+                del self._ops[self._creates.pop((kind, oid))]
+                return
+            if verb == "create":
+                self._creates[(kind, oid)] = self._seq
+        self._ops[self._seq] = message
+        self._seq += 1
+
+    def ops(self) -> list[dict]:
+        return list(self._ops.values())
+
+    def __len__(self) -> int:
+        return len(self._ops)
+
+
+async def _close_quietly(websocket: WebSocket, code: int) -> None:
+    try:
+        await websocket.close(code=code)
+    except Exception:
+        pass
+
+
+hub = BroadcastHub(
+    max_queue=int(os.getenv("WS_QUEUE_SIZE", "256")),
+    slow_policy=os.getenv("WS_SLOW_POLICY", "resync"),
+    window=float(os.getenv("WS_BATCH_WINDOW_MS", "20")) / 1000,
+    max_batch=int(os.getenv("WS_BATCH_MAX_OPS", "500")),
+)
+
+
+registry.add(Gauge(
+    "ws_connections", "Open WebSocket connections by project",
+    lambda: {(str(pid),): len(subs) for pid, subs in hub.channels.items()}, ("project",),
+))
+registry.add(Gauge(
+    "ws_queued_frames", "Frames waiting in the outgoing queues by project",
+    lambda: {(str(pid),): sum(sub.queue.qsize() for sub in subs) for pid, subs in hub.channels.items()},
+    ("project",),
+))
+
+
+# Carries events to the hub of every worker process; see ``app.bus``.
+bus = create_bus()
+
+
+async def broadcast(project_id: int, message: dict, exclude: Iterable[int] = ()):
+    """Queue ``message`` for all sockets of ``project_id`` and return immediately.
+
+    The special ID ``0`` is used for catalogue (material) events and reaches
+    every connected client except those of the ``exclude`` projects, which
+    get their own versioned copy.
+    """
+    bus.publish(project_id, [message], tuple(exclude))
+
+
+async def broadcast_many(project_id: int, messages: list[dict]):
+    """Like :func:`broadcast` for several events of one project."""
+    if messages:
+        bus.publish(project_id, messages)
 
 
 @router.websocket("/socket/projects/{project_id}")
 async def websocket_endpoint(websocket: WebSocket, project_id: int):
     await websocket.accept()
-    connections.setdefault(project_id, []).append(websocket)
+    sub = hub.connect(project_id, websocket)
     try:
         while True:
             await websocket.receive_text()  # keep alive
     except WebSocketDisconnect:
-        connections[project_id].remove(websocket)
+        pass
+    finally:
+        hub.disconnect(sub)
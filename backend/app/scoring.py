@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from typing import Iterable, Sequence
+
+import numpy as np
+from sqlalchemy import case, func
+
+from .models.schemas import ConnectionType
+
+
+CONNECTION_FACTORS: dict[ConnectionType, float] = {
+    ConnectionType.SCREW: 0.8,
+    ConnectionType.BOLT: 1.0,
+    ConnectionType.GLUE: 1.2,
+}
+REUSE_DISCOUNT = 0.5
+
+# Code used for ``None`` and for values that do not name a ``ConnectionType``.
+UNKNOWN_CONNECTION = len(ConnectionType)
+
+_FACTOR_TABLE = np.array(
+    [CONNECTION_FACTORS.get(ct, 1.0) for ct in ConnectionType] + [1.0],
+    dtype=np.float64,
+)
+
+
+def connection_code(value: str | int | ConnectionType | None) -> int:
+    """Map a stored ``connection_type`` to an index into the factor table."""
+    if isinstance(value, str):
+        member = ConnectionType.__members__.get(value.upper())
+        return UNKNOWN_CONNECTION if member is None else int(member)
+    try:
+        return int(ConnectionType(value))
+    except (TypeError, ValueError):
+        return UNKNOWN_CONNECTION
+
+
+def connection_codes(values: Iterable[str | int | ConnectionType | None]) -> np.ndarray:
+    """Vectorised :func:`connection_code`; each distinct value is parsed once."""
+    cache: dict = {}
+    codes = []
+    for value in values:
+        code = cache.get(value)
+        if code is None:
+            code = cache[value] = connection_code(value)
+        codes.append(code)
+    return np.fromiter(codes, dtype=np.intp, count=len(codes))
+
+
+def base_factors(weights: np.ndarray, codes: np.ndarray, reusable: np.ndarray) -> np.ndarray:
+    """Everything of the score formula except the material's CO2 value."""
+    return weights * _FACTOR_TABLE[codes] * np.where(reusable, REUSE_DISCOUNT, 1.0)
+
+
+def score_kernel(
+    weights: np.ndarray,
+    co2: np.ndarray,
+    codes: np.ndarray,
+    reusable: np.ndarray,
+) -> np.ndarray:
+    """Return ``co2 * weight * connection factor * reuse discount`` per row."""
+    return co2 * base_factors(weights, codes, reusable)
+
+
+def score_expression(weight, co2, connection_type, reusable):
+    """:func:`score_kernel` as a SQL expression over node columns, same factors and order."""
+    factor = case(
+        {int(ct): CONNECTION_FACTORS.get(ct, 1.0) for ct in ConnectionType},
+        value=connection_type,
+        else_=1.0,
+    )
+    discount = case((reusable.is_(True), REUSE_DISCOUNT), else_=1.0)
+    return co2 * (func.coalesce(weight, 0.0) * factor * discount)
+
+
+def scenario_totals(
+    base: np.ndarray,
+    material_index: np.ndarray,
+    co2_matrix: np.ndarray,
+) -> np.ndarray:
+    """Total project score for every material scenario.
+
+    ``base`` holds :func:`base_factors` per node and ``material_index`` the
+    column of each node's material in ``co2_matrix``. Row ``s`` of the
+    ``(scenarios, materials)`` matrix gives the CO2 value every material has
+    in scenario ``s``. Because the score is linear in CO2 the node factors
+    are summed per material once, so the sweep costs O(n + s * m).
+    """
+    per_material = np.bincount(material_index, weights=base, minlength=co2_matrix.shape[1])
+    return co2_matrix @ per_material
+
+
+def substitution_matrix(
+    material_ids: Sequence[int],
+    co2_values: np.ndarray,
+    substitutions: Sequence[dict[int, int]],
+) -> np.ndarray:
+    """Build the CO2 matrix for :func:`scenario_totals`.
+
+    Each scenario maps material IDs to replacement material IDs; all IDs must
+    be present in ``material_ids``.
+    """
+    column = {mid: i for i, mid in enumerate(material_ids)}
+    matrix = np.tile(co2_values, (len(substitutions), 1))
+    for row, mapping in enumerate(substitutions):
+        for src, dst in mapping.items():
+            if src in column:
+                matrix[row, column[src]] = co2_values[column[dst]]
+    return matrix
@@ -0,0 +1,27 @@
+"""JSON encoding for responses, WebSocket frames and cached snapshots.
+
+orjson writes ``bytes`` directly and is several times faster than the
+standard library; numpy scalars from the scoring code are encoded as plain
+numbers and integer dict keys as strings, as ``json.dumps`` did.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+__all__ = ["ORJSONResponse", "dumps", "dumps_str", "loads"]
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+loads = orjson.loads
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, option=_OPTIONS)
+
+
+def dumps_str(obj: Any) -> str:
+    """:func:`dumps` for text sinks such as WebSocket frames and TEXT columns."""
+    return orjson.dumps(obj, option=_OPTIONS).decode()
@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+import os
+from typing import AsyncIterable, AsyncIterator
+
+from sqlalchemy import Integer, case, delete, func, insert, literal, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .closure import rebuild_closure
+from .database import begin_snapshot, chunked
+from .serialization import dumps, loads
+from .versioning import bump_catalogue_version
+from .models.db import (
+    Change as ChangeModel,
+    Material as MaterialModel,
+    Node as NodeModel,
+    NodeClosure,
+    Project as ProjectModel,
+    Relation as RelationModel,
+)
+
+# Rows fetched per cursor round trip on export and inserted per transaction on import.
+TRANSFER_CHUNK_ROWS = int(os.getenv("TRANSFER_CHUNK_ROWS", "2000"))
+# Longest accepted NDJSON line; guards the import buffer against garbage input.
+MAX_LINE_BYTES = 1024 * 1024
+
+_MATERIAL_FIELDS = ("name", "weight", "co2_value", "hardness")
+_NODE_FIELDS = (
+    "name", "atomic", "reusable", "connection_type", "level", "weight", "recyclable", "sustainability_score",
+)
+# node fields an import record must carry with a value
+_REQUIRED_NODE_FIELDS = ("name", "atomic", "reusable", "level", "recyclable")
+
+
+class TransferError(ValueError):
+    """Invalid import record; ``line`` is its 1-based line number."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+def _line(record: dict) -> bytes:
+    return dumps(record) + b"\n"
+
+
+def _project_tree(project_id: int):
+    """Recursive CTE of ``(id, parent_id, depth)`` for the nodes of ``project_id``.
+
+    Roots are nodes without a parent or with a parent outside the project;
+    for those ``parent_id`` is ``null``, and ``depth`` counts from them.
+    Nodes caught in a parent cycle are unreachable from any root and have
+    no row.
+    """
+    in_project = select(NodeModel.id).where(NodeModel.project_id == project_id)
+    tree = (
+        select(NodeModel.id, literal(None, Integer).label("parent_id"), literal(0).label("depth"))
+        .where(
+            NodeModel.project_id == project_id,
+            or_(NodeModel.parent_id.is_(None), NodeModel.parent_id.not_in(in_project)),
+        )
+        .cte("tree", recursive=True)
+    )
+    return tree.union_all(
+        select(NodeModel.id, NodeModel.parent_id, tree.c.depth + 1).join(tree, NodeModel.parent_id == tree.c.id)
+    )
+
+
+def _nodes_parents_first(project_id: int):
+    """Nodes of ``project_id`` ordered so that every parent precedes its children.
+
+    A recursive CTE assigns each node its depth below a root (no parent, or a
+    parent outside the project, which is exported as ``null``); the depth is
+    exported as the level, so such roots and their subtrees stay valid. The
+    sort happens inside SQLite. Nodes caught in a parent cycle are
+    unreachable from any root and are left out.
+    """
+    tree = _project_tree(project_id)
+    return (
+        select(
+            NodeModel.id,
+            tree.c.parent_id,
+            NodeModel.material_id,
+            *(
+                tree.c.depth.label(f) if f == "level" else getattr(NodeModel, f)
+                for f in _NODE_FIELDS
+            ),
+        )
+        .join(tree, NodeModel.id == tree.c.id)
+        .order_by(tree.c.depth, NodeModel.id)
+    )
+
+
+async def export_ndjson(factory: async_sessionmaker[AsyncSession], project_id: int) -> AsyncIterator[bytes]:
+    """Yield ``project_id`` as NDJSON, one record per line.
+
+    Records come in dependency order: the ``project`` header, the referenced
+    ``material`` rows, ``node`` rows parents first, and ``relation`` rows.
+    Everything is read in one transaction through server-side cursors and
+    emitted in chunks of :data:`TRANSFER_CHUNK_ROWS`, so memory stays flat
+    regardless of project size.
+    """
+    async with factory() as session:
+        # all record streams read the same snapshot
+        await begin_snapshot(session)
+        res = await session.execute(
+            select(ProjectModel.name, ProjectModel.version).where(ProjectModel.id == project_id)
+        )
+        name, version = res.one()
+        yield _line({"type": "project", "id": project_id, "name": name, "version": version})
+
+        used = select(NodeModel.material_id).where(NodeModel.project_id == project_id)
+        streams = (
+            (
+                "material",
+                ("id", *_MATERIAL_FIELDS),
+                select(MaterialModel.id, *(getattr(MaterialModel, f) for f in _MATERIAL_FIELDS))
+                .where(MaterialModel.id.in_(used))
+                .order_by(MaterialModel.id),
+            ),
+            ("node", ("id", "parent_id", "material_id", *_NODE_FIELDS), _nodes_parents_first(project_id)),
+            (
+                "relation",
+                ("id", "source", "target"),
+                select(RelationModel.id, RelationModel.source_id, RelationModel.target_id)
+                .where(RelationModel.project_id == project_id)
+                .order_by(RelationModel.id),
+            ),
+        )
+        for kind, keys, stmt in streams:
+            result = await session.stream(stmt.execution_options(yield_per=TRANSFER_CHUNK_ROWS))
+            async for rows in result.partitions():
+                yield b"".join(_line({"type": kind, **dict(zip(keys, row))}) for row in rows)
+
+
+async def _records(body: AsyncIterable[bytes]) -> AsyncIterator[tuple[int, dict]]:
+    """Parse ``(line_number, record)`` pairs from a streamed NDJSON body."""
+    buffer = b""
+    lineno = 0
+    async for chunk in body:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > MAX_LINE_BYTES:
+            raise TransferError(lineno + len(lines) + 1, "line too long")
+        for raw in lines:
+            lineno += 1
+            if raw.strip():
+                yield lineno, _parse(lineno, raw)
+    if buffer.strip():
+        yield lineno + 1, _parse(lineno + 1, buffer)
+
+
+def _parse(lineno: int, raw: bytes) -> dict:
+    try:
+        record = loads(raw)
+    except ValueError as exc:
+        raise TransferError(lineno, "invalid JSON") from exc
+    if not isinstance(record, dict) or "type" not in record:
+        raise TransferError(lineno, "expected an object with a 'type'")
+    return record
+
+
+class _Importer:
+    """State of one streaming import: ID mappings and the pending chunk.
+
+    Only the old-to-new ID maps grow with the project; rows are written and
+    dropped every :data:`TRANSFER_CHUNK_ROWS` records.
+    """
+
+    def __init__(self, factory: async_sessionmaker[AsyncSession]):
+        self.factory = factory
+        self.project_id: int | None = None
+        self.materials: dict[int, int] = {}
+        self.nodes: dict[int, int] = {}
+        self.counts = {"material": 0, "node": 0, "relation": 0}
+        self._kind: str | None = None
+        self._pending: list[tuple[int, dict]] = []
+
+    async def add(self, lineno: int, record: dict) -> None:
+        kind = record["type"]
+        if kind == "project":
+            if self.project_id is not None:
+                raise TransferError(lineno, "duplicate project record")
+            await self._create_project(lineno, record)
+            return
+        if self.project_id is None:
+            raise TransferError(lineno, "the first record must be the project")
+        if kind not in self.counts:
+            raise TransferError(lineno, f"unknown record type {kind!r}")
+        if kind != self._kind or len(self._pending) >= TRANSFER_CHUNK_ROWS:
+            await self.flush()
+            self._kind = kind
+        self._pending.append((lineno, record))
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        try:
+            async with self.factory() as session, session.begin():
+                # take the write lock first so explicit IDs cannot collide with other writers
+                await session.execute(
+                    update(ProjectModel)
+                    .where(ProjectModel.id == self.project_id)
+                    .values(version=ProjectModel.version + 1)
+                )
+                if self._kind == "material":
+                    await self._insert_materials(session, rows)
+                elif self._kind == "node":
+                    await self._insert_nodes(session, rows)
+                else:
+                    await self._insert_relations(session, rows)
+        except SQLAlchemyError as exc:
+            raise TransferError(rows[0][0], f"{self._kind} records up to line {rows[-1][0]} rejected") from exc
+        self.counts[self._kind] += len(rows)
+
+    async def _create_project(self, lineno: int, record: dict) -> None:
+        if not isinstance(record.get("name"), str):
+            raise TransferError(lineno, "project needs a name")
+        async with self.factory() as session, session.begin():
+            res = await session.execute(
+                insert(ProjectModel).values(name=record["name"]).returning(ProjectModel.id)
+            )
+            self.project_id = res.scalar_one()
+
+    async def _insert_materials(self, session: AsyncSession, rows: list[tuple[int, dict]]) -> None:
+        """Reuse identical catalogue entries, insert the rest."""
+        try:
+            wanted = {rec["id"]: tuple(rec[f] for f in _MATERIAL_FIELDS) for _, rec in rows}
+        except KeyError as exc:
+            raise TransferError(rows[0][0], f"material field {exc} missing") from exc
+        existing: dict[tuple, int] = {}
+        names = sorted({values[0] for values in wanted.values()})
+        for chunk in chunked(names):
+            res = await session.execute(
+                select(MaterialModel.id, *(getattr(MaterialModel, f) for f in _MATERIAL_FIELDS))
+                .where(MaterialModel.name.in_(chunk))
+            )
+            for mid, *values in res.tuples():
+                existing.setdefault(tuple(values), mid)
+        created = False
+        for old_id, values in wanted.items():
+            if values not in existing:
+                res = await session.execute(
+                    insert(MaterialModel).values(dict(zip(_MATERIAL_FIELDS, values))).returning(MaterialModel.id)
+                )
+                existing[values] = res.scalar_one()
+                created = True
+            self.materials[old_id] = existing[values]
+        if created:
+            # lets catalogue caches and ETags of every worker see the new entries
+            await bump_catalogue_version(session)
+
+    async def _next_id(self, session: AsyncSession, column) -> int:
+        return ((await session.execute(select(func.max(column)))).scalar_one() or 0) + 1
+
+    async def _insert_nodes(self, session: AsyncSession, rows: list[tuple[int, dict]]) -> None:
+        next_id = await self._next_id(session, NodeModel.id)
+        params = []
+        for lineno, rec in rows:
+            try:
+                parent = rec.get("parent_id")
+                if parent is not None and parent not in self.nodes:
+                    raise TransferError(lineno, f"parent {parent} not defined before node {rec['id']}")
+                if rec["material_id"] not in self.materials:
+                    raise TransferError(lineno, f"material {rec['material_id']} not defined")
+                missing = [f for f in _REQUIRED_NODE_FIELDS if rec.get(f) is None]
+                if missing:
+                    raise TransferError(lineno, f"node field(s) {', '.join(missing)} missing")
+                if (parent is None) != (rec["level"] == 0):
+                    raise TransferError(lineno, "level must be 0 exactly for nodes without a parent")
+                params.append(
+                    {
+                        "id": next_id,
+                        "project_id": self.project_id,
+                        "parent_id": None if parent is None else self.nodes[parent],
+                        "material_id": self.materials[rec["material_id"]],
+                        **{f: rec.get(f) for f in _NODE_FIELDS},
+                    }
+                )
+                self.nodes[rec["id"]] = next_id
+            except KeyError as exc:
+                raise TransferError(lineno, f"node field {exc} missing") from exc
+            next_id += 1
+        await session.execute(insert(NodeModel), params)
+
+    async def _insert_relations(self, session: AsyncSession, rows: list[tuple[int, dict]]) -> None:
+        params = []
+        for lineno, rec in rows:
+            try:
+                params.append(
+                    {
+                        "project_id": self.project_id,
+                        "source_id": self.nodes[rec["source"]],
+                        "target_id": self.nodes[rec["target"]],
+                    }
+                )
+            except KeyError as exc:
+                raise TransferError(lineno, f"relation references unknown node or field {exc}") from exc
+        await session.execute(insert(RelationModel), params)
+
+    async def index(self) -> None:
+        """Build the hierarchy index once all nodes are in, see ``app.closure``."""
+        async with self.factory() as session, session.begin():
+            await rebuild_closure(session, self.project_id)
+
+    async def discard(self) -> None:
+        """Remove everything imported so far after a failure."""
+        if self.project_id is None:
+            return
+        async with self.factory() as session, session.begin():
+            for model in (RelationModel, ChangeModel):
+                await session.execute(delete(model).where(model.project_id == self.project_id))
+            in_project = select(NodeModel.id).where(NodeModel.project_id == self.project_id)
+            await session.execute(delete(NodeClosure).where(NodeClosure.descendant_id.in_(in_project)))
+            await session.execute(delete(NodeModel).where(NodeModel.project_id == self.project_id))
+            await session.execute(delete(ProjectModel).where(ProjectModel.id == self.project_id))
+
+
+async def import_ndjson(factory: async_sessionmaker[AsyncSession], body: AsyncIterable[bytes]) -> dict:
+    """Create a new project from an NDJSON stream produced by :func:`export_ndjson`.
+
+    Records are inserted in chunked transactions of :data:`TRANSFER_CHUNK_ROWS`
+    rows, each taking the writer only briefly, and node IDs are remapped on
+    the way. Materials identical to an existing catalogue entry are reused.
+    On an invalid record a :class:`TransferError` is raised and the partially
+    imported project is removed again.
+    """
+    importer = _Importer(factory)
+    try:
+        async for lineno, record in _records(body):
+            await importer.add(lineno, record)
+        await importer.flush()
+        if importer.project_id is None:
+            raise TransferError(1, "empty import")
+        await importer.index()
+    except Exception:
+        await importer.discard()
+        raise
+    return {
+        "project_id": importer.project_id,
+        "materials": importer.counts["material"],
+        "nodes": importer.counts["node"],
+        "relations": importer.counts["relation"],
+    }
+
+
+async def copy_project(session: AsyncSession, project_id: int, name: str) -> dict:
+    """Copy ``project_id`` with its nodes, scores, relations and closure rows.
+
+    Node IDs are shifted by one offset past the current maximum, so the copy
+    is made of a handful of ``INSERT ... SELECT`` statements without any
+    per-row ID mapping in Python: the clone of node ``n`` is ``n + id_offset``.
+    Runs in the caller's transaction.
+    """
+    # the project row comes first: it takes the write lock before the IDs are chosen
+    res = await session.execute(insert(ProjectModel).values(name=name).returning(ProjectModel.id))
+    new_id = res.scalar_one()
+
+    bounds = await session.execute(
+        select(func.min(NodeModel.id), func.count()).where(NodeModel.project_id == project_id)
+    )
+    first, count = bounds.one()
+    if not count:
+        return {"project_id": new_id, "id_offset": 0, "nodes": 0, "relations": 0}
+    offset = (await session.execute(select(func.max(NodeModel.id)))).scalar_one() - first + 1
+
+    in_project = select(NodeModel.id).where(NodeModel.project_id == project_id)
+    columns = ("material_id", *_NODE_FIELDS)
+    # a parent outside the project has no copy; such nodes become roots and
+    # the levels of their subtrees restart at 0
+    tree = _project_tree(project_id)
+    await session.execute(
+        insert(NodeModel).from_select(
+            ["id", "project_id", "parent_id", *columns],
+            select(
+                NodeModel.id + offset,
+                literal(new_id),
+                case((NodeModel.parent_id.in_(in_project), NodeModel.parent_id + offset)),
+                *(
+                    func.coalesce(tree.c.depth, NodeModel.level) if f == "level" else getattr(NodeModel, f)
+                    for f in columns
+                ),
+            )
+            .outerjoin(tree, tree.c.id == NodeModel.id)
+            .where(NodeModel.project_id == project_id),
+        )
+    )
+    # walk the index from the project's nodes; two IN lists would probe every pair
+    await session.execute(
+        insert(NodeClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(NodeClosure.ancestor_id + offset, NodeClosure.descendant_id + offset, NodeClosure.depth)
+            .join(NodeModel, NodeModel.id == NodeClosure.ancestor_id)
+            .where(NodeModel.project_id == project_id),
+        )
+    )
+    rel = await session.execute(
+        insert(RelationModel).from_select(
+            ["project_id", "source_id", "target_id"],
+            select(literal(new_id), RelationModel.source_id + offset, RelationModel.target_id + offset)
+            .where(
+                RelationModel.project_id == project_id,
+                RelationModel.source_id.in_(in_project),
+                RelationModel.target_id.in_(in_project),
+            ),
+        )
+    )
+    return {"project_id": new_id, "id_offset": offset, "nodes": count, "relations": rel.rowcount}
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import os
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .serialization import dumps_str, loads
+from .models.db import CatalogueState, Change as ChangeModel, Node as NodeModel, Project as ProjectModel
+
+
+# Number of versions per project kept in the change log; older entries are
+# compacted away and clients that far behind get a full snapshot instead.
+CHANGELOG_RETENTION = int(os.getenv("CHANGELOG_RETENTION", "1000"))
+
+
+async def bump_version(session: AsyncSession, project_id: int) -> int | None:
+    """Increment the graph version of ``project_id`` inside the caller's transaction.
+
+    Returns the new version, or ``None`` if the project does not exist.
+    """
+    res = await session.execute(
+        update(ProjectModel)
+        .where(ProjectModel.id == project_id)
+        .values(version=ProjectModel.version + 1)
+        .returning(ProjectModel.version)
+        .execution_options(synchronize_session=False)
+    )
+    return res.scalar_one_or_none()
+
+
+async def record_change(session: AsyncSession, project_id: int, ops: list[dict]) -> int | None:
+    """Bump the project version and append ``ops`` to its change log.
+
+    Runs in the caller's transaction. Each op is tagged with the new
+    ``version`` in place so the caller can broadcast it after committing.
+    """
+    version = await bump_version(session, project_id)
+    if version is None:
+        return None
+    for op in ops:
+        op["version"] = version
+    if ops:
+        await session.execute(
+            insert(ChangeModel),
+            [
+                {"project_id": project_id, "version": version, "op": op["op"], "payload": dumps_str(op)}
+                for op in ops
+            ],
+        )
+    if version > CHANGELOG_RETENTION:
+        await compact_changes(session, project_id, version - CHANGELOG_RETENTION)
+    return version
+
+
+async def catalogue_version(session: AsyncSession) -> int:
+    """Current version of the material catalogue, ``0`` before the first change."""
+    res = await session.execute(select(CatalogueState.version).where(CatalogueState.id == 1))
+    return res.scalar_one_or_none() or 0
+
+
+async def bump_catalogue_version(session: AsyncSession) -> int:
+    """Increment the catalogue version inside the caller's transaction and return it."""
+    stmt = sqlite_insert(CatalogueState).values(id=1, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CatalogueState.id], set_={"version": CatalogueState.version + 1}
+    )
+    res = await session.execute(stmt.returning(CatalogueState.version))
+    return res.scalar_one()
+
+
+async def record_material_change(
+    session: AsyncSession,
+    material_ids: list[int],
+    ops: list[dict],
+    project_ops: dict[int, list[dict]] | None = None,
+) -> dict[int, list[dict]]:
+    """Log catalogue ``ops`` for the projects whose nodes use ``material_ids``.
+
+    A graph only contains the materials its nodes reference, so no other
+    project changes and none of them is bumped; the catalogue version
+    covers clients that load the full catalogue. ``project_ops`` adds
+    events for single projects (e.g. their rescored nodes) to the same
+    version. Returns the versioned copies of ``ops`` per affected project,
+    ready to broadcast after the commit.
+    """
+    await bump_catalogue_version(session)
+    if not material_ids:
+        return {}
+    res = await session.execute(
+        select(NodeModel.project_id).where(NodeModel.material_id.in_(material_ids)).distinct()
+    )
+    per_project = {pid: [dict(op) for op in ops] for pid in res.scalars()}
+    for pid, extra in (project_ops or {}).items():
+        per_project.setdefault(pid, [dict(op) for op in ops]).extend(extra)
+    for pid, project_ops in per_project.items():
+        await record_change(session, pid, project_ops)
+    return per_project
+
+
+async def compact_changes(session: AsyncSession, project_id: int, up_to_version: int) -> None:
+    """Drop log entries of ``project_id`` up to and including ``up_to_version``."""
+    await session.execute(
+        delete(ChangeModel).where(
+            ChangeModel.project_id == project_id,
+            ChangeModel.version <= up_to_version,
+        )
+    )
+
+
+async def changes_since(session: AsyncSession, project_id: int, since: int) -> list[dict] | None:
+    """Ops of ``project_id`` after version ``since`` in commit order.
+
+    Returns ``None`` if the log no longer covers that range and the caller
+    has to fall back to a full snapshot.
+    """
+    res = await session.execute(
+        select(ChangeModel.version, ChangeModel.payload)
+        .where(ChangeModel.project_id == project_id, ChangeModel.version > since)
+        .order_by(ChangeModel.id)
+    )
+    rows = res.all()
+    if not rows or rows[0][0] != since + 1:
+        return None
+    return [loads(payload) | {"version": version} for version, payload in rows]
@@ -0,0 +1,90 @@
+"""Time ``POST /projects/{id}/clone`` on a large project.
+
+Seeds a file-based SQLite database with one project (a balanced BOM with
+relations between siblings), then clones it a few times with
+``app.transfer.copy_project`` and reports the best run. Run from the
+``backend`` directory::
+
+    python -m benchmarks.bench_clone [node_count]
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.closure import rebuild_closure
+from app.database import create_engines
+from app.migrations import run_migrations
+from app.models.db import Material, Node, Project, Relation
+from app.transfer import copy_project
+
+FANOUT = 8
+
+
+async def seed(factory, count: int) -> None:
+    async with factory() as session, session.begin():
+        await session.execute(insert(Project), [{"id": 1, "name": "bench"}])
+        await session.execute(
+            insert(Material),
+            [{"id": 1, "name": "Steel", "weight": 7.8, "co2_value": 1.7, "hardness": 5.0}],
+        )
+        parents = {(i - 1) // FANOUT for i in range(2, count + 1)}
+        rows = []
+        for i in range(1, count + 1):
+            atomic = i not in parents
+            depth = 0
+            j = i
+            while j > 1:
+                j = (j - 2) // FANOUT + 1
+                depth += 1
+            rows.append(
+                {
+                    "id": i,
+                    "project_id": 1,
+                    "material_id": 1,
+                    "name": f"part-{i}",
+                    "parent_id": (i - 2) // FANOUT + 1 if i > 1 else None,
+                    "atomic": atomic,
+                    "reusable": False,
+                    "connection_type": 1,
+                    "level": depth,
+                    "weight": 1.0 if atomic else None,
+                    "recyclable": True,
+                    "sustainability_score": 1.7,
+                }
+            )
+        await session.execute(insert(Node), rows)
+        await session.execute(
+            insert(Relation),
+            [{"project_id": 1, "source_id": i, "target_id": i + 1} for i in range(2, count, 2)],
+        )
+        await rebuild_closure(session, 1)
+
+
+async def main(count: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        writer, reader = create_engines(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        async with writer.begin() as conn:
+            await conn.run_sync(run_migrations)
+        factory = async_sessionmaker(writer, expire_on_commit=False)
+        await seed(factory, count)
+
+        best = float("inf")
+        for run in range(3):
+            start = time.perf_counter()
+            async with factory() as session, session.begin():
+                result = await copy_project(session, 1, f"clone-{run}")
+            best = min(best, time.perf_counter() - start)
+        print(f"clone {result['nodes']:>8} nodes {result['relations']:>8} relations  {best * 1000:9.2f} ms")
+        await writer.dispose()
+        await reader.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000))
@@ -0,0 +1,119 @@
+"""Mixed read/write load against the SQLite storage profiles.
+
+Several readers repeatedly load a project's nodes (the graph query) while one
+writer rescores the project in a loop. The ``default`` profile reproduces the
+previous setup, a single engine without pragmas shared by readers and the
+writer; ``tuned`` uses the WAL reader/writer split from ``app.database``.
+Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_concurrency [node_count] [seconds]
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import create_engines
+from app.migrations import run_migrations
+from app.models.db import Material, Node, Project
+
+READERS = 8
+
+
+async def seed(engine, count: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(run_migrations)
+        await conn.execute(insert(Project), [{"id": 1, "name": "bench"}])
+        await conn.execute(
+            insert(Material),
+            [{"id": 1, "name": "Steel", "weight": 7.8, "co2_value": 1.7, "hardness": 5.0}],
+        )
+        await conn.execute(
+            insert(Node),
+            [
+                {
+                    "project_id": 1,
+                    "material_id": 1,
+                    "name": f"part-{i}",
+                    "parent_id": None,
+                    "atomic": True,
+                    "reusable": False,
+                    "connection_type": 1,
+                    "level": 0,
+                    "weight": 1.0,
+                    "recyclable": True,
+                }
+                for i in range(count)
+            ],
+        )
+
+
+async def run_profile(label: str, writer, reader, count: int, seconds: float) -> None:
+    write_session = async_sessionmaker(writer, expire_on_commit=False)
+    read_session = async_sessionmaker(reader, expire_on_commit=False)
+    await seed(writer, count)
+    deadline = time.perf_counter() + seconds
+    latencies: list[float] = []
+    errors = 0
+    writes = 0
+
+    async def read_loop() -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                async with read_session() as session:
+                    (await session.execute(select(Node.id, Node.weight).where(Node.project_id == 1))).all()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    async def write_loop() -> None:
+        nonlocal errors, writes
+        step = 0
+        while time.perf_counter() < deadline:
+            step += 1
+            try:
+                async with write_session() as session:
+                    await session.execute(
+                        update(Node).where(Node.project_id == 1).values(sustainability_score=float(step))
+                    )
+                    await session.commit()
+                writes += 1
+            except Exception:
+                errors += 1
+
+    await asyncio.gather(write_loop(), *(read_loop() for _ in range(READERS)))
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else float("nan")
+    median = statistics.median(latencies) if latencies else float("nan")
+    print(
+        f"{label:<8} reads {len(latencies):>6}  p50 {median * 1000:7.1f} ms  "
+        f"p95 {p95 * 1000:7.1f} ms  writes {writes:>4}  errors {errors}"
+    )
+
+
+async def main(count: int, seconds: float) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'default.db')}"
+        engine = create_async_engine(url)
+        await run_profile("default", engine, engine, count, seconds)
+        await engine.dispose()
+
+        writer, reader = create_engines(f"sqlite+aiosqlite:///{os.path.join(tmp, 'tuned.db')}", "tuned")
+        await run_profile("tuned", writer, reader, count, seconds)
+        await writer.dispose()
+        await reader.dispose()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.run(main(int(args[0]) if args else 5_000, float(args[1]) if len(args) > 1 else 5.0))
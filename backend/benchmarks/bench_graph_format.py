@@ -0,0 +1,76 @@
+"""Compare the JSON and columnar wire formats of ``GET /projects/{id}/graph``.
+
+Builds balanced BOM graphs of 10k and 100k nodes in memory and reports the
+payload size (raw and gzip-compressed, as sent with compression enabled)
+and the time to decode each format: parsing the JSON, wrapping the columns
+in typed arrays (what the browser does) and expanding them back into node
+dicts. Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_graph_format [node_count ...]
+"""
+from __future__ import annotations
+
+import gzip
+import random
+import sys
+import time
+
+from app.columnar import decode_columns, decode_graph, encode_graph
+from app.serialization import dumps, loads
+
+FANOUT = 8
+
+
+def graph(count: int) -> dict:
+    parents = {(i - 2) // FANOUT + 1 for i in range(2, count + 1)}
+    levels = {1: 0}
+    nodes = []
+    for i in range(1, count + 1):
+        parent = (i - 2) // FANOUT + 1 if i > 1 else None
+        if parent is not None:
+            levels[i] = levels[parent] + 1
+        atomic = i not in parents
+        nodes.append(
+            {
+                "id": i,
+                "material_id": random.randint(1, 50),
+                "name": f"part-{i % 500}",
+                "parent_id": parent,
+                "atomic": atomic,
+                "reusable": random.random() < 0.3,
+                "connection_type": random.choice(["SCREW", "BOLT", "GLUE", None]),
+                "level": levels[i],
+                "weight": random.uniform(0.1, 5.0),
+                "recyclable": random.random() < 0.5,
+                "sustainability_score": random.uniform(0, 10),
+            }
+        )
+    edges = [{"id": i, "source": i, "target": i + 1} for i in range(2, count, 2)]
+    materials = [{"id": m, "name": f"mat-{m}", "weight": 1.0, "co2_value": 1.0, "hardness": 1.0} for m in range(1, 51)]
+    return {"nodes": nodes, "edges": edges, "materials": materials, "version": 1}
+
+
+def best_of(func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(counts: list[int]) -> None:
+    random.seed(0)
+    for count in counts:
+        g = graph(count)
+        as_json, as_columns = dumps(g), encode_graph(g)
+        print(f"{count:>8} nodes")
+        for label, body in (("json", as_json), ("columnar", as_columns)):
+            print(f"  {label:<10} {len(body) / 1024:10.1f} KiB  gzip {len(gzip.compress(body, 6)) / 1024:10.1f} KiB")
+        print(f"  decode json                {best_of(lambda: loads(as_json)) * 1000:9.2f} ms")
+        print(f"  decode columnar (arrays)   {best_of(lambda: decode_columns(as_columns)) * 1000:9.2f} ms")
+        print(f"  decode columnar (dicts)    {best_of(lambda: decode_graph(as_columns)) * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000])
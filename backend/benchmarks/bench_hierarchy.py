@@ -0,0 +1,55 @@
+"""Benchmark the weight aggregation used by ``GET /projects/{id}/graph``.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_hierarchy
+"""
+from __future__ import annotations
+
+import random
+import sys
+import time
+
+from app.hierarchy import aggregate_weights
+
+
+def wide_tree(n: int, fanout: int = 8) -> list[dict]:
+    """Balanced BOM: every assembly has ``fanout`` children."""
+    nodes = [{"id": 0, "parent_id": None, "atomic": False, "weight": None}]
+    for i in range(1, n):
+        nodes.append({"id": i, "parent_id": (i - 1) // fanout, "atomic": False, "weight": None})
+    parents = {n["parent_id"] for n in nodes}
+    for node in nodes:
+        if node["id"] not in parents:
+            node["atomic"] = True
+            node["weight"] = random.uniform(0.1, 5.0)
+    return nodes
+
+
+def chain(depth: int) -> list[dict]:
+    """Degenerate BOM: one assembly nested ``depth`` levels deep."""
+    nodes = [{"id": i, "parent_id": i - 1 if i else None, "atomic": False, "weight": None} for i in range(depth)]
+    nodes.append({"id": depth, "parent_id": depth - 1, "atomic": True, "weight": 1.0})
+    return nodes
+
+
+def run(label: str, nodes: list[dict], repeat: int = 5) -> None:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        aggregate_weights(nodes)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<28} {len(nodes):>8} nodes  {best * 1000:9.2f} ms")
+
+
+def main() -> None:
+    random.seed(0)
+    print(f"recursion limit: {sys.getrecursionlimit()}")
+    for n in (1_000, 20_000, 100_000):
+        run(f"tree fanout=8 n={n}", wide_tree(n))
+    for depth in (1_000, 10_000, 100_000):
+        run(f"chain depth={depth}", chain(depth))
+
+
+if __name__ == "__main__":
+    main()
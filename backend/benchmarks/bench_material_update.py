@@ -0,0 +1,96 @@
+"""Time the cross-project rescoring behind ``PATCH /materials/{id}``.
+
+Seeds a file-based SQLite database with several projects, each a balanced
+BOM whose parts alternate between two materials, scores them fully, then
+changes the CO2 value of one material with
+``app.rescoring.rescore_material`` and reports the best run. Run from the
+``backend`` directory::
+
+    python -m benchmarks.bench_material_update [projects] [nodes_per_project]
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.closure import rebuild_closure
+from app.database import create_engines
+from app.migrations import run_migrations
+from app.models.db import Material, Node, Project
+from app.rescoring import rescore_material
+from app.routers.score import _compute_scores, _load_columns, _store_scores
+
+FANOUT = 8
+
+
+async def seed(factory, projects: int, count: int) -> None:
+    parents = {(i - 2) // FANOUT + 1 for i in range(2, count + 1)}
+    async with factory() as session, session.begin():
+        await session.execute(
+            insert(Material),
+            [
+                {"id": 1, "name": "Steel", "weight": 7.8, "co2_value": 1.7, "hardness": 5.0},
+                {"id": 2, "name": "Wood", "weight": 0.6, "co2_value": 0.4, "hardness": 2.0},
+            ],
+        )
+    for p in range(projects):
+        offset = p * count
+        async with factory() as session, session.begin():
+            await session.execute(insert(Project), [{"id": p + 1, "name": f"bench-{p}"}])
+            levels = {1: 0}
+            rows = []
+            for i in range(1, count + 1):
+                parent = (i - 2) // FANOUT + 1 if i > 1 else None
+                if parent is not None:
+                    levels[i] = levels[parent] + 1
+                atomic = i not in parents
+                rows.append(
+                    {
+                        "id": offset + i,
+                        "project_id": p + 1,
+                        "material_id": 1 + i % 2,
+                        "name": f"part-{i}",
+                        "parent_id": offset + parent if parent is not None else None,
+                        "atomic": atomic,
+                        "reusable": i % 3 == 0,
+                        "connection_type": i % 6,
+                        "level": levels[i],
+                        "weight": 1.0 + i % 5 if atomic else None,
+                        "recyclable": True,
+                    }
+                )
+            await session.execute(insert(Node), rows)
+            await rebuild_closure(session, p + 1)
+        async with factory() as session:
+            await _store_scores(session, p + 1, _compute_scores(await _load_columns(session, p + 1)))
+
+
+async def main(projects: int, count: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        writer, reader = create_engines(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        async with writer.begin() as conn:
+            await conn.run_sync(run_migrations)
+        factory = async_sessionmaker(writer, expire_on_commit=False)
+        await seed(factory, projects, count)
+
+        best = float("inf")
+        for run in range(5):
+            start = time.perf_counter()
+            async with factory() as session, session.begin():
+                scores = await rescore_material(session, 1, 2.0 + run)
+            best = min(best, time.perf_counter() - start)
+        touched = sum(len(msg["scores"]) for msg in scores.values())
+        print(f"{projects} projects x {count} nodes: {touched} scores in {len(scores)} projects  {best * 1000:9.2f} ms")
+        await writer.dispose()
+        await reader.dispose()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    asyncio.run(main(*(args or [20, 1000])))
@@ -0,0 +1,93 @@
+"""Compare per-row scoring writes with the bulk path of ``POST /score``
+and time a what-if sweep through ``POST /score/{id}/scenarios``.
+
+Uses a temporary on-disk SQLite database so commit/fsync costs are real.
+Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_scoring [node_count]
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models.db import Base, Material, Node, Project
+from app.models.schemas import Scenario
+from app.routers.score import score_project, score_scenarios
+
+
+async def seed(session_factory, count: int) -> None:
+    async with session_factory() as session:
+        session.add(Project(id=1, name="bench"))
+        session.add(Material(id=1, name="Steel", weight=7.8, co2_value=1.7, hardness=5.0))
+        await session.execute(
+            insert(Node),
+            [
+                {
+                    "project_id": 1,
+                    "material_id": 1,
+                    "name": f"part-{i}",
+                    "parent_id": None,
+                    "atomic": True,
+                    "reusable": bool(i % 2),
+                    "connection_type": i % 6,
+                    "level": 0,
+                    "weight": 1.0 + i % 7,
+                    "recyclable": True,
+                }
+                for i in range(count)
+            ],
+        )
+        await session.commit()
+
+
+async def per_row(session_factory) -> int:
+    """The previous implementation: one UPDATE and one COMMIT per node."""
+    async with session_factory() as session:
+        rows = (await session.execute(select(Node.id, Node.weight).where(Node.project_id == 1))).all()
+        for nid, weight in rows:
+            await session.execute(
+                update(Node).where(Node.id == nid).values(sustainability_score=weight * 1.7)
+            )
+            await session.commit()
+    return len(rows)
+
+
+async def bulk(session_factory) -> int:
+    async with session_factory() as session:
+        return len(await score_project(1, dry_run=False, session=session))
+
+
+async def main(count: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await seed(session_factory, count)
+
+        for label, fn in (("per-row commit", per_row), ("bulk transaction", bulk)):
+            start = time.perf_counter()
+            rows = await fn(session_factory)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<18} {rows:>7} rows  {elapsed:8.3f} s  {rows / elapsed:12.0f} rows/s")
+
+        async with session_factory() as session:
+            session.add(Material(id=2, name="Aluminum", weight=2.7, co2_value=8.2, hardness=3.0))
+            await session.commit()
+            scenarios = [Scenario(name=f"s{i}", substitutions={1: 2} if i % 2 else {}) for i in range(500)]
+            start = time.perf_counter()
+            await score_scenarios(1, scenarios, session=session)
+            elapsed = time.perf_counter() - start
+            print(f"{'500 scenarios':<18} {count:>7} rows  {elapsed:8.3f} s")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000))
@@ -0,0 +1,147 @@
+"""Benchmark the response pipeline of ``GET /projects/{id}/graph`` and node endpoints.
+
+Seeds a file-based SQLite database with a balanced BOM of 10k and 100k
+nodes and compares, per stage, the previous implementation with the
+current one:
+
+* loading: ORM objects versus plain column tuples (all of ``_build_graph``,
+  roll-up included)
+* encoding: ``json.dumps`` versus orjson (``app.serialization.dumps``)
+* node responses: validating a ``Node`` model versus encoding trusted dicts
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_serialization [node_count ...]
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.database import create_engines
+from app.migrations import run_migrations
+from app.models.db import Material, Node as NodeModel, Project
+from app.models.schemas import Node
+from app.routers.projects import _build_graph
+from app.serialization import dumps
+
+FANOUT = 8
+
+
+async def seed(factory, count: int) -> None:
+    parents = {(i - 2) // FANOUT + 1 for i in range(2, count + 1)}
+    async with factory() as session, session.begin():
+        await session.execute(insert(Project), [{"id": 1, "name": "bench"}])
+        await session.execute(
+            insert(Material),
+            [{"id": 1, "name": "Steel", "weight": 7.8, "co2_value": 1.7, "hardness": 5.0}],
+        )
+        levels = {1: 0}
+        rows = []
+        for i in range(1, count + 1):
+            parent = (i - 2) // FANOUT + 1 if i > 1 else None
+            if parent is not None:
+                levels[i] = levels[parent] + 1
+            atomic = i not in parents
+            rows.append(
+                {
+                    "id": i,
+                    "project_id": 1,
+                    "material_id": 1,
+                    "name": f"part-{i}",
+                    "parent_id": parent,
+                    "atomic": atomic,
+                    "reusable": False,
+                    "connection_type": 1,
+                    "level": levels[i],
+                    "weight": 1.0 if atomic else None,
+                    "recyclable": True,
+                    "sustainability_score": 1.7 if atomic else None,
+                }
+            )
+        await session.execute(insert(NodeModel), rows)
+
+
+async def load_orm(session) -> list[dict]:
+    """The previous loader: hydrate ``Node`` ORM objects, then copy their fields."""
+    res = await session.execute(select(NodeModel).where(NodeModel.project_id == 1))
+    return [
+        {
+            "id": n.id,
+            "material_id": n.material_id,
+            "name": n.name,
+            "parent_id": n.parent_id,
+            "atomic": n.atomic,
+            "reusable": n.reusable,
+            "connection_type": n.connection_type,
+            "level": n.level,
+            "weight": n.weight,
+            "recyclable": n.recyclable,
+            "sustainability_score": n.sustainability_score,
+        }
+        for n in res.scalars()
+    ]
+
+
+def best_of(func, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def abest_of(factory, func, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        async with factory() as session:
+            start = time.perf_counter()
+            await func(session)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(label: str, count: int, before: float, after: float) -> None:
+    print(f"{label:<22} {count:>8} nodes  {before * 1000:9.2f} ms -> {after * 1000:9.2f} ms  ({before / after:4.1f}x)")
+
+
+async def main(counts: list[int]) -> None:
+    for count in counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            writer, reader = create_engines(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+            async with writer.begin() as conn:
+                await conn.run_sync(run_migrations)
+            await seed(async_sessionmaker(writer, expire_on_commit=False), count)
+            factory = async_sessionmaker(reader, expire_on_commit=False)
+
+            report("load nodes", count, await abest_of(factory, load_orm),
+                   await abest_of(factory, lambda s: _build_graph(s, 1)))
+
+            async with factory() as session:
+                graph = await _build_graph(session, 1)
+            report("encode graph", count, best_of(lambda: json.dumps(graph).encode()), best_of(lambda: dumps(graph)))
+
+            rows = [n | {"project_id": 1, "connection_type": "SCREW"} for n in graph["nodes"]]
+            for n in rows:
+                if not n["atomic"]:
+                    n["weight"] = None
+            report(
+                "node responses",
+                count,
+                best_of(lambda: [json.dumps(Node(**n).model_dump(mode="json")).encode() for n in rows]),
+                best_of(lambda: [dumps(n) for n in rows]),
+            )
+            await writer.dispose()
+            await reader.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(a) for a in sys.argv[1:]] or [10_000, 100_000]))
@@ -1,5 +1,9 @@
 import asyncio
+import json
 import os
+import queue
+import threading
+import time
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
@@ -7,7 +11,8 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 os.environ["TESTING"] = "1"
 
 from app import app as fastapi_app
-from app.database import get_session, get_write_session
+from app.cache import graph_cache, material_cache
+from app.database import get_session, get_sessionmaker, get_write_session, get_write_sessionmaker
 from app.models.db import Base
 
 
@@ -25,8 +30,12 @@ def client():
         async for s in override_get_session(write=True):
             yield s
 
+    graph_cache.clear()
+    material_cache.invalidate()
     fastapi_app.dependency_overrides[get_session] = override_get_session
     fastapi_app.dependency_overrides[get_write_session] = override_get_write_session
+    fastapi_app.dependency_overrides[get_sessionmaker] = lambda: SessionLocal
+    fastapi_app.dependency_overrides[get_write_sessionmaker] = lambda: SessionLocal
 
     async def init_models():
         async with engine.begin() as conn:
@@ -110,3 +119,862 @@ def test_score_project(client):
     scores = res.json()
     assert scores[0]["id"] == 1
 
+
+
+def _seed_scored_project(client, count=3):
+    client.post("/projects/", json={"name": "Demo"})
+    client.post(
+        "/materials/",
+        json={"name": "Steel", "weight": 7.8, "co2_value": 2.0, "hardness": 10.0},
+    )
+    for i in range(count):
+        client.post(
+            "/nodes/",
+            json={
+                "project_id": 1,
+                "material_id": 1,
+                "name": f"Part {i}",
+                "parent_id": None,
+                "atomic": True,
+                "reusable": i % 2 == 1,
+                "connection_type": 1,
+                "level": 0,
+                "weight": float(i + 1),
+                "recyclable": True,
+            },
+        )
+
+
+def test_score_project_dry_run_does_not_write(client):
+    _seed_scored_project(client)
+    before = client.get("/projects/1/graph").json()
+    res = client.post("/score/1", params={"dry_run": True})
+    assert res.status_code == 200
+    assert [s["sustainability_score"] for s in res.json()] == [2.0, 2.0, 6.0]
+    assert client.get("/projects/1/graph").json() == before
+
+
+def test_score_project_writes_all_scores(client):
+    _seed_scored_project(client)
+    res = client.post("/score/1")
+    assert res.status_code == 200
+    graph = client.get("/projects/1/graph").json()
+    stored = {n["id"]: n["sustainability_score"] for n in graph["nodes"]}
+    assert stored == {s["id"]: s["sustainability_score"] for s in res.json()}
+
+
+def _wait_for_job(client, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.01)
+    pytest.fail(f"job {job_id} did not finish within {timeout}s")
+
+
+def test_score_project_as_background_job(client):
+    _seed_scored_project(client)
+    expected = client.post("/score/1", params={"dry_run": True}).json()
+
+    res = client.post("/score/1", params={"async": True, "dry_run": True})
+    assert res.status_code == 202
+    dry = _wait_for_job(client, res.json()["id"])
+    assert (dry["kind"], dry["status"], dry["progress"]) == ("score", "done", 1.0)
+    assert dry["result"] == {"nodes": 3, "scores": expected}
+
+    job = _wait_for_job(client, client.post("/score/1", params={"async": True}).json()["id"])
+    assert job["result"] == {"nodes": 3}
+    stored = {n["id"]: n["sustainability_score"] for n in client.get("/projects/1/graph").json()["nodes"]}
+    assert stored == {s["id"]: s["sustainability_score"] for s in expected}
+    listed = [j["id"] for j in client.get("/jobs/", params={"project_id": 1}).json()]
+    assert listed[-2:] == [dry["id"], job["id"]]
+    assert client.delete(f"/jobs/{job['id']}").json()["status"] == "done"
+    assert client.get("/jobs/0").status_code == 404
+
+
+def test_score_scenarios(client):
+    _seed_scored_project(client)
+    client.post(
+        "/materials/",
+        json={"name": "Aluminum", "weight": 2.7, "co2_value": 8.0, "hardness": 3.0},
+    )
+    res = client.post(
+        "/score/1/scenarios",
+        json=[
+            {"name": "baseline"},
+            {"name": "aluminum", "substitutions": {"1": 2}},
+        ],
+    )
+    assert res.status_code == 200
+    assert res.json() == [
+        {"name": "baseline", "total": 10.0, "delta": 0.0},
+        {"name": "aluminum", "total": 40.0, "delta": 30.0},
+    ]
+    res = client.post("/score/1/scenarios", json=[{"name": "x", "substitutions": {"1": 99}}])
+    assert res.status_code == 404
+
+
+def _post_node(client, name, level, parent_id=None, weight=None, project_id=1):
+    return client.post(
+        "/nodes/",
+        json={
+            "project_id": project_id,
+            "material_id": 1,
+            "name": name,
+            "parent_id": parent_id,
+            "atomic": weight is not None,
+            "reusable": False,
+            "connection_type": 1,
+            "level": level,
+            "weight": weight,
+            "recyclable": True,
+        },
+    ).json()
+
+
+def test_score_rolls_up_assemblies(client):
+    client.post("/projects/", json={"name": "Demo"})
+    client.post(
+        "/materials/",
+        json={"name": "Steel", "weight": 7.8, "co2_value": 2.0, "hardness": 10.0},
+    )
+    root = _post_node(client, "Root", 0)
+    sub = _post_node(client, "Sub", 1, root["id"])
+    a = _post_node(client, "A", 2, sub["id"], weight=1.0)
+    _post_node(client, "B", 2, sub["id"], weight=2.0)
+    _post_node(client, "C", 1, root["id"], weight=4.0)
+
+    scores = {s["id"]: s["sustainability_score"] for s in client.post("/score/1").json()}
+    assert scores[sub["id"]] == 6.0
+    assert scores[root["id"]] == 14.0
+    assert client.get(f"/nodes/{root['id']}").json()["sustainability_score"] == 14.0
+
+    graph = client.get("/projects/1/graph").json()
+    by_id = {n["id"]: n for n in graph["nodes"]}
+    assert by_id[root["id"]]["weight"] == 7.0
+    assert by_id[root["id"]]["sustainability_score"] == 14.0
+
+    client.delete(f"/nodes/{a['id']}")
+    assert client.get(f"/nodes/{sub['id']}").json()["sustainability_score"] == 4.0
+    assert client.get(f"/nodes/{root['id']}").json()["sustainability_score"] == 12.0
+
+    leaf = _post_node(client, "D", 2, sub["id"], weight=5.0)
+    assert leaf["sustainability_score"] == 10.0
+    assert client.get(f"/nodes/{sub['id']}").json()["sustainability_score"] == 14.0
+    assert client.get(f"/nodes/{root['id']}").json()["sustainability_score"] == 22.0
+    by_id = {n["id"]: n for n in client.get("/projects/1/graph").json()["nodes"]}
+    assert by_id[root["id"]]["sustainability_score"] == 22.0
+
+
+def test_websocket_receives_project_events(client):
+    client.post("/projects/", json={"name": "Demo"})
+    client.post(
+        "/materials/",
+        json={"name": "Steel", "weight": 7.8, "co2_value": 2.0, "hardness": 10.0},
+    )
+    with client.websocket_connect("/socket/projects/1") as ws:
+        node = _post_node(client, "Part", 0, weight=1.0)
+        msg = ws.receive_json()
+        ops = msg["ops"] if msg["op"] == "batch" else [msg]
+        assert ops[0]["op"] == "create_node"
+        assert ops[0]["node"]["id"] == node["id"]
+
+
+def test_bulk_create_with_temporary_refs(client):
+    client.post("/projects/", json={"name": "Demo"})
+    res = client.post(
+        "/materials/bulk",
+        json=[
+            {"name": "Steel", "weight": 7.8, "co2_value": 2.0, "hardness": 10.0},
+            {"name": "Glass", "weight": 2.5, "co2_value": 1.0, "hardness": 6.0},
+        ],
+    )
+    assert [m["id"] for m in res.json()] == [1, 2]
+
+    base = {"project_id": 1, "material_id": 1, "reusable": False, "recyclable": True}
+    res = client.post(
+        "/nodes/bulk",
+        json=[
+            base | {"ref": "leaf", "parent_ref": "sub", "name": "Leaf", "level": 2, "atomic": True, "weight": 1.0},
+            base | {"ref": "root", "name": "Root", "level": 0, "atomic": False},
+            base | {"ref": "sub", "parent_ref": "root", "name": "Sub", "level": 1, "atomic": False},
+        ],
+    )
+    assert res.status_code == 200
+    refs = res.json()["refs"]
+    nodes = {n["name"]: n for n in res.json()["nodes"]}
+    assert nodes["Sub"]["parent_id"] == refs["root"]
+    assert nodes["Leaf"]["parent_id"] == refs["sub"]
+
+    res = client.post(
+        "/relations/bulk",
+        json=[{"project_id": 1, "source_id": refs["leaf"], "target_id": refs["sub"]}],
+    )
+    assert res.status_code == 200
+    graph = client.get("/projects/1/graph").json()
+    assert len(graph["nodes"]) == 3
+    assert graph["edges"] == [{"id": 1, "source": refs["leaf"], "target": refs["sub"]}]
+
+
+def test_bulk_create_rejects_bad_parents(client):
+    client.post("/projects/", json={"name": "Demo"})
+    base = {"project_id": 1, "material_id": 1, "reusable": False, "recyclable": True, "atomic": False}
+    res = client.post("/nodes/bulk", json=[base | {"name": "x", "level": 1, "parent_id": 42}])
+    assert res.status_code == 404
+    res = client.post(
+        "/nodes/bulk",
+        json=[
+            base | {"ref": "a", "parent_ref": "b", "name": "a", "level": 1},
+            base | {"ref": "b", "parent_ref": "a", "name": "b", "level": 1},
+        ],
+    )
+    assert res.status_code == 422
+    client.post("/projects/", json={"name": "Other"})
+    res = client.post(
+        "/nodes/bulk",
+        json=[
+            base | {"ref": "a", "name": "a", "level": 0},
+            base | {"ref": "b", "parent_ref": "a", "name": "b", "level": 1, "project_id": 2},
+        ],
+    )
+    assert res.status_code == 422
+    assert "'b'" in res.json()["detail"]
+    res = client.post("/relations/bulk", json=[{"project_id": 1, "source_id": 5, "target_id": 6}])
+    assert res.status_code == 404
+    assert client.get("/projects/1/graph").json()["nodes"] == []
+
+
+def test_graph_etag_and_version_bumps(client):
+    client.post("/projects/", json={"name": "Demo"})
+    client.post(
+        "/materials/",
+        json={"name": "Steel", "weight": 7.8, "co2_value": 2.0, "hardness": 10.0},
+    )
+    first = client.get("/projects/1/graph")
+    etag = first.headers["ETag"]
+    assert client.get("/projects/1/graph", headers={"If-None-Match": etag}).status_code == 304
+
+    _post_node(client, "Part", 0, weight=1.0)
+    res = client.get("/projects/1/graph", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+    assert len(res.json()["nodes"]) == 1
+
+
+def test_graph_since_returns_logged_changes(client):
+    client.post("/projects/", json={"name": "Demo"})
+    client.post(
+        "/materials/",
+        json={"name": "Steel", "weight": 7.8, "co2_value": 2.0, "hardness": 10.0},
+    )
+    base = client.get("/projects/1/graph").json()["version"]
+
+    with client.websocket_connect("/socket/projects/1") as ws:
+        node = _post_node(client, "Part", 0, weight=1.0)
+        assert ws.receive_json()["version"] == base + 1
+    client.delete(f"/nodes/{node['id']}")
+
+    res = client.get(f"/projects/1/graph?since={base}").json()
+    assert res["version"] == base + 2
+    assert [(c["op"], c["version"]) for c in res["changes"]] == [
+        ("create_node", base + 1),
+        ("update_scores", base + 1),
+        ("delete_node", base + 2),
+    ]
+    assert client.get(f"/projects/1/graph?since={base + 2}").json()["changes"] == []
+
+
+def test_graph_since_falls_back_after_compaction(client, monkeypatch):
+    from app import versioning
+
+    monkeypatch.setattr(versioning, "CHANGELOG_RETENTION", 2)
+    client.post("/projects/", json={"name": "Demo"})
+    for i in range(4):
+        _post_node(client, f"Part {i}", 0, weight=1.0)
+
+    res = client.get("/projects/1/graph?since=3").json()
+    assert [c["node"]["name"] for c in res["changes"]] == ["Part 3"]
+    snapshot = client.get("/projects/1/graph?since=0").json()
+    assert "changes" not in snapshot
+    assert snapshot["version"] == 4
+    assert len(snapshot["nodes"]) == 4
+
+
+def test_export_import_roundtrip(client, monkeypatch):
+    from app import transfer
+
+    monkeypatch.setattr(transfer, "TRANSFER_CHUNK_ROWS", 2)
+    client.post("/projects/", json={"name": "Demo"})
+    client.post(
+        "/materials/",
+        json={"name": "Steel", "weight": 7.8, "co2_value": 2.0, "hardness": 10.0},
+    )
+    root = _post_node(client, "Root", 0)
+    sub = _post_node(client, "Sub", 1, parent_id=root["id"])
+    leaves = [_post_node(client, f"Leaf {i}", 2, parent_id=sub["id"], weight=1.0) for i in range(3)]
+    client.post("/relations/", json={"project_id": 1, "source_id": leaves[0]["id"], "target_id": leaves[1]["id"]})
+
+    res = client.get("/projects/1/export")
+    assert res.headers["content-type"] == "application/x-ndjson"
+    lines = res.text.splitlines()
+    assert [json.loads(line)["type"] for line in lines] == (
+        ["project", "material"] + ["node"] * 5 + ["relation"]
+    )
+
+    res = client.post("/projects/import", content=res.content)
+    assert res.status_code == 200
+    assert res.json() == {"project_id": 2, "materials": 1, "nodes": 5, "relations": 1}
+    graph = client.get("/projects/2/graph").json()
+    names = {n["id"]: n["name"] for n in graph["nodes"]}
+    parents = {n["name"]: names.get(n["parent_id"]) for n in graph["nodes"]}
+    assert parents == {"Root": None, "Sub": "Root", "Leaf 0": "Sub", "Leaf 1": "Sub", "Leaf 2": "Sub"}
+    assert [(names[e["source"]], names[e["target"]]) for e in graph["edges"]] == [("Leaf 0", "Leaf 1")]
+    assert client.get("/materials/2").status_code == 404
+
+
+def test_clone_project_copies_nodes_relations_and_scores(client):
+    client.post("/projects/", json={"name": "Chair"})
+    client.post("/materials/", json={"name": "Steel", "weight": 7.8, "co2_value": 2.0, "hardness": 10.0})
+    root = _post_node(client, "Root", 0)
+    sub = _post_node(client, "Sub", 1, parent_id=root["id"])
+    leaves = [_post_node(client, f"Leaf {i}", 2, parent_id=sub["id"], weight=float(i + 1)) for i in range(2)]
+    client.post("/relations/", json={"project_id": 1, "source_id": leaves[0]["id"], "target_id": leaves[1]["id"]})
+    client.post("/projects/", json={"name": "Other"})
+    _post_node(client, "Elsewhere", 0, weight=1.0, project_id=2)
+
+    res = client.post("/projects/1/clone")
+    assert res.status_code == 200
+    result = res.json()
+    assert result == {"project_id": 3, "id_offset": 5, "nodes": 4, "relations": 1}
+    assert client.get("/projects/3").json()["name"] == "Chair (copy)"
+
+    original = client.get("/projects/1/graph").json()
+    copy = client.get("/projects/3/graph").json()
+    shift = result["id_offset"]
+    assert [(n["id"] + shift, n["parent_id"] and n["parent_id"] + shift, n["sustainability_score"])
+            for n in original["nodes"]] == [(n["id"], n["parent_id"], n["sustainability_score"]) for n in copy["nodes"]]
+    assert [(e["source"] + shift, e["target"] + shift) for e in original["edges"]] == [
+        (e["source"], e["target"]) for e in copy["edges"]
+    ]
+    subtree = client.get(f"/nodes/{root['id'] + shift}/subtree").json()
+    assert sorted(n["id"] for n in subtree["nodes"]) == sorted(n["id"] for n in copy["nodes"])
+
+    assert client.post("/projects/1/clone", json={"name": "Chair, oak"}).json()["project_id"] == 4
+    assert client.get("/projects/4").json()["name"] == "Chair, oak"
+    assert client.post("/projects/99/clone").status_code == 404
+
+
+def test_clone_turns_orphans_into_roots_with_relevelled_subtrees(client):
+    from sqlalchemy import update
+
+    from app.closure import rebuild_closure
+    from app.models.db import Node as NodeModel
+
+    client.post("/projects/", json={"name": "Chair"})
+    client.post("/projects/", json={"name": "Other"})
+    client.post("/materials/", json={"name": "Steel", "weight": 7.8, "co2_value": 2.0, "hardness": 10.0})
+    root = _post_node(client, "Root", 0)
+    sub = _post_node(client, "Sub", 1, parent_id=root["id"])
+    _post_node(client, "Leaf", 2, parent_id=sub["id"], weight=1.0)
+    elsewhere = _post_node(client, "Elsewhere", 0, project_id=2)
+
+    # legacy data: a parent in another project
+    async def orphan():
+        async with fastapi_app.dependency_overrides[get_write_sessionmaker]()() as session:
+            await session.execute(update(NodeModel).where(NodeModel.id == sub["id"]).values(parent_id=elsewhere["id"]))
+            await rebuild_closure(session, 1)
+            await session.commit()
+    asyncio.get_event_loop().run_until_complete(orphan())
+
+    result = client.post("/projects/1/clone").json()
+    nodes = {n["name"]: n for n in client.get(f"/projects/{result['project_id']}/graph").json()["nodes"]}
+    assert {name: (n["parent_id"], n["level"]) for name, n in nodes.items()} == {
+        "Root": (None, 0), "Sub": (None, 0), "Leaf": (nodes["Sub"]["id"], 1),
+    }
+    assert client.get(f"/nodes/{nodes['Leaf']['id']}/ancestors").json()[0]["id"] == nodes["Sub"]["id"]
+
+
+def test_import_as_background_job(client):
+    client.post("/projects/", json={"name": "Demo"})
+    client.post("/materials/", json={"name": "Steel", "weight": 7.8, "co2_value": 2.0, "hardness": 10.0})
+    root = _post_node(client, "Root", 0)
+    _post_node(client, "Leaf", 1, parent_id=root["id"], weight=1.0)
+    body = client.get("/projects/1/export").content
+
+    res = client.post("/projects/import", params={"async": True}, content=body)
+    assert res.status_code == 202
+    job = _wait_for_job(client, res.json()["id"])
+    assert job["status"] == "done"
+    assert job["result"] == {"project_id": 2, "materials": 1, "nodes": 2, "relations": 0}
+
+    job = _wait_for_job(client, client.post("/projects/import", params={"async": True}, content=b"{}").json()["id"])
+    assert job["status"] == "failed"
+    assert "line 1" in job["error"]
+
+
+def test_import_rejects_bad_record_and_cleans_up(client):
+    body = "\n".join([
+        json.dumps({"type": "project", "name": "Broken"}),
+        json.dumps({"type": "node", "id": 1, "parent_id": 99, "material_id": 1, "name": "x"}),
+    ])
+    res = client.post("/projects/import", content=body)
+    assert res.status_code == 422
+    assert "line 2" in res.json()["detail"]
+    assert client.get("/projects/1").status_code == 404
+
+    node = {"type": "node", "id": 1, "parent_id": None, "material_id": 1, "name": "x", "reusable": False,
+            "recyclable": True, "atomic": False}
+    for record, line in ((node, 3), (node | {"atomic": None, "level": 0}, 3), (node | {"level": 2}, 3)):
+        body = "\n".join([
+            json.dumps({"type": "project", "name": "Broken"}),
+            json.dumps({"type": "material", "id": 1, "name": "Steel", "weight": 1.0, "co2_value": 1.0,
+                        "hardness": 1.0}),
+            json.dumps(record),
+        ])
+        res = client.post("/projects/import", content=body)
+        assert res.status_code == 422
+        assert f"line {line}" in res.json()["detail"]
+    assert client.get("/projects/1/graph").json()["nodes"] == []
+
+
+def test_export_turns_orphans_into_valid_roots(client):
+    from sqlalchemy import update
+
+    from app.models.db import Node as NodeModel
+
+    client.post("/projects/", json={"name": "Demo"})
+    client.post("/materials/", json={"name": "Steel", "weight": 7.8, "co2_value": 2.0, "hardness": 10.0})
+    root = _post_node(client, "Root", 0)
+    sub = _post_node(client, "Sub", 1, parent_id=root["id"])
+    _post_node(client, "Leaf", 2, parent_id=sub["id"], weight=1.0)
+
+    # legacy data: a parent that is no longer part of the project
+    async def orphan():
+        async with fastapi_app.dependency_overrides[get_write_sessionmaker]()() as session:
+            await session.execute(update(NodeModel).where(NodeModel.id == sub["id"]).values(parent_id=999))
+            await session.commit()
+    asyncio.get_event_loop().run_until_complete(orphan())
+
+    res = client.post("/projects/import", content=client.get("/projects/1/export").content)
+    assert res.json()["nodes"] == 3
+    levels = {n["name"]: (n["parent_id"] is None, n["level"]) for n in client.get("/projects/2/graph").json()["nodes"]}
+    assert levels == {"Root": (True, 0), "Sub": (True, 0), "Leaf": (False, 1)}
+    sub_copy = next(n for n in client.get("/projects/2/graph").json()["nodes"] if n["name"] == "Sub")
+    assert client.get(f"/nodes/{sub_copy['id']}").status_code == 200
+
+
+def test_graph_ships_only_used_materials(client):
+    client.post("/projects/", json={"name": "Demo"})
+    client.post(
+        "/materials/bulk",
+        json=[
+            {"name": "Steel", "weight": 7.8, "co2_value": 2.0, "hardness": 10.0},
+            {"name": "Glass", "weight": 2.5, "co2_value": 1.0, "hardness": 6.0},
+        ],
+    )
+    _post_node(client, "Part", 0, weight=1.0)
+    scoped = client.get("/projects/1/graph")
+    assert [m["id"] for m in scoped.json()["materials"]] == [1]
+    full = client.get("/projects/1/graph?include_catalogue=true")
+    assert [m["id"] for m in full.json()["materials"]] == [1, 2]
+    assert full.headers["ETag"] != scoped.headers["ETag"]
+
+
+def test_material_changes_only_touch_projects_using_them(client):
+    for name in ("A", "B", "C"):
+        client.post("/projects/", json={"name": name})
+    client.post("/materials/", json={"name": "Steel", "weight": 7.8, "co2_value": 2.0, "hardness": 10.0})
+    part = _post_node(client, "Part", 0, weight=1.0, project_id=2)
+    versions = [client.get(f"/projects/{pid}/graph").json()["version"] for pid in (1, 2, 3)]
+    assert versions == [0, 1, 0]
+    catalogue = client.get("/projects/1/graph?include_catalogue=true")
+
+    client.post(
+        "/materials/bulk",
+        json=[{"name": f"M{i}", "weight": 1.0, "co2_value": 1.0, "hardness": 1.0} for i in range(3)],
+    )
+    assert [client.get(f"/projects/{pid}/graph").json()["version"] for pid in (1, 2, 3)] == versions
+    res = client.get("/projects/1/graph?include_catalogue=true", headers={"If-None-Match": catalogue.headers["ETag"]})
+    assert res.status_code == 200
+    assert len(res.json()["materials"]) == 4
+
+    client.delete("/materials/1")
+    assert [client.get(f"/projects/{pid}/graph").json()["version"] for pid in (1, 2, 3)] == [0, 2, 0]
+    changes = client.get("/projects/2/graph?since=1").json()["changes"]
+    assert [c["op"] for c in changes] == ["delete_material", "update_scores"]
+    assert changes[0]["id"] == 1
+    # the part's score is cleared in the same version
+    assert changes[1]["scores"] == [[part["id"], None]]
+
+
+def test_list_materials_keyset_pages_and_search(client):
+    names = ["steel", "Stone", "glass", "Straw", "wood"]
+    client.post(
+        "/materials/bulk",
+        json=[{"name": n, "weight": 1.0, "co2_value": 1.0, "hardness": 1.0} for n in names],
+    )
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2} | ({"cursor": cursor} if cursor else {})
+        page = client.get("/materials/", params=params).json()
+        seen += [m["name"] for m in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["glass", "steel", "Stone", "Straw", "wood"]
+
+    page = client.get("/materials/", params={"q": "st", "limit": 2}).json()
+    assert [m["name"] for m in page["items"]] == ["steel", "Stone"]
+    page = client.get("/materials/", params={"q": "st", "cursor": page["next_cursor"]}).json()
+    assert [m["name"] for m in page["items"]] == ["Straw"]
+    assert page["next_cursor"] is None
+    assert client.get("/materials/", params={"cursor": "nope"}).status_code == 422
+
+
+def test_subtree_and_ancestors(client):
+    _seed_scored_project(client, count=0)
+    root = _post_node(client, "Root", 0)
+    sub = _post_node(client, "Sub", 1, parent_id=root["id"])
+    leaf = _post_node(client, "Leaf", 2, parent_id=sub["id"], weight=2.0)
+    _post_node(client, "Other", 1, parent_id=root["id"], weight=3.0)
+    client.post("/score/1")
+
+    tree = client.get(f"/nodes/{root['id']}/subtree").json()
+    assert [(n["name"], n["depth"]) for n in tree["nodes"]] == [
+        ("Root", 0), ("Sub", 1), ("Other", 1), ("Leaf", 2),
+    ]
+    assert tree["weight"] == 5.0
+    assert tree["sustainability_score"] == client.get(f"/nodes/{root['id']}").json()["sustainability_score"]
+
+    shallow = client.get(f"/nodes/{root['id']}/subtree?max_depth=1").json()
+    assert len(shallow["nodes"]) == 3
+    assert shallow["weight"] == 5.0
+
+    path = client.get(f"/nodes/{leaf['id']}/ancestors").json()
+    assert [(n["name"], n["depth"]) for n in path] == [("Sub", 1), ("Root", 2)]
+
+    client.delete(f"/nodes/{sub['id']}")
+    assert client.get(f"/nodes/{leaf['id']}/ancestors").json() == []
+    assert client.get(f"/nodes/{sub['id']}/subtree").status_code == 404
+
+
+def test_cascade_delete_removes_subtree_and_relations(client):
+    _seed_scored_project(client, count=0)
+    root = _post_node(client, "Root", 0)
+    sub = _post_node(client, "Sub", 1, parent_id=root["id"])
+    leaves = [_post_node(client, f"Leaf {i}", 2, parent_id=sub["id"], weight=1.0) for i in range(3)]
+    other = _post_node(client, "Other", 1, parent_id=root["id"], weight=3.0)
+    client.post("/relations/", json={"project_id": 1, "source_id": other["id"], "target_id": leaves[0]["id"]})
+    client.post("/relations/", json={"project_id": 1, "source_id": root["id"], "target_id": other["id"]})
+    client.post("/score/1")
+    root_score = client.get(f"/nodes/{root['id']}").json()["sustainability_score"]
+    sub_score = client.get(f"/nodes/{sub['id']}").json()["sustainability_score"]
+
+    with client.websocket_connect("/socket/projects/1") as ws:
+        res = client.delete(f"/nodes/{sub['id']}", params={"cascade": True})
+        assert res.json() == {"ok": True, "nodes": 4, "relations": 1}
+        msg = ws.receive_json()
+        assert msg["op"] == "delete_subtree"
+        assert sorted(msg["nodes"]) == sorted([sub["id"]] + [leaf["id"] for leaf in leaves])
+
+    graph = client.get("/projects/1/graph").json()
+    assert sorted(n["name"] for n in graph["nodes"]) == ["Other", "Root"]
+    assert [(e["source"], e["target"]) for e in graph["edges"]] == [(root["id"], other["id"])]
+    assert client.get(f"/nodes/{root['id']}").json()["sustainability_score"] == root_score - sub_score
+    assert [n["name"] for n in client.get(f"/nodes/{root['id']}/subtree").json()["nodes"]] == ["Root", "Other"]
+
+
+def test_delete_without_cascade_turns_children_into_roots(client):
+    _seed_scored_project(client, count=0)
+    root = _post_node(client, "Root", 0)
+    sub = _post_node(client, "Sub", 1, parent_id=root["id"])
+    inner = _post_node(client, "Inner", 2, parent_id=sub["id"])
+    leaf = _post_node(client, "Leaf", 3, parent_id=inner["id"], weight=1.0)
+    gone = client.post("/relations/", json={"project_id": 1, "source_id": sub["id"], "target_id": leaf["id"]}).json()
+    kept = client.post("/relations/", json={"project_id": 1, "source_id": root["id"], "target_id": leaf["id"]}).json()
+    version = client.get("/projects/1/graph").json()["version"]
+
+    with client.websocket_connect("/socket/projects/1") as ws:
+        assert client.delete(f"/nodes/{sub['id']}").json() == {"ok": True}
+        ops = _receive_until(ws, "update_levels")
+    assert [op["op"] for op in ops] == ["delete_relation", "delete_node", "update_node", "update_levels"]
+    assert ops[0]["id"] == gone["id"]
+    assert (ops[2]["node"]["id"], ops[2]["node"]["parent_id"], ops[2]["node"]["level"]) == (inner["id"], None, 0)
+    assert sorted(ops[3]["levels"]) == [[inner["id"], 0], [leaf["id"], 1]]
+    # clients catching up replay the same ops
+    changes = client.get(f"/projects/1/graph?since={version}").json()["changes"]
+    assert [c["op"] for c in changes] == [op["op"] for op in ops]
+    assert [e["id"] for e in client.get("/projects/1/graph").json()["edges"]] == [kept["id"]]
+
+    orphan = client.get(f"/nodes/{inner['id']}")
+    assert orphan.status_code == 200
+    assert (orphan.json()["parent_id"], orphan.json()["level"]) == (None, 0)
+    assert client.get(f"/nodes/{leaf['id']}").json()["level"] == 1
+    assert client.get(f"/nodes/{leaf['id']}/ancestors").json()[0]["id"] == inner["id"]
+    assert client.get(f"/nodes/{root['id']}").json()["sustainability_score"] == 0.0
+
+
+def _receive_scores(ws, node_ids, timeout=5.0):
+    """Collect ``update_scores`` events on ``ws`` until all ``node_ids`` are covered.
+
+    Fails instead of blocking forever if they do not arrive in time.
+    """
+    deadline = time.monotonic() + timeout
+    scores: dict[int, float | None] = {}
+    while not set(node_ids) <= set(scores):
+        received: queue.Queue = queue.Queue()
+        threading.Thread(target=lambda: received.put(ws.receive_json()), daemon=True).start()
+        try:
+            msg = received.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            pytest.fail(f"no scores for {sorted(set(node_ids) - set(scores))} within {timeout}s")
+        for item in msg["ops"] if msg["op"] == "batch" else [msg]:
+            if item["op"] == "update_scores":
+                scores.update(item["scores"])
+    return scores
+
+
+def _receive_until(ws, op, timeout=5.0):
+    """Ops arriving on ``ws`` up to and including the first ``op`` event."""
+    deadline = time.monotonic() + timeout
+    ops: list[dict] = []
+    while not ops or ops[-1]["op"] != op:
+        received: queue.Queue = queue.Queue()
+        threading.Thread(target=lambda: received.put(ws.receive_json()), daemon=True).start()
+        try:
+            msg = received.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            pytest.fail(f"no {op} event within {timeout}s")
+        for item in msg["ops"] if msg["op"] == "batch" else [msg]:
+            if not ops or ops[-1]["op"] != op:
+                ops.append(item)
+    return ops
+
+
+def test_mutations_trigger_incremental_rescoring(client):
+    _seed_scored_project(client, count=0)
+    client.post(
+        "/materials/",
+        json={"name": "Glass", "weight": 2.5, "co2_value": 1.0, "hardness": 6.0},
+    )
+    root = _post_node(client, "Root", 0)
+    sub = _post_node(client, "Sub", 1, parent_id=root["id"])
+
+    with client.websocket_connect("/socket/projects/1") as ws:
+        leaves = [_post_node(client, f"Leaf {i}", 2, parent_id=sub["id"], weight=float(i + 1)) for i in range(3)]
+        # creates score the new parts and their ancestors right away
+        expected = {root["id"], sub["id"]} | {leaf["id"] for leaf in leaves}
+        scores = _receive_scores(ws, expected)
+        full = {s["id"]: s["sustainability_score"] for s in client.post("/score/1", params={"dry_run": True}).json()}
+        assert set(scores) == expected
+        assert scores == {nid: full[nid] for nid in scores}
+
+        # a part of a material that is then deleted loses its score and leaves the roll-ups
+        other = client.post(
+            "/nodes/",
+            json={
+                "project_id": 1, "material_id": 2, "name": "Glass part", "parent_id": sub["id"],
+                "atomic": True, "reusable": False, "level": 2, "weight": 1.0, "recyclable": True,
+            },
+        ).json()
+        _receive_scores(ws, [other["id"], root["id"]])
+        before = client.get(f"/nodes/{root['id']}").json()["sustainability_score"]
+        client.delete("/materials/2")
+        scores = _receive_scores(ws, [other["id"], root["id"]])
+        assert scores[other["id"]] is None
+        assert scores[root["id"]] == pytest.approx(before - 1.0)
+
+
+def test_metrics_endpoint_reports_route_latency(client):
+    client.post("/projects/", json={"name": "Metered"})
+    client.get("/projects/1")
+
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain")
+    body = res.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/projects/{project_id}",status="200"}' in body
+    assert 'route="/projects/",status="200"' in body
+    assert "# TYPE ws_connections gauge" in body
+
+
+def test_pre_encoded_node_responses_match_their_models(client):
+    from app.models.schemas import Node, NodeBulkResult, NodeInTree, Subtree
+
+    _seed_scored_project(client, count=0)
+    root = _post_node(client, "Root", 0)
+    leaf = _post_node(client, "Leaf", 1, parent_id=root["id"], weight=2.0)
+
+    for body, model in (
+        (client.get(f"/nodes/{leaf['id']}").json(), Node),
+        (client.get(f"/nodes/{root['id']}/subtree").json(), Subtree),
+        (client.get(f"/nodes/{leaf['id']}/ancestors").json()[0], NodeInTree),
+    ):
+        assert model.model_validate(body).model_dump(mode="json") == body
+
+    bulk = client.post(
+        "/nodes/bulk",
+        json=[{"project_id": 1, "material_id": 1, "name": "B", "atomic": True, "reusable": False,
+               "connection_type": "SCREW", "level": 1, "parent_id": root["id"], "weight": 1.0,
+               "recyclable": True, "ref": "b"}],
+    ).json()
+    assert NodeBulkResult.model_validate(bulk).model_dump(mode="json") == bulk
+
+
+def test_graph_columnar_format_matches_json(client):
+    from app.columnar import MEDIA_TYPE, decode_graph
+
+    _seed_scored_project(client, count=0)
+    root = _post_node(client, "Root", 0)
+    _post_node(client, "Leaf", 1, parent_id=root["id"], weight=2.0)
+
+    plain = client.get("/projects/1/graph")
+    binary = client.get("/projects/1/graph?format=columnar")
+    assert binary.headers["content-type"] == MEDIA_TYPE
+    assert binary.headers["etag"] != plain.headers["etag"]
+    assert decode_graph(binary.content) == plain.json()
+
+    negotiated = client.get("/projects/1/graph", headers={"Accept": MEDIA_TYPE})
+    assert negotiated.content == binary.content
+    assert client.get("/projects/1/graph?format=xml").status_code == 422
+
+
+def test_patch_material_rescores_nodes_of_every_project_using_it(client):
+    for name in ("A", "B", "C"):
+        client.post("/projects/", json={"name": name})
+    client.post("/materials/", json={"name": "Steel", "weight": 7.8, "co2_value": 2.0, "hardness": 10.0})
+    client.post("/materials/", json={"name": "Wood", "weight": 0.6, "co2_value": 0.5, "hardness": 2.0})
+    for pid in (1, 2):
+        root = _post_node(client, "Root", 0, project_id=pid)
+        _post_node(client, "Part", 1, parent_id=root["id"], weight=2.0, project_id=pid)
+        _post_node(client, "Part", 1, parent_id=root["id"], weight=3.0, project_id=pid)
+    other = client.post(
+        "/nodes/",
+        json={"project_id": 3, "material_id": 2, "name": "Board", "atomic": True, "reusable": False,
+              "connection_type": 1, "level": 0, "weight": 1.0, "recyclable": True},
+    ).json()
+    versions = [client.get(f"/projects/{pid}/graph").json()["version"] for pid in (1, 2, 3)]
+
+    with client.websocket_connect("/socket/projects/3") as ws3, client.websocket_connect("/socket/projects/1") as ws1:
+        res = client.patch("/materials/1", json={"co2_value": 4.0})
+        assert res.status_code == 200
+        assert res.json()["co2_value"] == 4.0
+        # later events of projects 3 and 1 mark the end of what the patch sent them
+        for pid in (3, 1):
+            client.post(
+                "/nodes/",
+                json={"project_id": pid, "material_id": 2, "name": "Marker", "atomic": True, "reusable": False,
+                      "connection_type": 1, "level": 0, "weight": 1.0, "recyclable": True},
+            )
+        ops = _receive_until(ws3, "create_node")
+        ops1 = _receive_until(ws1, "create_node")
+    # only the catalogue event reaches the project without nodes of the material
+    assert [op["op"] for op in ops] == ["update_material", "create_node"]
+    # a project using it gets the versioned copy only
+    assert [op["op"] for op in ops1] == ["update_material", "update_scores", "create_node"]
+    assert "version" in ops1[0]
+
+    assert [client.get(f"/projects/{pid}/graph").json()["version"] for pid in (1, 2, 3)] == [
+        versions[0] + 2, versions[1] + 1, versions[2] + 1  # projects 1 and 3: the marker nodes
+    ]
+    graph = client.get("/projects/2/graph").json()
+    incremental = {n["id"]: n["sustainability_score"] for n in graph["nodes"]}
+    assert graph["materials"][0]["co2_value"] == 4.0
+    ops = [c["op"] for c in client.get(f"/projects/2/graph?since={versions[1]}").json()["changes"]]
+    assert ops == ["update_material", "update_scores"]
+
+    full = {s["id"]: s["sustainability_score"] for s in client.post("/score/2").json()}
+    assert incremental == pytest.approx(full)
+    assert client.get(f"/nodes/{other['id']}").json()["sustainability_score"] == pytest.approx(
+        {s["id"]: s["sustainability_score"] for s in client.post("/score/3").json()}[other["id"]]
+    )
+
+    assert client.patch("/materials/9", json={"co2_value": 1.0}).status_code == 404
+    assert client.patch("/materials/1", json={"co2_value": -1.0}).status_code == 422
+
+
+def test_patch_node_moves_subtree_and_adjusts_rollups(client):
+    _seed_scored_project(client, count=0)
+    client.post("/projects/", json={"name": "Other"})
+    a = _post_node(client, "A", 0)
+    sub = _post_node(client, "Sub", 1, parent_id=a["id"])
+    inner = _post_node(client, "Inner", 2, parent_id=sub["id"])
+    leaf = _post_node(client, "Leaf", 3, parent_id=inner["id"], weight=1.0)
+    _post_node(client, "Part", 2, parent_id=sub["id"], weight=2.0)
+    _post_node(client, "Stay", 1, parent_id=a["id"], weight=4.0)
+    b = _post_node(client, "B", 0)
+    foreign = _post_node(client, "Foreign", 0, project_id=2)
+    client.post("/relations/", json={"project_id": 1, "source_id": leaf["id"], "target_id": b["id"]})
+    client.post("/score/1")
+    version = client.get("/projects/1/graph").json()["version"]
+
+    with client.websocket_connect("/socket/projects/1") as ws:
+        res = client.patch(f"/nodes/{sub['id']}", json={"parent_id": b["id"], "name": "Moved"})
+        assert res.status_code == 200
+        ops = _receive_until(ws, "update_scores")
+    moved = res.json()
+    assert (moved["id"], moved["parent_id"], moved["level"], moved["name"]) == (sub["id"], b["id"], 1, "Moved")
+    assert [op["op"] for op in ops] == ["update_node", "update_levels", "update_scores"]
+    assert sorted(ops[1]["levels"]) == sorted([[sub["id"], 1], [inner["id"], 2], [leaf["id"], 3], [leaf["id"] + 1, 2]])
+    assert dict(ops[2]["scores"]) == {a["id"]: 8.0, b["id"]: 6.0}
+    assert client.get("/projects/1/graph").json()["version"] == version + 1
+
+    # IDs and relations survive, the roll-ups match a full rescore
+    assert [n["id"] for n in client.get(f"/nodes/{leaf['id']}/ancestors").json()] == [inner["id"], sub["id"], b["id"]]
+    graph = client.get("/projects/1/graph").json()
+    assert [(e["source"], e["target"]) for e in graph["edges"]] == [(leaf["id"], b["id"])]
+    incremental = {n["id"]: n["sustainability_score"] for n in graph["nodes"]}
+    assert incremental == pytest.approx({s["id"]: s["sustainability_score"] for s in client.post("/score/1").json()})
+
+    # cycles, other projects and unknown IDs are rejected without side effects
+    assert client.patch(f"/nodes/{b['id']}", json={"parent_id": leaf["id"]}).status_code == 422
+    assert client.patch(f"/nodes/{sub['id']}", json={"parent_id": sub["id"]}).status_code == 422
+    assert client.patch(f"/nodes/{sub['id']}", json={"parent_id": foreign["id"]}).status_code == 404
+    assert client.patch(f"/nodes/{leaf['id']}", json={"material_id": 9}).status_code == 404
+    assert client.patch(f"/nodes/{sub['id']}", json={"weight": 1.0}).status_code == 422
+    assert client.patch("/nodes/999", json={"name": "x"}).status_code == 404
+    assert client.get(f"/nodes/{b['id']}").json()["parent_id"] is None
+
+    # null detaches the subtree as a new root
+    root = client.patch(f"/nodes/{inner['id']}", json={"parent_id": None}).json()
+    assert (root["parent_id"], root["level"]) == (None, 0)
+    assert client.get(f"/nodes/{leaf['id']}").json()["level"] == 1
+    assert client.get(f"/nodes/{b['id']}").json()["sustainability_score"] == 4.0
+    assert root["sustainability_score"] == 2.0
+
+
+def test_batch_patch_nodes_applies_in_order_in_one_version(client):
+    _seed_scored_project(client, count=0)
+    client.post("/materials/", json={"name": "Wood", "weight": 0.6, "co2_value": 0.5, "hardness": 2.0})
+    a = _post_node(client, "A", 0)
+    b = _post_node(client, "B", 0)
+    leaf = _post_node(client, "Leaf", 1, parent_id=a["id"], weight=2.0)
+    version = client.get("/projects/1/graph").json()["version"]
+
+    res = client.patch(
+        "/nodes/",
+        json=[
+            {"id": leaf["id"], "parent_id": b["id"], "weight": 4.0},
+            {"id": b["id"], "parent_id": a["id"]},
+            {"id": leaf["id"], "material_id": 2, "connection_type": "GLUE"},
+        ],
+    )
+    assert res.status_code == 200
+    nodes = {n["id"]: n for n in res.json()}
+    assert list(nodes) == [leaf["id"], b["id"]]
+    assert (nodes[leaf["id"]]["parent_id"], nodes[leaf["id"]]["level"]) == (b["id"], 2)
+    assert (nodes[leaf["id"]]["weight"], nodes[leaf["id"]]["connection_type"]) == (4.0, "GLUE")
+    assert nodes[b["id"]]["level"] == 1
+
+    changes = client.get(f"/projects/1/graph?since={version}").json()
+    assert changes["version"] == version + 1
+    assert [c["op"] for c in changes["changes"]] == ["update_node", "update_node", "update_levels", "update_scores"]
+    full = {s["id"]: s["sustainability_score"] for s in client.post("/score/1").json()}
+    assert nodes[leaf["id"]]["sustainability_score"] == pytest.approx(full[leaf["id"]])
+    assert client.get(f"/nodes/{a['id']}").json()["sustainability_score"] == pytest.approx(full[leaf["id"]])
+
+    # one bad item rolls the whole batch back
+    res = client.patch("/nodes/", json=[{"id": b["id"], "name": "Renamed"}, {"id": a["id"], "parent_id": leaf["id"]}])
+    assert res.status_code == 422
+    assert client.get(f"/nodes/{b['id']}").json()["name"] == "B"
@@ -0,0 +1,108 @@
+import asyncio
+import multiprocessing
+import os
+import time
+
+os.environ["TESTING"] = "1"
+
+import aiosqlite
+
+from app.bus import InProcessBus, SQLiteBus
+
+WORKERS = 3
+MESSAGES = 40
+
+
+def _worker(path: str, worker: int, ready, go) -> None:
+    async def run():
+        bus = SQLiteBus(path)
+        await bus.start(lambda pid, msgs, exclude: None)
+        ready.set()
+        go.wait()
+        for seq in range(MESSAGES):
+            bus.publish(1, [{"op": "tick", "worker": worker, "seq": seq, "sent": time.time()}])
+            await asyncio.sleep(0.002)
+        await bus.stop()
+
+    asyncio.run(run())
+
+
+def test_in_process_bus_delivers_synchronously():
+    received = []
+
+    async def scenario():
+        bus = InProcessBus()
+        await bus.start(lambda pid, msgs, exclude: received.append((pid, msgs)))
+        bus.publish(3, [{"op": "x"}])
+
+    asyncio.run(scenario())
+    assert received == [(3, [{"op": "x"}])]
+
+
+def test_sqlite_bus_delivers_across_worker_processes(tmp_path):
+    path = str(tmp_path / "bus.db")
+    received: list[tuple[dict, float]] = []
+
+    async def scenario():
+        bus = SQLiteBus(path, poll_interval=0.005)
+        await bus.start(lambda pid, msgs, exclude: received.extend((m, time.time()) for m in msgs))
+
+        ctx = multiprocessing.get_context("spawn")
+        go = ctx.Event()
+        readies = [ctx.Event() for _ in range(WORKERS)]
+        procs = [
+            ctx.Process(target=_worker, args=(path, i, readies[i], go)) for i in range(WORKERS)
+        ]
+        for proc in procs:
+            proc.start()
+        for ready in readies:
+            assert await asyncio.to_thread(ready.wait, 30)
+        go.set()
+
+        deadline = time.time() + 30
+        while len(received) < WORKERS * MESSAGES and time.time() < deadline:
+            await asyncio.sleep(0.01)
+        for proc in procs:
+            await asyncio.to_thread(proc.join, 30)
+        await bus.stop()
+
+    asyncio.run(scenario())
+
+    assert len(received) == WORKERS * MESSAGES
+    for worker in range(WORKERS):
+        seqs = [m["seq"] for m, _ in received if m["worker"] == worker]
+        assert seqs == list(range(MESSAGES))
+    latencies = sorted(at - m["sent"] for m, at in received)
+    assert latencies[int(len(latencies) * 0.95)] < 0.5
+
+
+def test_sqlite_bus_poller_survives_database_errors(tmp_path):
+    path = str(tmp_path / "bus.db")
+    received = []
+
+    async def scenario():
+        listener, sender = SQLiteBus(path, poll_interval=0.005), SQLiteBus(path)
+        await listener.start(lambda pid, msgs, exclude: received.append((pid, msgs, exclude)))
+        await sender.start(lambda pid, msgs, exclude: None)
+        execute = listener._reader.execute
+        failures = []
+
+        def flaky(*args, **kwargs):
+            if len(failures) < 3:
+                failures.append(args)
+                raise aiosqlite.OperationalError("database is locked")
+            return execute(*args, **kwargs)
+
+        listener._reader.execute = flaky
+        sender.publish(1, [{"op": "x"}])
+        sender.publish(0, [{"op": "y"}], (1, 2))
+        await sender.flush()
+        deadline = time.time() + 5
+        while len(received) < 2 and time.time() < deadline:
+            await asyncio.sleep(0.01)
+        await sender.stop()
+        await listener.stop()
+        assert len(failures) == 3
+
+    asyncio.run(scenario())
+    assert received == [(1, [{"op": "x"}], ()), (0, [{"op": "y"}], (1, 2))]
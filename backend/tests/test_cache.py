@@ -0,0 +1,78 @@
+import asyncio
+import os
+
+os.environ["TESTING"] = "1"
+
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.cache import LRUCache, MaterialCache, SnapshotCache
+from app.models.db import Base, Material
+from app.versioning import bump_catalogue_version
+
+
+def test_lru_evicts_by_size():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    cache.get("a")
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    assert cache.size == 8
+    cache.put("huge", b"x" * 11)
+    assert cache.get("huge") is None
+
+
+def test_snapshot_cache_keeps_latest_version_only():
+    cache = SnapshotCache(max_bytes=100)
+    cache.put((1, 1), b"old")
+    cache.put((1, 2), b"new")
+    cache.put((1, 1), b"stale")
+    assert cache.get((1, 1)) is None
+    assert cache.get((1, 2)) == b"new"
+    assert len(cache) == 1
+
+
+def test_snapshot_cache_drops_all_variants_of_old_versions():
+    cache = SnapshotCache(max_bytes=100)
+    cache.put((1, 1), b"scoped")
+    cache.put((1, 1, "catalogue"), b"full")
+    cache.put((1, 2), b"new")
+    assert cache.get((1, 1, "catalogue")) is None
+    assert len(cache) == 1
+
+
+def test_material_cache_loads_lazily_evicts_and_follows_the_catalogue_version():
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with factory() as session, session.begin():
+            await session.execute(
+                insert(Material),
+                [{"id": i, "name": f"m{i}", "weight": 1.0, "co2_value": float(i), "hardness": 1.0} for i in (1, 2, 3)],
+            )
+
+        cache = MaterialCache(max_entries=2)
+        async with factory() as session:
+            rows = await cache.get_many(session, [1, 2, 2, 99])
+            assert sorted(rows) == [1, 2]
+            await cache.get_many(session, [3])
+            assert list(cache._rows) == [2, 3]
+
+        # a write elsewhere that does not bump the version is not seen ...
+        async with factory() as session, session.begin():
+            await session.execute(update(Material).where(Material.id == 3).values(co2_value=30.0))
+        async with factory() as session:
+            assert (await cache.get_many(session, [3]))[3]["co2_value"] == 3.0
+        # ... until the catalogue version moves
+        async with factory() as session, session.begin():
+            await bump_catalogue_version(session)
+        async with factory() as session:
+            assert (await cache.get_many(session, [3]))[3]["co2_value"] == 30.0
+            assert [row["id"] for row in await cache.get_all(session)] == [1, 2, 3]
+        await engine.dispose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,70 @@
+import asyncio
+import os
+
+os.environ["TESTING"] = "1"
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.closure import add_nodes, is_ancestor, move_subtree, rebuild_closure, remove_node
+from app.models.db import Base, Node, NodeClosure, Project
+
+
+async def _closure(session) -> set[tuple[int, int, int]]:
+    res = await session.execute(select(NodeClosure.ancestor_id, NodeClosure.descendant_id, NodeClosure.depth))
+    return set(res.tuples())
+
+
+async def _rebuilt(session) -> set[tuple[int, int, int]]:
+    await rebuild_closure(session, 1)
+    return await _closure(session)
+
+
+def _run(scenario):
+    async def wrapper():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine)() as session:
+            session.add(Project(id=1, name="p"))
+            await scenario(session)
+        await engine.dispose()
+
+    asyncio.run(wrapper())
+
+
+async def _insert(session, parents: dict[int, int | None]) -> None:
+    base = {"project_id": 1, "material_id": 1, "atomic": False, "reusable": False, "level": 0, "recyclable": False}
+    await session.execute(
+        insert(Node), [base | {"id": nid, "name": str(nid), "parent_id": pid} for nid, pid in parents.items()]
+    )
+
+
+def test_incremental_maintenance_matches_rebuild():
+    async def scenario(session):
+        # 1 ─ 2 ─ 3 ─ 4, and 1 ─ 5
+        await _insert(session, {1: None, 2: 1, 5: 1})
+        await add_nodes(session, [1])
+        await add_nodes(session, [2, 5])
+        await _insert(session, {3: 2})
+        await add_nodes(session, [3])
+        await _insert(session, {4: 3})
+        await add_nodes(session, [4])
+        assert await _closure(session) == await _rebuilt(session)
+        assert (1, 4, 3) in await _closure(session)
+
+        # move 3 (with 4) below 5
+        await session.execute(Node.__table__.update().where(Node.id == 3).values(parent_id=5))
+        await move_subtree(session, 3, 5)
+        assert await is_ancestor(session, 5, 4)
+        assert not await is_ancestor(session, 2, 4)
+        assert await _closure(session) == await _rebuilt(session)
+
+        # removing 5 leaves 3 ─ 4 as a subtree of its own
+        await remove_node(session, 5)
+        rows = await _closure(session)
+        assert not any(5 in (a, d) for a, d, _ in rows)
+        assert {(3, 3, 0), (3, 4, 1), (4, 4, 0)} <= rows
+        assert not await is_ancestor(session, 1, 3)
+
+    _run(scenario)
@@ -0,0 +1,46 @@
+import math
+import os
+
+os.environ["TESTING"] = "1"
+
+from app.columnar import decode_columns, decode_graph, encode_graph
+
+
+def _graph():
+    node = {
+        "id": 1, "material_id": 3, "name": "Frame", "parent_id": None, "atomic": False,
+        "reusable": True, "connection_type": "WELD", "level": 0, "weight": 4.5,
+        "recyclable": False, "sustainability_score": None,
+    }
+    return {
+        "nodes": [
+            node,
+            node | {"id": 2, "parent_id": 1, "level": 1, "atomic": True, "connection_type": "custom",
+                    "sustainability_score": 1.25},
+            node | {"id": 3, "parent_id": 1, "level": 1, "name": "Screw", "material_id": None,
+                    "connection_type": None},
+        ],
+        "edges": [{"id": 9, "source": 2, "target": 3}],
+        "materials": [{"id": 3, "name": "Steel", "weight": 7.8, "co2_value": 1.0, "hardness": 5.0}],
+        "version": 12,
+    }
+
+
+def test_round_trip_preserves_graph():
+    graph = _graph()
+    assert decode_graph(encode_graph(graph)) == graph
+
+
+def test_columns_are_aligned_typed_arrays_with_interned_strings():
+    payload = encode_graph(_graph())
+    header, columns = decode_columns(payload)
+
+    assert header["strings"] == ["Frame", "Screw"]
+    assert columns["name"].tolist() == [0, 0, 1]
+    # known connection types keep their stored codes, others are appended
+    assert header["connection_types"][3] == "WELD"
+    assert columns["connection_type"].tolist() == [3, 6, -1]
+    assert columns["parent_id"].tolist() == [-1, 1, 1]
+    assert math.isnan(columns["sustainability_score"][0])
+    for array in columns.values():
+        assert (array.ctypes.data - columns["id"].ctypes.data) % 8 == 0
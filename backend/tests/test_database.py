@@ -0,0 +1,65 @@
+import asyncio
+import os
+
+os.environ["TESTING"] = "1"
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.database import begin_snapshot, create_engines
+from app.migrations import run_migrations
+
+
+def test_file_database_gets_tuned_reader_writer_split(tmp_path):
+    async def scenario():
+        writer, reader = create_engines(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}", "tuned")
+        assert writer is not reader
+        async with writer.begin() as conn:
+            await conn.run_sync(run_migrations)
+            assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 5000
+            await conn.execute(text("INSERT INTO projects (name) VALUES ('p')"))
+
+        async with reader.connect() as conn:
+            assert (await conn.execute(text("SELECT count(*) FROM projects"))).scalar() == 1
+            with pytest.raises(OperationalError):
+                await conn.execute(text("INSERT INTO projects (name) VALUES ('q')"))
+        await writer.dispose()
+        await reader.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_begin_snapshot_pins_reads_against_concurrent_commits(tmp_path):
+    async def scenario():
+        writer, reader = create_engines(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}", "tuned")
+        async with writer.begin() as conn:
+            await conn.run_sync(run_migrations)
+            await conn.execute(text("INSERT INTO projects (name) VALUES ('p')"))
+
+        count = text("SELECT count(*) FROM projects")
+        async with async_sessionmaker(reader)() as session:
+            await begin_snapshot(session)
+            assert (await session.execute(count)).scalar() == 1
+            async with writer.begin() as conn:
+                await conn.execute(text("INSERT INTO projects (name) VALUES ('q')"))
+            assert (await session.execute(count)).scalar() == 1
+        async with async_sessionmaker(reader)() as session:
+            assert (await session.execute(count)).scalar() == 2
+        await writer.dispose()
+        await reader.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_memory_database_shares_one_engine():
+    writer, reader = create_engines("sqlite+aiosqlite:///:memory:", "tuned")
+    assert writer is reader
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(RuntimeError):
+        create_engines("sqlite+aiosqlite:///:memory:", "turbo")
@@ -0,0 +1,63 @@
+import os
+
+os.environ["TESTING"] = "1"
+
+import pytest
+
+from app.hierarchy import CycleError, aggregate, aggregate_weights, post_order
+
+
+def _node(nid, parent_id=None, atomic=False, weight=None):
+    return {"id": nid, "parent_id": parent_id, "atomic": atomic, "weight": weight}
+
+
+def test_aggregate_weights_sums_subtrees():
+    nodes = [
+        _node(1),
+        _node(2, 1),
+        _node(3, 2, atomic=True, weight=1.5),
+        _node(4, 2, atomic=True, weight=2.5),
+        _node(5, 1, atomic=True, weight=3.0),
+    ]
+    totals = aggregate_weights(nodes)
+    assert totals == {1: 7.0, 2: 4.0, 3: 1.5, 4: 2.5, 5: 3.0}
+
+
+def test_dangling_parent_is_treated_as_root():
+    totals = aggregate_weights([_node(1, 99), _node(2, 1, atomic=True, weight=2.0)])
+    assert totals[1] == 2.0
+
+
+def test_post_order_children_before_parents():
+    parents = {1: None, 2: 1, 3: 2, 4: 1}
+    order = post_order(parents)
+    for nid, pid in parents.items():
+        if pid is not None:
+            assert order.index(nid) < order.index(pid)
+
+
+def test_cycle_reports_offending_ids():
+    nodes = [_node(1), _node(2, 3), _node(3, 4), _node(4, 2), _node(5, 4, atomic=True, weight=1.0)]
+    with pytest.raises(CycleError) as exc:
+        aggregate_weights(nodes)
+    assert exc.value.node_ids == [2, 3, 4]
+
+
+def test_deep_chain_does_not_recurse():
+    depth = 5000
+    nodes = [_node(0)] + [_node(i, i - 1) for i in range(1, depth)]
+    nodes.append(_node(depth, depth - 1, atomic=True, weight=1.0))
+    totals = aggregate_weights(nodes)
+    assert totals[0] == 1.0
+
+
+def test_aggregate_rolls_up_several_fields():
+    nodes = [
+        {"id": 1, "parent_id": None, "atomic": False},
+        {"id": 2, "parent_id": 1, "atomic": True, "weight": 1.0, "score": 3.0},
+        {"id": 3, "parent_id": 1, "atomic": True, "weight": 2.0, "score": None},
+        {"id": 4, "parent_id": None, "atomic": False},
+    ]
+    totals = aggregate(nodes, ("weight", "score"))
+    assert totals[1] == (3.0, 3.0)
+    assert totals[4] == (None, None)
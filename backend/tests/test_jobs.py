@@ -0,0 +1,71 @@
+import asyncio
+import os
+
+os.environ["TESTING"] = "1"
+
+from app.jobs import CANCELLED, DONE, FAILED, JobRunner
+
+
+def test_runner_limits_concurrency_and_coalesces_by_key():
+    async def scenario():
+        runner = JobRunner(max_concurrent=2)
+        sent = []
+
+        async def notify(project_id, message):
+            sent.append((project_id, message["job"]["status"]))
+
+        await runner.start(notify)
+        release = asyncio.Event()
+        running = 0
+        peak = 0
+
+        async def work(job):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            job.report(0.5)
+            await release.wait()
+            running -= 1
+            return {"project": job.project_id}
+
+        jobs = [runner.submit("score", pid, work, key=("score", pid)) for pid in (1, 2, 3)]
+        again = runner.submit("score", 1, work, key=("score", 1))
+        await asyncio.sleep(0.01)
+        assert again is jobs[0]
+        assert [job.status for job in jobs] == ["running", "running", "queued"]
+        release.set()
+        await runner.drain()
+        assert peak == 2
+        assert [job.status for job in jobs] == [DONE] * 3
+        assert jobs[2].result == {"project": 3}
+        # a finished job no longer absorbs new submissions
+        assert runner.submit("score", 1, work, key=("score", 1)) is not jobs[0]
+        await runner.drain()
+        await asyncio.sleep(0)
+        assert (1, "done") in sent
+        await runner.stop()
+
+    asyncio.run(scenario())
+
+
+def test_runner_cancels_and_records_failures():
+    async def scenario():
+        runner = JobRunner(max_concurrent=1)
+        await runner.start()
+
+        async def forever(job):
+            await asyncio.Event().wait()
+
+        async def broken(job):
+            raise ValueError("bad input")
+
+        stuck = runner.submit("score", 1, forever)
+        queued = runner.submit("import", None, broken)
+        await asyncio.sleep(0.01)
+        runner.cancel(stuck.id)
+        await runner.drain()
+        assert stuck.status == CANCELLED
+        assert (queued.status, queued.error) == (FAILED, "bad input")
+        assert runner.get(stuck.id) is stuck
+
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+import os
+
+os.environ["TESTING"] = "1"
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import metrics
+from app.metrics import Histogram, Registry, instrument_engine
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    hist = registry.add(Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0)))
+    hist.observe(0.05, "/a")
+    hist.observe(0.5, "/a")
+    hist.observe(5.0, "/a")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+
+
+def test_engine_statements_are_timed_and_slow_ones_logged(monkeypatch, caplog):
+    monkeypatch.setattr(metrics, "SLOW_QUERY_MS", 1e-9)
+
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        instrument_engine(engine.sync_engine, "probe")
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        await engine.dispose()
+
+    with caplog.at_level(logging.WARNING, logger="app.metrics"):
+        asyncio.run(scenario())
+
+    counts, _ = metrics.sql_statements.values[("probe", "SELECT")]
+    assert sum(counts) == 1
+    assert metrics.slow_statements.values[("probe",)] >= 1
+    assert any("SELECT 1" in record.getMessage() for record in caplog.records)
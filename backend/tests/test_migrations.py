@@ -0,0 +1,90 @@
+import os
+
+os.environ["TESTING"] = "1"
+
+import pytest
+from sqlalchemy import collate, create_engine, inspect, literal, or_, select, text, tuple_
+
+from app.migrations import SCHEMA_VERSION, get_schema_version, run_migrations
+from app.models.db import Base, Material, Node, NodeClosure, Relation
+
+
+HOT_QUERIES = {
+    "graph nodes": select(Node).where(Node.project_id == 1),
+    "graph edges": select(Relation).where(Relation.project_id == 1),
+    "parent check": select(Node.id).where(Node.id == 1, Node.project_id == 1),
+    "children": select(Node.id).where(Node.parent_id == 1),
+    "project children": select(Node.id).where(Node.project_id == 1, Node.parent_id == 1),
+    "material usage": select(Node.id).where(Node.material_id == 1),
+    "relations touching node": select(Relation.id).where(
+        or_(Relation.source_id == 1, Relation.target_id == 1)
+    ),
+    "subtree": select(Node.id)
+    .join(NodeClosure, NodeClosure.descendant_id == Node.id)
+    .where(NodeClosure.ancestor_id == 1, NodeClosure.depth <= 2),
+    "ancestors": select(Node.id)
+    .join(NodeClosure, NodeClosure.ancestor_id == Node.id)
+    .where(NodeClosure.descendant_id == 1, NodeClosure.depth > 0),
+    "material search": select(Material)
+    .where(Material.name.like("st%"))
+    .order_by(collate(Material.name, "NOCASE"), Material.id),
+    "material page": select(Material)
+    .where(tuple_(Material.name, Material.id) > tuple_(collate(literal("steel"), "NOCASE"), literal(3)))
+    .order_by(collate(Material.name, "NOCASE"), Material.id),
+}
+
+
+def _plan(conn, stmt) -> list[str]:
+    sql = stmt.compile(conn, compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+@pytest.fixture()
+def conn(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'plan.db'}")
+    with engine.begin() as connection:
+        run_migrations(connection)
+        yield connection
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_queries_use_indexes(conn, name):
+    plan = _plan(conn, HOT_QUERIES[name])
+    scans = [step for step in plan if step.startswith("SCAN")]
+    assert not scans, f"{name} regressed to a table scan: {plan}"
+
+
+def test_fresh_database_is_stamped(conn):
+    assert get_schema_version(conn) == SCHEMA_VERSION
+
+
+def test_legacy_database_is_upgraded_idempotently(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        Base.metadata.create_all(connection)
+        for table in Base.metadata.tables.values():
+            for index in table.indexes:
+                index.drop(connection)
+        connection.execute(text("ALTER TABLE projects DROP COLUMN version"))
+        connection.execute(text("INSERT INTO projects (id, name) VALUES (1, 'p')"))
+        for nid, parent in ((1, None), (2, 1), (3, 2)):
+            connection.execute(
+                text(
+                    "INSERT INTO nodes (id, project_id, material_id, name, parent_id, atomic, reusable, level, recyclable)"
+                    " VALUES (:id, 1, 1, 'n', :parent, 0, 0, 0, 0)"
+                ),
+                {"id": nid, "parent": parent},
+            )
+        assert get_schema_version(connection) == 0
+
+    for _ in range(2):
+        with engine.begin() as connection:
+            assert run_migrations(connection) == SCHEMA_VERSION
+            names = {ix["name"] for ix in inspect(connection).get_indexes("nodes")}
+            assert "ix_nodes_project_parent" in names
+            columns = {col["name"] for col in inspect(connection).get_columns("projects")}
+            assert "version" in columns
+            rows = connection.execute(select(NodeClosure.ancestor_id, NodeClosure.descendant_id, NodeClosure.depth))
+            assert (1, 3, 2) in set(rows.tuples())
+    engine.dispose()
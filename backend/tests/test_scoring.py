@@ -0,0 +1,77 @@
+import os
+
+os.environ["TESTING"] = "1"
+
+import numpy as np
+from sqlalchemy import Boolean, Column, Float, Integer, MetaData, Table, create_engine, insert, literal, select
+
+from app.models.schemas import ConnectionType
+from app.scoring import (
+    UNKNOWN_CONNECTION,
+    base_factors,
+    connection_code,
+    connection_codes,
+    scenario_totals,
+    score_expression,
+    score_kernel,
+    substitution_matrix,
+)
+
+
+def test_connection_code_parsing():
+    assert connection_code(ConnectionType.GLUE) == 2
+    assert connection_code("screw") == 0
+    assert connection_code(1) == 1
+    assert connection_code("rivet") == UNKNOWN_CONNECTION
+    assert connection_code(None) == UNKNOWN_CONNECTION
+    assert connection_code(42) == UNKNOWN_CONNECTION
+
+
+def test_score_kernel_matches_formula():
+    weights = np.array([2.0, 1.0, 4.0, 3.0])
+    co2 = np.array([1.0, 3.0, 0.5, 2.0])
+    codes = connection_codes([0, "GLUE", None, ConnectionType.BOLT])
+    reusable = np.array([False, True, False, True])
+    scores = score_kernel(weights, co2, codes, reusable)
+    assert np.allclose(scores, [1.6, 1.8, 2.0, 3.0])
+
+
+def test_scenario_totals_substitute_materials():
+    weights = np.array([1.0, 2.0, 3.0])
+    codes = connection_codes([1, 1, 1])
+    reusable = np.zeros(3, dtype=bool)
+    material_ids = [10, 20]
+    co2 = np.array([1.0, 5.0])
+    material_index = np.array([0, 1, 0])
+
+    matrix = substitution_matrix(material_ids, co2, [{}, {10: 20}, {20: 10}])
+    totals = scenario_totals(base_factors(weights, codes, reusable), material_index, matrix)
+    assert np.allclose(totals, [14.0, 30.0, 6.0])
+
+
+def test_score_expression_matches_kernel():
+    table = Table(
+        "parts", MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("weight", Float),
+        Column("connection_type", Integer),
+        Column("reusable", Boolean),
+    )
+    rows = [
+        {"id": i, "weight": w, "connection_type": c, "reusable": r}
+        for i, (w, c, r) in enumerate([(2.0, 0, False), (1.5, 2, True), (None, 1, False), (3.0, None, True), (0.7, 5, False)])
+    ]
+    engine = create_engine("sqlite://")
+    table.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(table), rows)
+        expr = score_expression(table.c.weight, literal(1.7), table.c.connection_type, table.c.reusable)
+        in_sql = conn.execute(select(expr).order_by(table.c.id)).scalars().all()
+
+    expected = score_kernel(
+        np.array([r["weight"] or 0.0 for r in rows]),
+        np.full(len(rows), 1.7),
+        connection_codes(r["connection_type"] for r in rows),
+        np.array([r["reusable"] for r in rows]),
+    )
+    assert in_sql == expected.tolist()
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import os
+
+os.environ["TESTING"] = "1"
+
+from app.routers.websocket import RESYNC_MESSAGE, BroadcastHub
+
+
+class FakeSocket:
+    def __init__(self, *, blocked=False, broken=False):
+        self.sent: list[str] = []
+        self.gate = asyncio.Event()
+        if not blocked:
+            self.gate.set()
+        self.broken = broken
+        self.closed_with = None
+
+    async def send_text(self, text):
+        if self.broken:
+            raise RuntimeError("connection reset")
+        await self.gate.wait()
+        self.sent.append(text)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+async def _drain():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_publish_serialises_once_and_fans_out():
+    async def scenario():
+        hub = BroadcastHub()
+        a, b, other = FakeSocket(), FakeSocket(), FakeSocket()
+        hub.connect(1, a)
+        hub.connect(1, b)
+        hub.connect(2, other)
+        hub.publish(1, {"op": "create_node", "id": 7})
+        await _drain()
+        assert a.sent == b.sent == ['{"op":"create_node","id":7}']
+        assert a.sent[0] is b.sent[0]
+        assert other.sent == []
+
+    asyncio.run(scenario())
+
+
+def test_dead_socket_is_pruned():
+    async def scenario():
+        hub = BroadcastHub()
+        hub.connect(1, FakeSocket(broken=True))
+        hub.publish(1, {"op": "x"})
+        await _drain()
+        assert hub.subscribers(1) == []
+
+    asyncio.run(scenario())
+
+
+def test_slow_consumer_gets_resync():
+    async def scenario():
+        hub = BroadcastHub(max_queue=2, slow_policy="resync")
+        slow = FakeSocket(blocked=True)
+        hub.connect(1, slow)
+        hub.publish(1, {"op": "x", "i": 0})
+        await _drain()
+        for i in range(1, 10):
+            hub.publish(1, {"op": "x", "i": i})
+        slow.gate.set()
+        await _drain()
+        # first message was in flight when the gate closed; the rest collapse to a resync
+        assert slow.sent == ['{"op":"x","i":0}', RESYNC_MESSAGE]
+        hub.publish(1, {"op": "x", "i": 10})
+        await _drain()
+        assert slow.sent[-1] == '{"op":"x","i":10}'
+
+    asyncio.run(scenario())
+
+
+def test_slow_consumer_is_disconnected():
+    async def scenario():
+        hub = BroadcastHub(max_queue=1, slow_policy="disconnect")
+        slow = FakeSocket(blocked=True)
+        hub.connect(1, slow)
+        for i in range(5):
+            hub.publish(1, {"op": "x", "i": i})
+        await _drain()
+        assert hub.subscribers(1) == []
+        assert slow.closed_with == 1013
+
+    asyncio.run(scenario())
+
+
+def test_events_are_coalesced_into_batches():
+    async def scenario():
+        hub = BroadcastHub(window=0.01, max_batch=100)
+        sock = FakeSocket()
+        hub.connect(1, sock)
+        hub.publish(1, {"op": "create_node", "node": {"id": 1}})
+        hub.publish(1, {"op": "create_node", "node": {"id": 2}})
+        hub.publish(1, {"op": "delete_node", "id": 1})
+        hub.publish(1, {"op": "create_relation", "id": 5, "source": 2, "target": 3})
+        assert sock.sent == []
+        await asyncio.sleep(0.03)
+        assert [json.loads(t) for t in sock.sent] == [
+            {
+                "op": "batch",
+                "ops": [
+                    {"op": "create_node", "node": {"id": 2}},
+                    {"op": "create_relation", "id": 5, "source": 2, "target": 3},
+                ],
+            }
+        ]
+
+    asyncio.run(scenario())
+
+
+def test_batch_flushes_at_size_threshold():
+    async def scenario():
+        hub = BroadcastHub(window=10, max_batch=3)
+        sock = FakeSocket()
+        hub.connect(1, sock)
+        hub.publish_many(1, [{"op": "x", "i": i} for i in range(3)])
+        await _drain()
+        assert len(json.loads(sock.sent[0])["ops"]) == 3
+
+    asyncio.run(scenario())
+
+
+def test_batch_frame_carries_version_span_of_cancelled_ops():
+    async def scenario():
+        hub = BroadcastHub(window=0.01, max_batch=100)
+        sock = FakeSocket()
+        hub.connect(1, sock)
+        hub.publish(1, {"op": "create_node", "node": {"id": 1}, "version": 4})
+        hub.publish(1, {"op": "create_node", "node": {"id": 2}, "version": 5})
+        hub.publish(1, {"op": "delete_node", "id": 1, "version": 6})
+        await asyncio.sleep(0.03)
+        frame = json.loads(sock.sent[0])
+        assert (frame["op"], frame["since"], frame["version"]) == ("batch", 3, 6)
+        assert [op["version"] for op in frame["ops"]] == [5]
+
+    asyncio.run(scenario())
+
+
+def test_batch_keeps_create_and_delete_when_other_ops_refer_to_the_node():
+    async def scenario():
+        hub = BroadcastHub(window=0.01, max_batch=100)
+        sock = FakeSocket()
+        hub.connect(1, sock)
+        hub.publish(1, {"op": "create_node", "node": {"id": 1, "parent_id": None}})
+        hub.publish(1, {"op": "create_node", "node": {"id": 2, "parent_id": 1}})
+        hub.publish(1, {"op": "update_scores", "scores": [[1, 2.0], [2, 2.0]]})
+        hub.publish(1, {"op": "delete_node", "id": 1})
+        # nothing refers to node 3, so its create and delete still cancel out
+        hub.publish(1, {"op": "create_node", "node": {"id": 3, "parent_id": None}})
+        hub.publish(1, {"op": "delete_node", "id": 3})
+        await asyncio.sleep(0.03)
+        frame = json.loads(sock.sent[0])
+        assert [(op["op"], op.get("id", op.get("node", {}).get("id"))) for op in frame["ops"]] == [
+            ("create_node", 1), ("create_node", 2), ("update_scores", None), ("delete_node", 1),
+        ]
+
+    asyncio.run(scenario())
+
+
+def test_catalogue_events_skip_excluded_projects():
+    async def scenario():
+        hub = BroadcastHub(window=0.01)
+        using, other = FakeSocket(), FakeSocket()
+        hub.connect(1, using)
+        hub.connect(2, other)
+        hub.publish_many(0, [{"op": "update_material", "material": {"id": 1}}], exclude=(1,))
+        await _drain()
+        assert using.sent == []
+        assert [json.loads(t)["op"] for t in other.sent] == ["update_material"]
+
+    asyncio.run(scenario())
@@ -3,7 +3,8 @@ import GraphCanvas, { layoutNodesByLevel } from './components/GraphCanvas'
 import ComponentTable from './components/ComponentTable'
 import MaterialTable from './components/MaterialTable'
 import useUndoRedo from './components/useUndoRedo'
-import { applyWsMessage, GraphState, WsMessage, Component } from './wsMessage'
+import { COLUMNAR_MEDIA_TYPE, columnarToGraphState, decodeColumnarGraph } from './graphColumnar'
+import { applyChanges, applyWsMessage, hasGap, GraphState, WsMessage, Component, Material } from './wsMessage'
 
 /**
  * 🔧 Keep a single source‑of‑truth for the allowed connection types so we can
@@ -34,6 +35,54 @@ type NewNodeState = {
   material_id: string // empty string = “nothing selected yet”
 }
 
+/**
+ * Load the full graph of a project and lay its nodes out by level. The
+ * snapshot is requested in the columnar binary format, which is far smaller
+ * than JSON and decodes into typed arrays without parsing every node.
+ */
+function fetchGraph(projectId: string): Promise<GraphState> {
+  return fetch(`/projects/${projectId}/graph`, { headers: { Accept: COLUMNAR_MEDIA_TYPE } })
+    .then((r) => {
+      if (!r.ok) throw new Error(`HTTP ${r.status}`)
+      return r.headers.get('Content-Type')?.startsWith(COLUMNAR_MEDIA_TYPE)
+        ? r.arrayBuffer().then((buffer) => columnarToGraphState(decodeColumnarGraph(buffer)))
+        : r.json()
+    })
+    .then((data) => ({ ...data, nodes: layoutNodesByLevel(data.nodes) }))
+}
+
+/**
+ * Bring ``state`` up to date after missed messages. Only the logged changes
+ * since ``state.version`` are fetched; the server answers with a full
+ * snapshot instead if its change log no longer reaches back that far.
+ */
+function catchUp(projectId: string, version: number | undefined): Promise<(prev: GraphState) => GraphState> {
+  if (version === undefined) return fetchGraph(projectId).then((data) => () => data)
+  return fetch(`/projects/${projectId}/graph?since=${version}`)
+    .then((r) => {
+      if (!r.ok) throw new Error(`HTTP ${r.status}`)
+      return r.json()
+    })
+    .then((data) =>
+      'changes' in data
+        ? (prev: GraphState) => applyChanges(prev, data.changes, data.version)
+        : () => ({ ...data, nodes: layoutNodesByLevel(data.nodes) }),
+    )
+}
+
+/**
+ * Load the first page of the material catalogue for the material selector;
+ * the graph itself only carries the materials the project uses.
+ */
+function fetchCatalogue(): Promise<Material[]> {
+  return fetch('/materials/?limit=500')
+    .then((r) => {
+      if (!r.ok) throw new Error(`HTTP ${r.status}`)
+      return r.json()
+    })
+    .then((page) => page.items)
+}
+
 const DEFAULT_NEW_NODE: NewNodeState = {
   name: '',
   level: 0,
@@ -56,10 +105,13 @@ export default function App() {
   )
   const [error, setError] = useState<string | null>(null)
   const wsRef = useRef<WebSocket | null>(null)
+  const versionRef = useRef<number | undefined>(undefined)
+  versionRef.current = state.version
   const [showNodeForm, setShowNodeForm] = useState(false)
   const [newNode, setNewNode] = useState<NewNodeState>(DEFAULT_NEW_NODE)
   const [availableNodes, setAvailableNodes] = useState<Component[]>([])
   const [availableLevels, setAvailableLevels] = useState<number[]>([])
+  const [catalogue, setCatalogue] = useState<Material[]>([])
 
   /* --------------------------------------------------------------------- */
   /*  Handy helper: keep ?project= URL param in localStorage               */
@@ -80,22 +132,22 @@ export default function App() {
   useEffect(() => {
     let isMounted = true
 
-    fetch(`/projects/${projectId}/graph`)
-      .then((r) => {
-        if (!r.ok) throw new Error(`HTTP ${r.status}`)
-        return r.json()
-      })
+    fetchGraph(projectId)
       .then((data) => {
         if (!isMounted) return
-        setState({
-          ...data,
-          nodes: layoutNodesByLevel(data.nodes),
-        })
+        setState(data)
+      })
+      .catch(() => isMounted && setError('Failed to load project data'))
+
+    fetchCatalogue()
+      .then((items) => {
+        if (!isMounted) return
+        setCatalogue(items)
 
         // ensure there is at least one material so the “add node” form works
-        if (isMounted && !data.materials.length) addMaterial()
+        if (!items.length) addMaterial()
       })
-      .catch(() => isMounted && setError('Failed to load project data'))
+      .catch((err) => console.error(err))
 
     return () => {
       isMounted = false
@@ -118,9 +170,29 @@ export default function App() {
     const ws = new WebSocket(wsUrl)
     wsRef.current = ws
 
+    let syncing = false
+    const sync = () => {
+      if (syncing) return
+      syncing = true
+      catchUp(projectId, versionRef.current)
+        .then((update) => setState(update))
+        .catch((err) => console.error(err))
+        .finally(() => {
+          syncing = false
+        })
+    }
+
+    // changes made between the initial fetch and the connection
+    ws.onopen = sync
+
     ws.onmessage = (ev) => {
       try {
         const msg: WsMessage = JSON.parse(ev.data)
+        if (msg.op === 'resync' || hasGap(versionRef.current, msg)) {
+          // messages were dropped or missed – fetch what changed since our version
+          sync()
+          return
+        }
         setState((prev) => applyWsMessage(prev, msg))
       } catch {
         console.error('Invalid WS message', ev.data)
@@ -188,14 +260,15 @@ export default function App() {
       body: JSON.stringify({ name, weight, co2_value: co2, hardness }),
     })
       .then((r) => (r.ok ? r.json() : Promise.reject(r.status)))
-      .then((material) =>
+      .then((material) => {
+        setCatalogue((prev) => [...prev, material])
         setState((prev) =>
           applyWsMessage(prev, {
             op: 'create_material',
             material,
           }),
-        ),
-      )
+        )
+      })
       .catch((err) => console.error(err))
   }
 
@@ -291,7 +364,9 @@ export default function App() {
   }
 
   const deleteMaterial = (id: number) => {
-    fetch(`/materials/${id}`, { method: 'DELETE' }).catch(err => console.error(err))
+    fetch(`/materials/${id}`, { method: 'DELETE' })
+      .then(() => setCatalogue((prev) => prev.filter((m) => m.id !== id)))
+      .catch(err => console.error(err))
   }
 
   /* --------------------------------------------------------------------- */
@@ -409,7 +484,7 @@ export default function App() {
               onChange={(e) => setNewNode({ ...newNode, material_id: e.target.value })}
             >
               <option value="">Select material</option>
-              {state.materials.map((m) => (
+              {catalogue.map((m) => (
                 <option key={m.id} value={m.id}>
                   {m.id}
                   {m.name ? ` - ${m.name}` : ''}
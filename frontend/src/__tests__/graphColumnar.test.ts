@@ -0,0 +1,65 @@
+import { describe, it, expect } from 'vitest'
+import { columnarToGraphState, decodeColumnarGraph } from '../graphColumnar'
+
+/**
+ * Payload produced by ``app.columnar.encode_graph`` for a two-node graph
+ * (Frame -> Screw, one relation), so the decoder is checked against the
+ * server's actual byte layout.
+ */
+const PAYLOAD =
+  'REdDMaABAAB7InZlcnNpb24iOjEyLCJub2RlcyI6MiwiZWRnZXMiOjEsInN0cmluZ3MiOlsiRnJhbWUiLCJTY3JldyJdLCJjb25uZWN0aW9uX3R5cGVzIjpbIlNDUkVXIiwiQk9MVCIsIkdMVUUiLCJXRUxEIiwiTkFJTCIsIkNMSVAiLCJjdXN0b20iXSwibWF0ZXJpYWxzIjpbeyJpZCI6MywibmFtZSI6IlN0ZWVsIn1dLCJjb2x1bW5zIjpbWyJpZCIsImk0Il0sWyJwYXJlbnRfaWQiLCJpNCJdLFsibWF0ZXJpYWxfaWQiLCJpNCJdLFsibGV2ZWwiLCJpNCJdLFsibmFtZSIsInU0Il0sWyJjb25uZWN0aW9uX3R5cGUiLCJpNCJdLFsiZmxhZ3MiLCJ1MSJdLFsid2VpZ2h0IiwiZjgiXSxbInN1c3RhaW5hYmlsaXR5X3Njb3JlIiwiZjgiXSxbImVkZ2VfaWQiLCJpNCJdLFsiZWRnZV9zb3VyY2UiLCJpNCJdLFsiZWRnZV90YXJnZXQiLCJpNCJdXX0gICAgIAEAAAACAAAA/////wEAAAADAAAAAwAAAAAAAAABAAAAAAAAAAEAAAADAAAABgAAAAIFAAAAAAAAAAAAAAAAEkAAAAAAAAD4PwAAAAAAAPh/AAAAAAAA9D8JAAAAAAAAAAEAAAAAAAAAAgAAAAAAAAA='
+
+function payload(): ArrayBuffer {
+  return Uint8Array.from(atob(PAYLOAD), (c) => c.charCodeAt(0)).buffer
+}
+
+describe('decodeColumnarGraph', () => {
+  it('exposes the columns as typed arrays', () => {
+    const g = decodeColumnarGraph(payload())
+
+    expect(g.version).toBe(12)
+    expect(g.id).toBeInstanceOf(Int32Array)
+    expect(Array.from(g.id)).toEqual([1, 2])
+    expect(Array.from(g.parentId)).toEqual([-1, 1])
+    expect(Array.from(g.weight)).toEqual([4.5, 1.5])
+    expect(Number.isNaN(g.score[0])).toBe(true)
+    expect(g.score[1]).toBe(1.25)
+    expect(g.strings[g.name[1]]).toBe('Screw')
+    expect(g.connectionTypes[g.connectionType[0]]).toBe('WELD')
+    expect(Array.from(g.edgeSource)).toEqual([1])
+    expect(Array.from(g.edgeTarget)).toEqual([2])
+  })
+
+  it('rejects other payloads', () => {
+    expect(() => decodeColumnarGraph(new TextEncoder().encode('{"nodes":[]}').buffer)).toThrow()
+  })
+})
+
+describe('columnarToGraphState', () => {
+  it('rebuilds the JSON graph shape', () => {
+    const state = columnarToGraphState(decodeColumnarGraph(payload()))
+
+    expect(state.version).toBe(12)
+    expect(state.materials).toEqual([{ id: 3, name: 'Steel' }])
+    expect(state.edges).toEqual([{ id: 9, source: 1, target: 2 }])
+    expect(state.nodes[0]).toEqual({
+      id: 1,
+      name: 'Frame',
+      level: 0,
+      parent_id: null,
+      atomic: false,
+      reusable: true,
+      recyclable: false,
+      connection_type: 'WELD',
+      material_id: 3,
+      weight: 4.5,
+    })
+    expect(state.nodes[1]).toMatchObject({
+      parent_id: 1,
+      atomic: true,
+      recyclable: true,
+      connection_type: 'custom',
+      sustainability_score: 1.25,
+    })
+  })
+})
@@ -1,4 +1,4 @@
-import { applyWsMessage, GraphState } from '../wsMessage'
+import { applyChanges, applyWsMessage, hasGap, GraphState } from '../wsMessage'
 import { describe, it, expect } from 'vitest'
 
 /**
@@ -107,3 +107,129 @@ describe('applyWsMessage', () => {
     expect(result.nodes[0].id).toBe(2)
   })
 })
+
+describe('applyWsMessage batch', () => {
+  it('applies all ops of a batch frame', () => {
+    const state: GraphState = { nodes: [{ id: 1 }], edges: [], materials: [] }
+    const result = applyWsMessage(state, {
+      op: 'batch',
+      ops: [
+        { op: 'create_node', node: { id: 2 } },
+        { op: 'create_node', node: { id: 3 } },
+        { op: 'delete_node', id: 1 },
+        { op: 'create_relation', id: '7', source: '2', target: '3' },
+        { op: 'create_material', id: 4 },
+      ],
+    })
+    expect(result.nodes.map(n => n.id)).toEqual([2, 3])
+    expect(result.edges).toEqual([{ id: 7, source: 2, target: 3 }])
+    expect(result.materials).toEqual([{ id: 4 }])
+    expect(state.nodes).toHaveLength(1)
+  })
+
+  it('returns the same state for an empty batch', () => {
+    const state: GraphState = { nodes: [{ id: 1 }], edges: [], materials: [] }
+    const result = applyWsMessage(state, { op: 'batch', ops: [] })
+    expect(result.nodes).toEqual(state.nodes)
+  })
+})
+
+describe('versioned messages', () => {
+  it('tracks the newest version', () => {
+    const state: GraphState = { nodes: [], edges: [], materials: [], version: 3 }
+    const result = applyWsMessage(state, { op: 'create_node', node: { id: 1 }, version: 4 })
+    expect(result.version).toBe(4)
+  })
+
+  it('detects gaps in single and batch frames', () => {
+    expect(hasGap(3, { op: 'delete_node', id: 1, version: 4 })).toBe(false)
+    expect(hasGap(3, { op: 'delete_node', id: 1, version: 6 })).toBe(true)
+    expect(hasGap(3, { op: 'batch', ops: [], since: 3, version: 9 })).toBe(false)
+    expect(hasGap(3, { op: 'batch', ops: [], since: 5, version: 9 })).toBe(true)
+    expect(hasGap(3, { op: 'create_material', id: 2 })).toBe(false)
+    expect(hasGap(undefined, { op: 'delete_node', id: 1, version: 6 })).toBe(false)
+  })
+
+  it('applies catch-up changes once', () => {
+    const state: GraphState = { nodes: [{ id: 1 }], edges: [], materials: [{ id: 2 }], version: 5 }
+    const result = applyChanges(
+      state,
+      [
+        { op: 'create_node', node: { id: 1 }, version: 5 },
+        { op: 'create_material', id: 2, version: 6 },
+        { op: 'update_scores', scores: [[1, 2.5]], version: 7 },
+      ],
+      7,
+    )
+    expect(result.nodes).toEqual([{ id: 1, sustainability_score: 2.5 }])
+    expect(result.materials).toEqual([{ id: 2 }])
+    expect(result.version).toBe(7)
+  })
+})
+
+describe('delete_subtree', () => {
+  it('removes the listed nodes and their relations', () => {
+    const state: GraphState = {
+      nodes: [{ id: 1 }, { id: 2 }, { id: 3 }],
+      edges: [
+        { id: 10, source: 1, target: 2 },
+        { id: 11, source: 1, target: 1 },
+        { id: 12, source: 3, target: 1 },
+      ],
+      materials: [],
+    }
+    const msg = { op: 'delete_subtree', id: 2, nodes: [2, 3] }
+    for (const result of [applyWsMessage(state, msg), applyWsMessage(state, { op: 'batch', ops: [msg] })]) {
+      expect(result.nodes.map(n => n.id)).toEqual([1])
+      expect(result.edges.map(e => e.id)).toEqual([11])
+    }
+  })
+})
+
+describe('update_material', () => {
+  it('replaces the fields of a material the graph contains', () => {
+    const state: GraphState = {
+      nodes: [],
+      edges: [],
+      materials: [{ id: 1, name: 'Steel', co2_value: 1 }],
+    }
+    const result = applyWsMessage(state, {
+      op: 'update_material',
+      material: { id: 1, name: 'Steel', co2_value: 2.5 },
+    })
+    expect(result.materials).toEqual([{ id: 1, name: 'Steel', co2_value: 2.5 }])
+    // materials the project does not use are not added
+    const other = applyWsMessage(state, { op: 'update_material', material: { id: 9, co2_value: 1 } })
+    expect(other).toBe(state)
+  })
+})
+
+describe('update_node', () => {
+  it('merges the fields of a moved node and relevels its subtree', () => {
+    const state: GraphState = {
+      nodes: [
+        { id: 1, level: 0, position: { x: 1, y: 1 } },
+        { id: 2, level: 1, parent_id: 1, name: 'Sub', position: { x: 5, y: 5 } },
+        { id: 3, level: 2, parent_id: 2 },
+      ],
+      edges: [],
+      materials: [],
+    }
+    const ops = [
+      { op: 'update_node', node: { id: 2, level: 0, parent_id: null, name: 'Moved', atomic: false } },
+      { op: 'update_levels', levels: [[2, 0], [3, 1]] },
+    ]
+    for (const result of [
+      ops.reduce(applyWsMessage, state),
+      applyWsMessage(state, { op: 'batch', ops }),
+    ]) {
+      expect(result.nodes).toEqual([
+        { id: 1, level: 0, position: { x: 1, y: 1 } },
+        { id: 2, level: 0, parent_id: null, name: 'Moved', atomic: false, position: { x: 5, y: 5 } },
+        { id: 3, level: 1, parent_id: 2 },
+      ])
+    }
+    // unknown nodes are ignored
+    expect(applyWsMessage(state, { op: 'update_node', node: { id: 9, name: 'x' } })).toBe(state)
+  })
+})
@@ -0,0 +1,115 @@
+import type { Component, Edge, GraphState, Material } from './wsMessage'
+
+/** Media type of the columnar graph snapshot, see ``backend/app/columnar.py``. */
+export const COLUMNAR_MEDIA_TYPE = 'application/vnd.dimop.graph+columnar'
+
+const MAGIC = 'DGC1'
+
+// bits of the ``flags`` column
+export const ATOMIC = 1
+export const REUSABLE = 2
+export const RECYCLABLE = 4
+
+type TypedArray = Int32Array | Uint32Array | Uint8Array | Float64Array
+
+const ARRAY_TYPES: Record<string, { new (buffer: ArrayBuffer, offset: number, length: number): TypedArray; BYTES_PER_ELEMENT: number }> = {
+  i4: Int32Array,
+  u4: Uint32Array,
+  u1: Uint8Array,
+  f8: Float64Array,
+}
+
+/**
+ * A decoded graph: one typed array per field, indexed by node (or edge)
+ * position. Missing IDs and codes are ``-1``, missing numbers ``NaN``.
+ */
+export interface ColumnarGraph {
+  version?: number
+  strings: string[]
+  connectionTypes: string[]
+  materials: Material[]
+  id: Int32Array
+  parentId: Int32Array
+  materialId: Int32Array
+  level: Int32Array
+  /** index into ``strings`` */
+  name: Uint32Array
+  /** index into ``connectionTypes`` */
+  connectionType: Int32Array
+  flags: Uint8Array
+  weight: Float64Array
+  score: Float64Array
+  edgeId: Int32Array
+  edgeSource: Int32Array
+  edgeTarget: Int32Array
+}
+
+/**
+ * Decode a columnar snapshot. The columns are views on ``buffer``, so no
+ * per-node parsing or copying happens here; the server aligns every column
+ * to 8 bytes for that.
+ */
+export function decodeColumnarGraph(buffer: ArrayBuffer): ColumnarGraph {
+  const view = new DataView(buffer)
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4))
+  if (magic !== MAGIC) throw new Error('not a columnar graph')
+  const headerLength = view.getUint32(4, true)
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)))
+
+  const columns: Record<string, TypedArray> = {}
+  let offset = 8 + headerLength
+  for (const [name, dtype] of header.columns as [string, string][]) {
+    const Type = ARRAY_TYPES[dtype]
+    if (!Type) throw new Error(`unknown column type ${dtype}`)
+    const count = name.startsWith('edge_') ? header.edges : header.nodes
+    columns[name] = new Type(buffer, offset, count)
+    const bytes = count * Type.BYTES_PER_ELEMENT
+    offset += bytes + ((8 - (bytes % 8)) % 8)
+  }
+
+  return {
+    version: header.version ?? undefined,
+    strings: header.strings,
+    connectionTypes: header.connection_types,
+    materials: header.materials,
+    id: columns.id as Int32Array,
+    parentId: columns.parent_id as Int32Array,
+    materialId: columns.material_id as Int32Array,
+    level: columns.level as Int32Array,
+    name: columns.name as Uint32Array,
+    connectionType: columns.connection_type as Int32Array,
+    flags: columns.flags as Uint8Array,
+    weight: columns.weight as Float64Array,
+    score: columns.sustainability_score as Float64Array,
+    edgeId: columns.edge_id as Int32Array,
+    edgeSource: columns.edge_source as Int32Array,
+    edgeTarget: columns.edge_target as Int32Array,
+  }
+}
+
+/** Expand a columnar graph into the object form the editor state uses. */
+export function columnarToGraphState(g: ColumnarGraph): GraphState {
+  const nodes: Component[] = new Array(g.id.length)
+  for (let i = 0; i < g.id.length; i++) {
+    const flags = g.flags[i]
+    const node: Component = {
+      id: g.id[i],
+      name: g.strings[g.name[i]],
+      level: g.level[i],
+      parent_id: g.parentId[i] < 0 ? null : g.parentId[i],
+      atomic: (flags & ATOMIC) !== 0,
+      reusable: (flags & REUSABLE) !== 0,
+      recyclable: (flags & RECYCLABLE) !== 0,
+      connection_type: g.connectionType[i] < 0 ? undefined : g.connectionTypes[g.connectionType[i]],
+      material_id: g.materialId[i] < 0 ? undefined : g.materialId[i],
+    }
+    if (!Number.isNaN(g.weight[i])) node.weight = g.weight[i]
+    if (!Number.isNaN(g.score[i])) node.sustainability_score = g.score[i]
+    nodes[i] = node
+  }
+  const edges: Edge[] = new Array(g.edgeId.length)
+  for (let i = 0; i < g.edgeId.length; i++) {
+    edges[i] = { id: g.edgeId[i], source: g.edgeSource[i], target: g.edgeTarget[i] }
+  }
+  return { nodes, edges, materials: g.materials, version: g.version }
+}
@@ -6,6 +6,7 @@ export interface Component {
   atomic?: boolean
   weight?: number
   reusable?: boolean
+  recyclable?: boolean
   connection_type?: string | number
   material_id?: number
   sustainability_score?: number
@@ -30,6 +31,8 @@ export interface GraphState {
   nodes: Component[]
   edges: Edge[]
   materials: Material[]
+  /** Graph version of the server the state reflects, if known. */
+  version?: number
 }
 
 export interface WsMessage {
@@ -37,37 +40,156 @@ export interface WsMessage {
   [key: string]: any
 }
 
-export function applyWsMessage(state: GraphState, msg: WsMessage): GraphState {
-  switch (msg.op) {
-    case 'create_node':
-      if ('node' in msg) {
-        const n = {
-          ...msg.node,
-          position: msg.node.position ?? {
-            x: Math.random() * 250,
-            y: Math.random() * 250,
-          },
+/**
+ * Whether ``msg`` builds on a newer version than ``version``, i.e. the client
+ * missed changes and should catch up via ``/graph?since=``. Catalogue events
+ * carry no version and never signal a gap.
+ */
+export function hasGap(version: number | undefined, msg: WsMessage): boolean {
+  if (version === undefined) return false
+  if (msg.op === 'batch' && typeof msg.since === 'number') return msg.since > version
+  return typeof msg.version === 'number' && msg.version > version + 1
+}
+
+function withVersion(state: GraphState, version: unknown): GraphState {
+  if (typeof version !== 'number' || (state.version !== undefined && state.version >= version)) {
+    return state
+  }
+  return { ...state, version }
+}
+
+function subtreeIds(msg: WsMessage): number[] {
+  if (Array.isArray(msg.nodes)) return msg.nodes
+  return 'id' in msg ? [msg.id] : []
+}
+
+function randomPosition() {
+  return { x: Math.random() * 250, y: Math.random() * 250 }
+}
+
+function nodeFromMessage(msg: WsMessage): Component | null {
+  if ('node' in msg) {
+    const n = { ...msg.node, position: msg.node.position ?? randomPosition() }
+    if (n.atomic === false) {
+      delete (n as any).weight
+    }
+    return n
+  }
+  if ('id' in msg) {
+    return { id: msg.id, position: randomPosition() }
+  }
+  return null
+}
+
+/**
+ * Apply all operations of a ``batch`` frame with a single copy of each array,
+ * so thousands of coalesced events cost one state update instead of one each.
+ */
+function applyBatch(state: GraphState, ops: WsMessage[]): GraphState {
+  let nodes = [...state.nodes]
+  let edges = [...state.edges]
+  let materials = [...state.materials]
+  const deadNodes = new Set<number>()
+  const deadEdges = new Set<number>()
+  const deadMaterials = new Set<number>()
+  // nodes of deleted subtrees: their relations go as well
+  const deadEndpoints = new Set<number>()
+
+  // removals are applied lazily; other ops must see a consistent state first
+  const settle = () => {
+    if (deadNodes.size) nodes = nodes.filter(n => !deadNodes.has(n.id))
+    if (deadEdges.size || deadEndpoints.size) {
+      edges = edges.filter(
+        e => !deadEdges.has(e.id) && !deadEndpoints.has(e.source) && !deadEndpoints.has(e.target),
+      )
+    }
+    if (deadMaterials.size) materials = materials.filter(m => !deadMaterials.has(m.id))
+    deadNodes.clear()
+    deadEdges.clear()
+    deadMaterials.clear()
+    deadEndpoints.clear()
+  }
+
+  for (const op of ops) {
+    switch (op.op) {
+      case 'create_node': {
+        const n = nodeFromMessage(op)
+        if (n) nodes.push(n)
+        break
+      }
+      case 'delete_node':
+        if ('id' in op) deadNodes.add(op.id)
+        break
+      case 'delete_subtree':
+        for (const id of subtreeIds(op)) {
+          deadNodes.add(id)
+          deadEndpoints.add(id)
         }
-        if (n.atomic === false) {
-          delete (n as any).weight
+        break
+      case 'create_relation':
+        if ('id' in op && 'source' in op && 'target' in op) {
+          edges.push({ id: Number(op.id), source: Number(op.source), target: Number(op.target) })
         }
-        return { ...state, nodes: [...state.nodes, n] }
+        break
+      case 'delete_relation':
+        if ('id' in op) deadEdges.add(Number(op.id))
+        break
+      case 'create_material': {
+        const m = 'material' in op ? op.material : 'id' in op ? { id: op.id } : null
+        if (m && !materials.some(x => x.id === m.id)) materials.push(m)
+        break
       }
-      if ('id' in msg) {
-        return {
-          ...state,
-          nodes: [
-            ...state.nodes,
-            { id: msg.id, position: { x: Math.random() * 250, y: Math.random() * 250 } },
-          ],
-        }
+      case 'delete_material':
+        if ('id' in op) deadMaterials.add(op.id)
+        break
+      default: {
+        settle()
+        const next = applyOp({ ...state, nodes, edges, materials }, op)
+        nodes = next.nodes
+        edges = next.edges
+        materials = next.materials
       }
-      return state
+    }
+  }
+  settle()
+  return { ...state, nodes, edges, materials }
+}
+
+export function applyWsMessage(state: GraphState, msg: WsMessage): GraphState {
+  return withVersion(applyOp(state, msg), msg.version)
+}
+
+/**
+ * Apply the ``changes`` of a ``/graph?since=`` response and move to ``version``.
+ * Changes the state already reflects (received live meanwhile) are skipped.
+ */
+export function applyChanges(state: GraphState, changes: WsMessage[], version: number): GraphState {
+  const known = state.version
+  const fresh = known === undefined ? changes : changes.filter(c => !(c.version <= known))
+  return withVersion(applyBatch(state, fresh), version)
+}
+
+function applyOp(state: GraphState, msg: WsMessage): GraphState {
+  switch (msg.op) {
+    case 'batch':
+      return Array.isArray(msg.ops) ? applyBatch(state, msg.ops) : state
+    case 'create_node': {
+      const n = nodeFromMessage(msg)
+      return n ? { ...state, nodes: [...state.nodes, n] } : state
+    }
     case 'delete_node':
       if ('id' in msg) {
         return { ...state, nodes: state.nodes.filter(n => n.id !== msg.id) }
       }
       return state
+    case 'delete_subtree': {
+      const dead = new Set(subtreeIds(msg))
+      return {
+        ...state,
+        nodes: state.nodes.filter(n => !dead.has(n.id)),
+        edges: state.edges.filter(e => !dead.has(e.source) && !dead.has(e.target)),
+      }
+    }
       case 'create_relation':
         if ('id' in msg && 'source' in msg && 'target' in msg) {
           return {
@@ -89,19 +211,56 @@ export function applyWsMessage(state: GraphState, msg: WsMessage): GraphState {
         return { ...state, edges: state.edges.filter(e => e.id !== id) }
       }
       return state
-    case 'create_material':
-      if ('material' in msg) {
-        return { ...state, materials: [...state.materials, msg.material] }
-      }
-      if ('id' in msg) {
-        return { ...state, materials: [...state.materials, { id: msg.id }] }
-      }
-      return state
+    case 'create_material': {
+      const m = 'material' in msg ? msg.material : 'id' in msg ? { id: msg.id } : null
+      // catalogue events may arrive twice: live and again through a catch-up
+      if (!m || state.materials.some(x => x.id === m.id)) return state
+      return { ...state, materials: [...state.materials, m] }
+    }
     case 'delete_material':
       if ('id' in msg) {
         return { ...state, materials: state.materials.filter(m => m.id !== msg.id) }
       }
       return state
+    case 'update_material': {
+      const m = msg.material
+      if (!m || !state.materials.some(x => x.id === m.id)) return state
+      return { ...state, materials: state.materials.map(x => (x.id === m.id ? { ...x, ...m } : x)) }
+    }
+    case 'update_node': {
+      const n = msg.node
+      if (!n || !state.nodes.some(x => x.id === n.id)) return state
+      // keep the client-side position; a non-atomic node has no weight
+      return {
+        ...state,
+        nodes: state.nodes.map(x => {
+          if (x.id !== n.id) return x
+          const merged = { ...x, ...n, position: x.position }
+          if (merged.atomic === false) delete (merged as any).weight
+          return merged
+        }),
+      }
+    }
+    case 'update_levels':
+      if (Array.isArray(msg.levels)) {
+        const levels = new Map<number, number>(msg.levels)
+        return {
+          ...state,
+          nodes: state.nodes.map(n => (levels.has(n.id) ? { ...n, level: levels.get(n.id) } : n)),
+        }
+      }
+      return state
+    case 'update_scores':
+      if (Array.isArray(msg.scores)) {
+        const scores = new Map<number, number>(msg.scores)
+        return {
+          ...state,
+          nodes: state.nodes.map(n =>
+            scores.has(n.id) ? { ...n, sustainability_score: scores.get(n.id) } : n,
+          ),
+        }
+      }
+      return state
     default:
       return state
   }